@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+batch_kalman.py
+Vectorised constant-velocity Kalman filter over many 2D tracks at once,
+plus an offline Rauch-Tung-Striebel (RTS) smoother and the gap filling
+used between tracking and reconstruction (interpolate_missing). Needs only
+NumPy, so re-running those stages never imports OpenCV.
+
+Same state and noise matrices as extract_tracks_kalman.Kalman2D (state
+[x, y, vx, vy], position-only measurements), but run as a textbook filter:
+every frame is predicted and then corrected if it has a measurement. The
+tracker's KalmanSink instead only predicts on frames without a detection
+and corrects in place on hits, so the two do not produce the same numbers
+for the same measurements. All tracks live in stacked arrays:
+    z : (N, T, 2) measurements, NaN where a frame has no detection
+
+The tracker writes KalmanSink outputs, not its raw measurements, so
+smoothing a raw_tracks file (interpolate_missing(method="rts") or this
+script) filters already-filtered positions a second time: the path comes
+out smoother than either filter alone, with a lag that follows the
+KalmanSink's.
+
+Usage (re-filter archived tracks with new noise parameters):
+    python batch_kalman.py --in raw_tracks.json --out smoothed.json --meas-var 25
+"""
+import json
+import argparse
+import numpy as np
+
+INTERPOLATE_VERSION = 1
+
+class BatchKalman2D:
+    def __init__(self, n_tracks, dt=1.0, process_var=1e-3, meas_var=50.0, p0=500.0):
+        self.n = n_tracks
+        self.A = np.array([[1,0,dt,0],
+                           [0,1,0,dt],
+                           [0,0,1,0],
+                           [0,0,0,1]], dtype=float)
+        self.Q = np.eye(4) * process_var
+        self.meas_var = float(meas_var)
+        self.p0 = float(p0)
+
+        # state and preallocated work buffers
+        self.x = np.zeros((n_tracks, 4))
+        self.P = np.zeros((n_tracks, 4, 4))
+        self._x = np.empty((n_tracks, 4))
+        self._AP = np.empty((n_tracks, 4, 4))
+        self._S = np.empty((n_tracks, 2, 2))
+        self._Sinv = np.empty((n_tracks, 2, 2))
+        self._det = np.empty(n_tracks)
+        self._K = np.empty((n_tracks, 4, 2))
+        self._KHP = np.empty((n_tracks, 4, 4))
+        self._y = np.empty((n_tracks, 2))
+        self.reset()
+
+    def reset(self, pos=None):
+        self.x[:] = 0.0
+        if pos is not None:
+            self.x[:, :2] = pos
+        self.P[:] = np.eye(4) * self.p0
+
+    def predict(self):
+        np.matmul(self.x, self.A.T, out=self._x)
+        self.x, self._x = self._x, self.x
+        np.matmul(self.A, self.P, out=self._AP)
+        np.matmul(self._AP, self.A.T, out=self.P)
+        self.P += self.Q
+
+    def update(self, z, valid):
+        """Measurement update for the tracks where `valid` is True (z is (N, 2))."""
+        P = self.P
+        S, Sinv, det = self._S, self._Sinv, self._det
+        # S = H P H^T + R, inverted in closed form
+        S[:] = P[:, :2, :2]
+        S[:, 0, 0] += self.meas_var
+        S[:, 1, 1] += self.meas_var
+        np.multiply(S[:, 0, 0], S[:, 1, 1], out=det)
+        det -= S[:, 0, 1] * S[:, 1, 0]
+        Sinv[:, 0, 0] = S[:, 1, 1]
+        Sinv[:, 1, 1] = S[:, 0, 0]
+        Sinv[:, 0, 1] = -S[:, 0, 1]
+        Sinv[:, 1, 0] = -S[:, 1, 0]
+        Sinv /= det[:, None, None]
+        # K = P H^T S^-1 ; x += K (z - H x) ; P -= K H P
+        np.matmul(P[:, :, :2], Sinv, out=self._K)
+        K = self._K
+        K[~valid] = 0.0
+        np.subtract(z, self.x[:, :2], out=self._y)
+        self._y[~valid] = 0.0
+        self.x += np.einsum("nij,nj->ni", K, self._y)
+        np.matmul(K, P[:, :2, :], out=self._KHP)
+        P -= self._KHP
+
+    def filter(self, z):
+        """
+        Forward pass over z (N, T, 2). Returns filtered and one-step predicted
+        means (N, T, 4) and covariances (N, T, 4, 4), as needed by rts_smooth.
+        Each track starts at its first valid measurement with zero velocity.
+        """
+        z = np.asarray(z, dtype=float)
+        n, T, _ = z.shape
+        valid = np.isfinite(z).all(axis=2)
+        first = np.where(valid.any(axis=1), valid.argmax(axis=1), 0)
+        z = np.nan_to_num(z)
+        self.reset(z[np.arange(n), first])
+
+        xf = np.empty((n, T, 4))
+        Pf = np.empty((n, T, 4, 4))
+        xp = np.empty((n, T, 4))
+        Pp = np.empty((n, T, 4, 4))
+        for k in range(T):
+            if k > 0:
+                self.predict()
+            xp[:, k] = self.x
+            Pp[:, k] = self.P
+            self.update(z[:, k], valid[:, k])
+            xf[:, k] = self.x
+            Pf[:, k] = self.P
+        return xf, Pf, xp, Pp
+
+def rts_smooth(z, dt=1.0, process_var=1e-3, meas_var=50.0):
+    """
+    Offline RTS smoother over z (N, T, 2). Returns smoothed states (N, T, 4);
+    positions are [..., :2]. Missing frames come out as smoothed estimates,
+    so this doubles as a model-based gap fill.
+    """
+    z = np.asarray(z, dtype=float)
+    n, T, _ = z.shape
+    kf = BatchKalman2D(n, dt=dt, process_var=process_var, meas_var=meas_var)
+    xf, Pf, xp, Pp = kf.filter(z)
+    A = kf.A
+
+    xs = xf.copy()
+    for k in range(T - 2, -1, -1):
+        # C = Pf[k] A^T Pp[k+1]^-1  (4x4, batched over tracks)
+        C = np.linalg.solve(Pp[:, k + 1], A @ Pf[:, k]).transpose(0, 2, 1)
+        xs[:, k] += np.einsum("nij,nj->ni", C, xs[:, k + 1] - xp[:, k + 1])
+    return xs
+
+def smooth_detections(detections, **kwargs):
+    """RTS-smoothed positions for one detection list (x/y may be None)."""
+    z = np.array([[np.nan if d["x"] is None else d["x"],
+                   np.nan if d["y"] is None else d["y"]] for d in detections], dtype=float)
+    return rts_smooth(z[None], **kwargs)[0, :, :2]
+
+def interpolate_missing(detections, method="linear", cache=None):
+    """
+    Fill frames without a detection. method="linear" interpolates between
+    neighbouring detections; method="rts" runs the offline RTS smoother over
+    the whole sequence instead (on tracker output that is a second filtering
+    pass, see above).
+
+    cache: optional stage_cache.StageCache keyed on the detections themselves.
+    """
+    if cache is not None:
+        from stage_cache import data_digest
+        return cache.cached("interpolate_missing", data_digest(detections),
+                            {"version": INTERPOLATE_VERSION, "method": method},
+                            lambda: interpolate_missing(detections, method))
+    if method == "rts":
+        if sum(d["x"] is not None for d in detections) >= 2:
+            pos = smooth_detections(detections)
+            return [{"frame": int(d["frame"]), "x": float(p[0]), "y": float(p[1])}
+                    for d, p in zip(detections, pos)]
+    elif method != "linear":
+        raise ValueError(f"Unknown interpolation method: {method}")
+
+    frames = [d["frame"] for d in detections]
+    xs = [d["x"] for d in detections]
+    ys = [d["y"] for d in detections]
+
+    def interp(vals):
+        arr = np.array([v if v is not None else np.nan for v in vals], dtype=float)
+        n = len(arr)
+        idx = np.arange(n)
+        mask = ~np.isnan(arr)
+        if mask.sum() < 2:
+            return arr.tolist()
+        filled = np.interp(idx, idx[mask], arr[mask])
+        return filled.tolist()
+
+    xs_f = interp(xs)
+    ys_f = interp(ys)
+
+    out = []
+    for i, f in enumerate(detections):
+        out.append({"frame": int(f["frame"]), "x": float(xs_f[i]), "y": float(ys_f[i])})
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RTS-smooth a 2D track with given noise parameters.")
+    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Input 2D tracks JSON")
+    parser.add_argument("--out", dest="outfile", default="raw_tracks_smoothed.json", help="Output JSON")
+    parser.add_argument("--process-var", type=float, default=1e-3, help="Process noise variance")
+    parser.add_argument("--meas-var", type=float, default=50.0, help="Measurement noise variance")
+    args = parser.parse_args()
+
+    with open(args.infile, "r") as f:
+        raw = json.load(f)
+    pos = smooth_detections(raw, process_var=args.process_var, meas_var=args.meas_var)
+    out = [{"frame": int(d["frame"]), "x": float(p[0]), "y": float(p[1])} for d, p in zip(raw, pos)]
+    with open(args.outfile, "w") as f:
+        json.dump(out, f, indent=2)
+    print("Saved smoothed tracks to", args.outfile)
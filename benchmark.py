@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+End-to-end speed benchmark on procedurally generated clips with a known
+ball path: an orange ball over a textured, noisy pitch at several
+resolutions and lengths.
+
+Per clip it times track_ball, interpolate_missing,
+straight_line_reconstruct and make_video.create_video separately, and
+records frames per second, the stage's peak RSS and the tracking error
+against the ground truth. Results are written as JSON; with --baseline the
+run is compared against a stored result and exits non-zero on a
+regression beyond the thresholds.
+
+Usage:
+    python benchmark.py --out bench.json
+    python benchmark.py --quick --out bench.json --baseline baseline.json --fps-threshold 0.1
+    python benchmark.py --sizes 1280x720,1920x1080 --lengths 300 --workers 4
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import threading
+import contextlib
+import numpy as np
+import cv2
+
+TRACK_SIZE = (960,540)
+
+DEFAULT_SIZES = [(640,360), (1280,720), (1920,1080)]
+DEFAULT_LENGTHS = [150, 600]
+QUICK_SIZES = [(640,360), (1280,720)]
+QUICK_LENGTHS = [90]
+
+# Colours chosen around the tracker's HSV range: the pitch and grass stay
+# outside it (low saturation / green hue), the ball inside it
+BALL_BGR = (0, 120, 255)
+PITCH_BGR = (150, 165, 172)
+GRASS_BGR = (40, 120, 45)
+
+# -------------------------------------------
+# Synthetic clips
+# -------------------------------------------
+def ground_truth_path(frames, size, seed=0):
+    """
+    Ball centre per frame in pixels of `size` (NaN while the ball is out of
+    shot): a delivery down the pitch strip with a bounce (a kink in the
+    image path), visible for the middle ~70% of the clip, repeated for long clips.
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    xs = np.full(frames, np.nan)
+    ys = np.full(frames, np.nan)
+    period = min(frames, 120)
+    for start in range(0, frames, period):
+        n = min(period, frames - start)
+        t0, t1 = int(0.15 * n), int(0.85 * n)
+        if t1 - t0 < 2:
+            continue
+        s = np.linspace(0.0, 1.0, t1 - t0)
+        bounce = rng.uniform(0.55, 0.75)
+        x_start, x_bounce, x_end = (w * (0.5 + rng.uniform(-0.04, 0.04, 3)))
+        y = h * (0.08 + 0.84 * s)
+        x = np.where(s < bounce, x_start + (x_bounce - x_start) * s / bounce,
+                     x_bounce + (x_end - x_bounce) * (s - bounce) / (1.0 - bounce))
+        xs[start + t0:start + t1] = x
+        ys[start + t0:start + t1] = y
+    return xs, ys
+
+def background(size, seed=0):
+    """Grass with a pitch strip, both with a fixed noise texture."""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    img = np.empty((h, w, 3), dtype=np.int16)
+    img[:] = GRASS_BGR
+    x0, x1 = int(w * 0.42), int(w * 0.58)
+    img[:, x0:x1] = PITCH_BGR
+    # mowing stripes and grain
+    img[:, :x0] += ((np.arange(h) // max(1, h // 12)) % 2 * 12)[:, None, None].astype(np.int16)
+    img += rng.integers(-10, 11, (h, w, 1), dtype=np.int16)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def make_clip(path, size, frames, fps=30, seed=0, noise=6):
+    """Write a synthetic clip; returns the ground truth (xs, ys) in pixels of `size`."""
+    w, h = size
+    xs, ys = ground_truth_path(frames, size, seed)
+    bg = background(size, seed)
+    rng = np.random.default_rng(seed + 1)
+    radius = max(3, int(round(h / 90)))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise IOError(f"Cannot open video writer: {path}")
+    # a few noise fields reused cyclically keep generation cheap at 4K
+    grains = [rng.integers(-noise, noise + 1, (h, w, 1), dtype=np.int16) for _ in range(4)]
+    try:
+        for i in range(frames):
+            img = np.clip(bg + grains[i % len(grains)], 0, 255).astype(np.uint8)
+            if np.isfinite(xs[i]):
+                cv2.circle(img, (int(round(xs[i] * 16)), int(round(ys[i] * 16))), radius * 16, BALL_BGR, -1,
+                           cv2.LINE_AA, 4)
+            writer.write(img)
+    finally:
+        writer.release()
+    return xs, ys
+
+# -------------------------------------------
+# Measurement
+# -------------------------------------------
+def current_rss():
+    """Resident set size in bytes (Linux /proc; elsewhere the process high-water mark)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def current_peak_mb():
+    """Process high-water RSS in MB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024) / 1e6
+
+class PeakRss:
+    """Samples RSS on a thread while the block runs; .peak is the highest value seen (bytes)."""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def timed(fn, repeat=1, min_seconds=0.05):
+    """
+    Best-of-`repeat` wall time of fn() (fast stages are looped until they
+    take `min_seconds`), its peak RSS and its last result. Stage output is silenced.
+    """
+    best = None
+    with PeakRss() as rss:
+        for _ in range(repeat):
+            calls = 0
+            t0 = time.perf_counter()
+            while True:
+                with open(os.devnull, "w") as null, contextlib.redirect_stdout(null), contextlib.redirect_stderr(null):
+                    result = fn()
+                calls += 1
+                dt = time.perf_counter() - t0
+                if dt >= min_seconds:
+                    break
+            per_call = dt / calls
+            best = per_call if best is None else min(best, per_call)
+    return best, rss.peak, result
+
+def tracking_error(detections, xs, ys, size):
+    """Pixel error (at TRACK_SIZE) of the detections against the ground truth, over frames where the ball is visible."""
+    sx, sy = TRACK_SIZE[0] / float(size[0]), TRACK_SIZE[1] / float(size[1])
+    truth = np.isfinite(xs)
+    det = np.full((len(xs), 2), np.nan)
+    for d in detections:
+        if d["frame"] < len(xs) and d["x"] is not None:
+            det[d["frame"]] = (d["x"], d["y"])
+    err = np.hypot(det[:, 0] - xs * sx, det[:, 1] - ys * sy)[truth]
+    found = np.isfinite(err)
+    if not found.any():
+        return {"mean_px": None, "p95_px": None, "detected": 0.0}
+    return {"mean_px": float(err[found].mean()), "p95_px": float(np.percentile(err[found], 95)),
+            "detected": float(found.mean())}
+
+def run_case(size, frames, workdir, repeat=1, workers=0, seed=0):
+    from extract_tracks_kalman import track_ball, interpolate_missing
+    from physics_reconstruct import straight_line_reconstruct
+    from track_store import write_tracks
+    import make_video
+
+    name = f"{size[0]}x{size[1]}x{frames}"
+    clip = os.path.join(workdir, name + ".mp4")
+    xs, ys = make_clip(clip, size, frames, seed=seed)
+    stages = {}
+
+    def record(stage, seconds, peak, n):
+        stages[stage] = {"seconds": seconds, "fps": n / seconds if seconds > 0 else None,
+                         "peak_rss_mb": peak / 1e6}
+
+    seconds, peak, detections = timed(lambda: track_ball(clip, resize=TRACK_SIZE, workers=workers), repeat)
+    record("track_ball", seconds, peak, frames)
+
+    seconds, peak, filled = timed(lambda: interpolate_missing(detections), repeat)
+    record("interpolate_missing", seconds, peak, frames)
+
+    raw_json = os.path.join(workdir, name + ".raw.json")
+    out_json = os.path.join(workdir, name + ".tracks.json")
+    write_tracks(raw_json, {"frame": [d["frame"] for d in filled], "x": [d["x"] for d in filled],
+                            "y": [d["y"] for d in filled]}, fps=30.0, image_size=TRACK_SIZE)
+    seconds, peak, _ = timed(lambda: straight_line_reconstruct(raw_json, out_json, image_size=TRACK_SIZE), repeat)
+    record("straight_line_reconstruct", seconds, peak, len(filled))
+
+    # create_video encodes a PNG sequence: the clip's own frames (written untimed)
+    frames_dir = os.path.join(workdir, name + "_frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    cap = cv2.VideoCapture(clip)
+    for i in range(frames):
+        ok, img = cap.read()
+        if not ok:
+            break
+        cv2.imwrite(os.path.join(frames_dir, f"frame_{i:05d}.png"), img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    cap.release()
+    out_mp4 = os.path.join(workdir, name + ".out.mp4")
+    seconds, peak, _ = timed(lambda: make_video.create_video(frames_dir, out_mp4, fps=30), repeat)
+    record("create_video", seconds, peak, frames)
+    shutil.rmtree(frames_dir, ignore_errors=True)
+
+    return {"name": name, "size": list(size), "frames": frames, "stages": stages,
+            "tracking_error": tracking_error(detections, xs, ys, size)}
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "opencv": cv2.__version__,
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def run(sizes, lengths, repeat=1, workers=0, seed=0, workdir=None, progress=None):
+    tmp = workdir or tempfile.mkdtemp(prefix="udrs_bench_")
+    os.makedirs(tmp, exist_ok=True)
+    cases = []
+    try:
+        for size in sizes:
+            for frames in lengths:
+                case = run_case(size, frames, tmp, repeat=repeat, workers=workers, seed=seed)
+                cases.append(case)
+                if progress is not None:
+                    progress(case)
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return {"environment": environment(), "settings": {"repeat": repeat, "workers": workers, "seed": seed,
+                                                        "track_size": list(TRACK_SIZE)},
+            "cases": cases, "process_peak_rss_mb": current_peak_mb()}
+
+# -------------------------------------------
+# Baseline comparison
+# -------------------------------------------
+def compare(result, baseline, fps_threshold=0.10, rss_threshold=0.25, error_threshold_px=1.0):
+    """
+    Regressions of `result` against `baseline`, per case present in both:
+    a stage's fps down by more than fps_threshold (fraction), its peak RSS up
+    by more than rss_threshold (fraction), or the mean tracking error up by
+    more than error_threshold_px. Returns (rows, regressions).
+    """
+    base = {c["name"]: c for c in baseline["cases"]}
+    rows, regressions = [], []
+    for case in result["cases"]:
+        b = base.get(case["name"])
+        if b is None:
+            continue
+        for stage, s in case["stages"].items():
+            bs = b["stages"].get(stage)
+            if bs is None or not bs["fps"] or not s["fps"]:
+                continue
+            fps_change = s["fps"] / bs["fps"] - 1.0
+            rss_change = s["peak_rss_mb"] / bs["peak_rss_mb"] - 1.0 if bs["peak_rss_mb"] else 0.0
+            row = {"case": case["name"], "metric": stage, "baseline_fps": bs["fps"], "fps": s["fps"],
+                   "fps_change": fps_change, "rss_change": rss_change}
+            rows.append(row)
+            if fps_change < -fps_threshold:
+                regressions.append(f"{case['name']} {stage}: {fps_change:+.1%} fps")
+            if rss_change > rss_threshold:
+                regressions.append(f"{case['name']} {stage}: {rss_change:+.1%} peak RSS")
+        e, be = case["tracking_error"]["mean_px"], b["tracking_error"]["mean_px"]
+        if e is not None and be is not None and e - be > error_threshold_px:
+            regressions.append(f"{case['name']} tracking error: {be:.2f} -> {e:.2f} px")
+        if be is not None and e is None:
+            regressions.append(f"{case['name']} tracking: ball no longer detected")
+    return rows, regressions
+
+def _size_list(text):
+    return [tuple(map(int, s.split("x"))) for s in text.split(",") if s]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic clips.")
+    parser.add_argument("--sizes", default=None, help="Comma-separated clip sizes WxH (default: 640x360,1280x720,1920x1080)")
+    parser.add_argument("--lengths", default=None, help="Comma-separated clip lengths in frames (default: 150,600)")
+    parser.add_argument("--quick", action="store_true", help="Small matrix for a fast check")
+    parser.add_argument("--repeat", type=int, default=1, help="Best of N runs per stage")
+    parser.add_argument("--workers", type=int, default=0, help="track_ball vision worker threads")
+    parser.add_argument("--seed", type=int, default=0, help="Clip generation seed")
+    parser.add_argument("--workdir", default=None, help="Keep the generated clips here (default: temp dir, deleted)")
+    parser.add_argument("--out", default="bench.json", help="Results JSON")
+    parser.add_argument("--baseline", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--fps-threshold", type=float, default=0.10, help="Allowed fps drop (fraction)")
+    parser.add_argument("--rss-threshold", type=float, default=0.25, help="Allowed peak RSS growth (fraction)")
+    parser.add_argument("--error-threshold", type=float, default=1.0, help="Allowed mean tracking error growth (px)")
+    args = parser.parse_args()
+
+    sizes = _size_list(args.sizes) if args.sizes else (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    lengths = ([int(n) for n in args.lengths.split(",")] if args.lengths
+               else (QUICK_LENGTHS if args.quick else DEFAULT_LENGTHS))
+
+    def show(case):
+        e = case["tracking_error"]
+        err = "no detections" if e["mean_px"] is None else f"err {e['mean_px']:.2f}px (p95 {e['p95_px']:.2f}), {e['detected']:.0%} detected"
+        print(f"{case['name']}: {err}")
+        for stage, s in case["stages"].items():
+            print(f"  {stage:<26} {s['seconds'] * 1000:9.2f} ms  {s['fps']:10.1f} fps  {s['peak_rss_mb']:7.1f} MB")
+
+    result = run(sizes, lengths, repeat=args.repeat, workers=args.workers, seed=args.seed,
+                 workdir=args.workdir, progress=show)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print("Saved", args.out)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(result, baseline, args.fps_threshold, args.rss_threshold, args.error_threshold)
+        for r in rows:
+            print(f"{r['case']:<16} {r['metric']:<26} {r['baseline_fps']:10.1f} -> {r['fps']:10.1f} fps "
+                  f"({r['fps_change']:+.1%}), RSS {r['rss_change']:+.1%}")
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("No regressions against", args.baseline)
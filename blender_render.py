@@ -1,49 +1,53 @@
-import bpy
-import json
+"""
+blender_render.py
+Render the 3D ball track in Blender (headless) to PNG frames in ./frames.
+
+Usage:
+    blender --background --python blender_render.py -- tracks.json output.mp4
+    blender --background --python blender_render.py -- tracks.json output.mp4 --profile preview --impact-window 30
+
+Every function takes the `bpy` module as its first argument, so scene
+construction can be exercised against a stub module outside Blender.
+"""
 import sys
 import os
 import math
+import argparse
 
-# -------------------------------------------
-# Parse arguments (Blender gives unknown args first)
-# -------------------------------------------
-argv = sys.argv
-argv = argv[argv.index("--") + 1:]
-
-tracks_path = argv[0]
-output_path = argv[1] if len(argv) > 1 else "animation.mp4"
+# track_store.py lives next to this script; Blender does not add it to sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from track_store import read_track_arrays
 
-# Output frames folder
-frames_dir = os.path.join(os.path.dirname(bpy.data.filepath), "frames")
-if not os.path.exists(frames_dir):
-    os.makedirs(frames_dir)
+# Render profiles: "final" keeps Blender's defaults, "preview" is for the live review loop
+RENDER_PROFILES = {
+    "final": {"resolution_percentage": 100, "samples": None, "frame_step": 1},
+    "preview": {"resolution_percentage": 40, "samples": 4, "frame_step": 2},
+}
 
 # -------------------------------------------
-# Reset scene
+# Scene
 # -------------------------------------------
-bpy.ops.wm.read_factory_settings(use_empty=True)
+def reset_scene(bpy):
+    bpy.ops.wm.read_factory_settings(use_empty=True)
 
-# -------------------------------------------
-# Create green ground + brown pitch
-# -------------------------------------------
-bpy.ops.mesh.primitive_plane_add(size=50)
-ground = bpy.context.active_object
-mat_ground = bpy.data.materials.new("GroundMat")
-mat_ground.diffuse_color = (0.05, 0.3, 0.05, 1)   # green grass tone
-ground.data.materials.append(mat_ground)
-
-# Pitch strip
-bpy.ops.mesh.primitive_plane_add(size=2, location=(0, -10, 0.01))
-pitch = bpy.context.active_object
-pitch.scale[1] = 10   # long pitch
-mat_pitch = bpy.data.materials.new("PitchMat")
-mat_pitch.diffuse_color = (0.45, 0.35, 0.25, 1)  # brownish pitch
-pitch.data.materials.append(mat_pitch)
+def create_ground(bpy):
+    """Green ground + brown pitch."""
+    bpy.ops.mesh.primitive_plane_add(size=50)
+    ground = bpy.context.active_object
+    mat_ground = bpy.data.materials.new("GroundMat")
+    mat_ground.diffuse_color = (0.05, 0.3, 0.05, 1)   # green grass tone
+    ground.data.materials.append(mat_ground)
 
-# -------------------------------------------
-# Create stumps
-# -------------------------------------------
-def create_stump(x_offset):
+    # Pitch strip
+    bpy.ops.mesh.primitive_plane_add(size=2, location=(0, -10, 0.01))
+    pitch = bpy.context.active_object
+    pitch.scale[1] = 10   # long pitch
+    mat_pitch = bpy.data.materials.new("PitchMat")
+    mat_pitch.diffuse_color = (0.45, 0.35, 0.25, 1)  # brownish pitch
+    pitch.data.materials.append(mat_pitch)
+    return ground, pitch
+
+def create_stump(bpy, x_offset):
     bpy.ops.mesh.primitive_cylinder_add(radius=0.03, depth=1.1, location=(x_offset, 0, 0.55))
     stump = bpy.context.active_object
     mat = bpy.data.materials.new("StumpMat")
@@ -51,59 +55,133 @@ def create_stump(x_offset):
     stump.data.materials.append(mat)
     return stump
 
-create_stump(-0.15)
-create_stump(0.0)
-create_stump(0.15)
+def create_ball(bpy):
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=0.12, location=(0, 15, 1))
+    ball = bpy.context.active_object
+    mat_ball = bpy.data.materials.new("BallMat")
+    mat_ball.diffuse_color = (0.8, 0.1, 0.1, 1)
+    ball.data.materials.append(mat_ball)
+    return ball
 
-# -------------------------------------------
-# Create ball
-# -------------------------------------------
-bpy.ops.mesh.primitive_uv_sphere_add(radius=0.12, location=(0, 15, 1))
-ball = bpy.context.active_object
-mat_ball = bpy.data.materials.new("BallMat")
-mat_ball.diffuse_color = (0.8, 0.1, 0.1, 1)
-ball.data.materials.append(mat_ball)
+def create_camera_and_light(bpy):
+    bpy.ops.object.camera_add(location=(4, -15, 5), rotation=(math.radians(75), 0, math.radians(30)))
+    cam = bpy.context.active_object
+    bpy.context.scene.camera = cam
 
-# -------------------------------------------
-# Load trajectory
-# -------------------------------------------
-with open(tracks_path, "r") as f:
-    tracks = json.load(f)
+    bpy.ops.object.light_add(type='SUN', location=(10, -10, 20))
+    sun = bpy.context.active_object
+    sun.data.energy = 5
+    return cam, sun
 
-# -------------------------------------------
-# Animate ball
-# -------------------------------------------
-for p in tracks:
-    frame = p["frame"]
-    ball.location = (p["x"], p["y"], p["z"])
-    ball.keyframe_insert(data_path="location", frame=frame)
+def build_scene(bpy):
+    """Ground, pitch, stumps, ball, camera and sun. Returns the ball object."""
+    reset_scene(bpy)
+    create_ground(bpy)
+    for x in (-0.15, 0.0, 0.15):
+        create_stump(bpy, x)
+    ball = create_ball(bpy)
+    create_camera_and_light(bpy)
+    return ball
 
 # -------------------------------------------
-# Camera setup
-# -------------------------------------------
-bpy.ops.object.camera_add(location=(4, -15, 5), rotation=(math.radians(75), 0, math.radians(30)))
-cam = bpy.context.active_object
-bpy.context.scene.camera = cam
+# Animation
+# -------------------------------------------
+def _location_fcurves(bpy, obj):
+    """Fresh location[0..2] F-curves on a new action assigned to `obj`."""
+    obj.animation_data_create()
+    action = bpy.data.actions.new(obj.name + "Action")
+    obj.animation_data.action = action
+    try:
+        # Blender 4.4+: F-curves live in a channelbag per action slot (required from 5.0)
+        from bpy_extras import anim_utils
+        slot = obj.animation_data.action_slot
+        if slot is None:
+            slot = action.slots.new(id_type='OBJECT', name=obj.name)
+            obj.animation_data.action_slot = slot
+        fcurves = anim_utils.action_ensure_channelbag_for_slot(action, slot).fcurves
+    except (ImportError, AttributeError):
+        fcurves = action.fcurves
+    return [fcurves.new("location", index=i) for i in range(3)]
 
-# -------------------------------------------
-# Lighting
-# -------------------------------------------
-bpy.ops.object.light_add(type='SUN', location=(10, -10, 20))
-sun = bpy.context.active_object
-sun.data.energy = 5
+def animate_ball(bpy, ball, frames, xs, ys, zs):
+    """
+    Keyframe ball.location at every track point in bulk: allocate all
+    keyframe points at once and set their (frame, value) pairs with one
+    foreach_set per axis, instead of one keyframe_insert per point.
+    """
+    n = len(frames)
+    for fc, values in zip(_location_fcurves(bpy, ball), (xs, ys, zs)):
+        co = [0.0] * (2 * n)
+        co[0::2] = [float(f) for f in frames]
+        co[1::2] = [float(v) for v in values]
+        fc.keyframe_points.add(n)
+        fc.keyframe_points.foreach_set("co", co)
+        fc.update()
 
 # -------------------------------------------
 # Render settings
 # -------------------------------------------
-scene = bpy.context.scene
-scene.render.image_settings.file_format = "PNG"
-scene.render.filepath = os.path.join(frames_dir, "frame_")
-scene.render.fps = 30
-scene.render.engine = "BLENDER_EEVEE"
+def impact_frame(cols):
+    """Frame where the track reaches the stumps (sub-frame, rounded), or None."""
+    from stump_geometry import intersect_stumps
+    impact = intersect_stumps(cols["frame"], cols["x"], cols["y"], cols["z"])
+    return None if impact is None else int(round(impact["frame"]))
 
-# -------------------------------------------
-# Render animation
-# -------------------------------------------
-scene.frame_start = tracks[0]["frame"]
-scene.frame_end = tracks[-1]["frame"]
-bpy.ops.render.render(animation=True)
+def frame_range(frames, impact=None, window=None):
+    """(start, end) to render: the whole track, or +/- window frames around the impact."""
+    start, end = int(frames[0]), int(frames[-1])
+    if window is not None and impact is not None:
+        start, end = max(start, impact - window), min(end, impact + window)
+    return start, end
+
+def setup_render(bpy, frames_dir, start, end, profile="final", fps=30):
+    p = RENDER_PROFILES[profile]
+    scene = bpy.context.scene
+    scene.render.image_settings.file_format = "PNG"
+    scene.render.filepath = os.path.join(frames_dir, "frame_")
+    scene.render.fps = fps
+    scene.render.engine = "BLENDER_EEVEE"
+    scene.render.resolution_percentage = p["resolution_percentage"]
+    if p["samples"] is not None:
+        scene.eevee.taa_render_samples = p["samples"]
+    scene.frame_start = start
+    scene.frame_end = end
+    scene.frame_step = p["frame_step"]
+    return scene
+
+def parse_args(argv):
+    # Blender passes its own arguments first; ours follow "--"
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    parser = argparse.ArgumentParser(prog="blender_render.py", description="Render the 3D ball track in Blender.")
+    parser.add_argument("tracks", help="3D tracks (.json or .trk)")
+    parser.add_argument("output", nargs="?", default="animation.mp4", help="Output video name (frames go to ./frames)")
+    parser.add_argument("--profile", choices=sorted(RENDER_PROFILES), default="final", help="Render quality profile")
+    parser.add_argument("--impact-window", type=int, default=None,
+                        help="Only render this many frames either side of the stumps impact")
+    parser.add_argument("--fps", type=int, default=30, help="Scene frame rate")
+    return parser.parse_args(argv)
+
+def main(bpy, argv):
+    args = parse_args(argv)
+
+    # Output frames folder
+    frames_dir = os.path.join(os.path.dirname(bpy.data.filepath), "frames")
+    if not os.path.exists(frames_dir):
+        os.makedirs(frames_dir)
+
+    ball = build_scene(bpy)
+
+    # .json or memory-mapped .trk
+    cols = read_track_arrays(args.tracks)
+    if not cols["meta"]["n"]:
+        raise SystemExit("No track points to render")
+    animate_ball(bpy, ball, cols["frame"], cols["x"], cols["y"], cols["z"])
+
+    impact = impact_frame(cols) if args.impact_window is not None else None
+    start, end = frame_range(cols["frame"], impact, args.impact_window)
+    setup_render(bpy, frames_dir, start, end, profile=args.profile, fps=args.fps)
+    bpy.ops.render.render(animation=True)
+
+if __name__ == "__main__":
+    import bpy
+    main(bpy, sys.argv)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+calibration.py
+Per-camera pitch calibration: a homography from image pixels to pitch
+metres (x lateral, y forward with the striker's stumps at y=0), fitted from
+clicked crease and stump points, with an optional one-coefficient radial
+lens distortion.
+
+Calibrations are fitted once per venue/camera and stored as JSON profiles
+in `calibrations/`. Applying one is a vectorised transform over whole track
+arrays. A dense per-pixel lookup table can also be precomputed once per
+tracking resolution and memory-mapped from disk; for a homography plus k1
+the direct transform is already about as cheap as the table lookup, so the
+table is opt-in (it pays off once the per-pixel model gets more expensive).
+
+Usage:
+    python calibration.py fit --camera lords_pav --points clicks.json --imgsize 1920x1080 --distortion
+    python calibration.py fit --camera lords_pav --click frame.png
+    python calibration.py lut --camera lords_pav --imgsize 960x540
+    python calibration.py apply --camera lords_pav --in raw_tracks.json --imgsize 960x540
+
+clicks.json maps landmark names (see LANDMARKS) to [u, v] pixels, or is a
+list of {"image": [u, v], "world": [x, y]} pairs.
+"""
+import os
+import copy
+import json
+import argparse
+import numpy as np
+
+CALIBRATION_DIR = "calibrations"
+
+# Pitch landmarks in metres (stumps 22.86 cm wide, popping crease 1.22 m in
+# front of the stumps, return creases 1.32 m either side of middle stump)
+LANDMARKS = {
+    "striker_off_stump": (0.1143, 0.0),
+    "striker_leg_stump": (-0.1143, 0.0),
+    "striker_popping_off": (1.32, 1.22),
+    "striker_popping_leg": (-1.32, 1.22),
+    "bowler_off_stump": (0.1143, 20.12),
+    "bowler_leg_stump": (-0.1143, 20.12),
+    "bowler_popping_off": (1.32, 18.90),
+    "bowler_popping_leg": (-1.32, 18.90),
+}
+
+def _undistort(u, v, k1, center, norm):
+    """First-order radial correction about `center`; radii are normalised by `norm` pixels."""
+    if not k1:
+        return u, v
+    du = (u - center[0]) / norm
+    dv = (v - center[1]) / norm
+    f = 1.0 + k1 * (du * du + dv * dv)
+    return center[0] + du * f * norm, center[1] + dv * f * norm
+
+def _apply_h(H, u, v):
+    w = H[2, 0] * u + H[2, 1] * v + H[2, 2]
+    return (H[0, 0] * u + H[0, 1] * v + H[0, 2]) / w, (H[1, 0] * u + H[1, 1] * v + H[1, 2]) / w
+
+def _fit_h(img, world, ransac):
+    import cv2
+    method = cv2.RANSAC if ransac else 0
+    H, _ = cv2.findHomography(img.astype(np.float64), world.astype(np.float64), method, 0.05)
+    if H is None:
+        raise ValueError("Homography fit failed: need at least 4 non-collinear points")
+    return H
+
+def fit_calibration(image_pts, world_pts, image_size, distortion=False, ransac=False, camera=None):
+    """
+    Fit a profile dict from >= 4 image points (pixels at `image_size`) and
+    their pitch coordinates (metres). With distortion=True the radial
+    coefficient k1 is chosen by a bounded 1D search on the reprojection error
+    (needs >= 5 points to be meaningful).
+    """
+    img = np.asarray(image_pts, dtype=float).reshape(-1, 2)
+    world = np.asarray(world_pts, dtype=float).reshape(-1, 2)
+    if len(img) < 4 or len(img) != len(world):
+        raise ValueError("Need at least 4 matching image/world points")
+    w, h = image_size
+    center = (w / 2.0, h / 2.0)
+    norm = float(np.hypot(w, h) / 2.0)
+
+    def residual(k1):
+        u, v = _undistort(img[:, 0], img[:, 1], k1, center, norm)
+        H = _fit_h(np.stack([u, v], axis=1), world, ransac)
+        x, y = _apply_h(H, u, v)
+        return float(np.sqrt(np.mean((x - world[:, 0]) ** 2 + (y - world[:, 1]) ** 2))), H
+
+    k1 = 0.0
+    if distortion and len(img) >= 5:
+        # golden-section search over a plausible barrel/pincushion range
+        a, b = -0.5, 0.5
+        g = (np.sqrt(5.0) - 1.0) / 2.0
+        c, d = b - g * (b - a), a + g * (b - a)
+        fc, fd = residual(c)[0], residual(d)[0]
+        for _ in range(40):
+            if fc < fd:
+                b, d, fd = d, c, fc
+                c = b - g * (b - a)
+                fc = residual(c)[0]
+            else:
+                a, c, fc = c, d, fd
+                d = a + g * (b - a)
+                fd = residual(d)[0]
+        k1 = (a + b) / 2.0
+        if residual(k1)[0] > residual(0.0)[0]:
+            k1 = 0.0
+    rms, H = residual(k1)
+    return {"camera": camera, "image_size": [int(w), int(h)], "H": H.tolist(), "k1": float(k1),
+            "center": list(center), "norm": norm, "rms_error_m": rms,
+            "points": {"image": img.tolist(), "world": world.tolist()}}
+
+def profile_path(camera, root=CALIBRATION_DIR):
+    if camera.endswith(".json") or os.sep in camera:
+        return camera
+    return os.path.join(root, camera + ".json")
+
+def save_profile(profile, camera=None, root=CALIBRATION_DIR):
+    path = profile_path(camera or profile["camera"], root)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+class Calibration:
+    """
+    A loaded profile. image_to_world() maps track arrays at any tracking
+    resolution (points are rescaled to the calibration resolution first).
+    With use_lut=True it samples the per-resolution lookup table instead,
+    building it on first use.
+    """
+    def __init__(self, profile, path=None, use_lut=False):
+        self.profile = profile
+        self.path = path
+        self.use_lut = bool(use_lut)
+        self.H = np.asarray(profile["H"], dtype=float)
+        self.k1 = float(profile.get("k1", 0.0))
+        self.size = tuple(profile["image_size"])
+        self.center = tuple(profile.get("center", (self.size[0] / 2.0, self.size[1] / 2.0)))
+        self.norm = float(profile.get("norm", np.hypot(*self.size) / 2.0))
+        self._luts = {}
+
+    @classmethod
+    def load(cls, camera, root=CALIBRATION_DIR, use_lut=False):
+        path = profile_path(camera, root)
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        cal = _LOADED.get(key)
+        if cal is None:
+            with open(path, "r") as f:
+                cal = cls(json.load(f), path)
+            _LOADED[key] = cal
+        if use_lut:
+            # the shared instance stays direct; the copy shares its tables
+            cal = copy.copy(cal)
+            cal.use_lut = True
+        return cal
+
+    def digest(self):
+        """Stable identity of the calibration (for cache keys)."""
+        from stage_cache import data_digest
+        return data_digest([self.H, self.k1, list(self.size)])
+
+    def mapping(self, image_size=None):
+        """How image_to_world maps pixels at image_size (for cache keys): direct or per-pixel table."""
+        if not self.use_lut:
+            return {"mode": "direct"}
+        w, h = (int(s) for s in (image_size or self.size))
+        return {"mode": "lut", "table": [w, h], "step": 1.0, "dtype": "float32"}
+
+    def _transform(self, u, v):
+        u, v = _undistort(u, v, self.k1, self.center, self.norm)
+        return _apply_h(self.H, u, v)
+
+    def image_to_world(self, xs_img, ys_img, image_size=None, lut=None):
+        """
+        Pixels (any array shape, NaN passes through) -> (x_m, y_m).
+        image_size is the resolution the track was measured at (default: the
+        calibration's). lut: a table from lut(), sampled bilinearly instead
+        of evaluating the transform (used for image_size when use_lut is set).
+        """
+        u = np.asarray(xs_img, dtype=float)
+        v = np.asarray(ys_img, dtype=float)
+        if lut is None and self.use_lut:
+            lut = self.lut(image_size or self.size)
+        if lut is not None:
+            return _sample_lut(lut, u, v)
+        return self._direct(u, v, image_size)
+
+    def _direct(self, u, v, image_size):
+        if image_size is not None and tuple(image_size) != self.size:
+            u = u * (self.size[0] / float(image_size[0]))
+            v = v * (self.size[1] / float(image_size[1]))
+        return self._transform(u, v)
+
+    def world_to_image(self, x_m, y_m, image_size=None, iterations=8):
+        """Inverse of image_to_world (direct transform, the lookup table is not used)."""
+        u, v = _apply_h(np.linalg.inv(self.H), np.asarray(x_m, dtype=float), np.asarray(y_m, dtype=float))
+        if self.k1:
+            # invert the radial correction by fixed-point iteration
+            cx, cy = self.center
+            du, dv = (u - cx) / self.norm, (v - cy) / self.norm
+            ru, rv = du, dv
+            for _ in range(iterations):
+                f = 1.0 + self.k1 * (du * du + dv * dv)
+                du, dv = ru / f, rv / f
+            u, v = cx + du * self.norm, cy + dv * self.norm
+        if image_size is not None and tuple(image_size) != self.size:
+            u = u * (float(image_size[0]) / self.size[0])
+            v = v * (float(image_size[1]) / self.size[1])
+        return u, v
+
+    def jacobian(self, x_img, y_img, image_size=None, eps=0.5):
+        """2x2 d(x_m, y_m)/d(u, v) at one pixel, by central differences."""
+        xs = np.array([x_img + eps, x_img - eps, x_img, x_img])
+        ys = np.array([y_img, y_img, y_img + eps, y_img - eps])
+        xm, ym = self.image_to_world(xs, ys, image_size)
+        return np.array([[xm[0] - xm[1], xm[2] - xm[3]],
+                         [ym[0] - ym[1], ym[2] - ym[3]]]) / (2.0 * eps)
+
+    def lut(self, image_size, root=None):
+        """
+        Dense planar (2, h, w) float32 table of pitch coordinates for every pixel at
+        `image_size`, built once and kept next to the profile as .npy (loaded
+        memory-mapped afterwards).
+        """
+        image_size = tuple(int(s) for s in image_size)
+        if image_size in self._luts:
+            return self._luts[image_size]
+        base = os.path.splitext(self.path)[0] if self.path else None
+        if root is not None and base is not None:
+            base = os.path.join(root, os.path.basename(base))
+        fn = f"{base}.{image_size[0]}x{image_size[1]}.{self.digest()[:12]}.lut.npy" if base else None
+        if fn and os.path.exists(fn):
+            table = np.load(fn, mmap_mode="r")
+        else:
+            w, h = image_size
+            vv, uu = np.mgrid[0:h, 0:w].astype(float)
+            xm, ym = self._direct(uu, vv, image_size)
+            table = np.stack([xm, ym]).astype(np.float32)
+            if fn:
+                tmp = fn + ".tmp.npy"
+                np.save(tmp, table)
+                os.replace(tmp, fn)
+        self._luts[image_size] = table
+        return table
+
+# process-wide cache of loaded profiles, keyed on (path, mtime)
+_LOADED = {}
+
+def _sample_lut(table, u, v):
+    """Bilinear lookup of (x_m, y_m) at fractional pixels; NaN outside the table."""
+    _, h, w = table.shape
+    ok = np.isfinite(u) & np.isfinite(v) & (u >= 0) & (v >= 0) & (u <= w - 1) & (v <= h - 1)
+    uc = np.where(ok, u, 0.0)
+    vc = np.where(ok, v, 0.0)
+    u0 = np.minimum(uc.astype(np.intp), w - 2)
+    v0 = np.minimum(vc.astype(np.intp), h - 2)
+    fu = uc - u0
+    fv = vc - v0
+    # flat gathers on each plane are much cheaper than 2D fancy indexing
+    i = v0 * w + u0
+    out = []
+    for plane in (table[0].reshape(-1), table[1].reshape(-1)):
+        a, b = plane.take(i), plane.take(i + 1)
+        c, d = plane.take(i + w), plane.take(i + w + 1)
+        val = (a + (b - a) * fu) * (1 - fv) + (c + (d - c) * fu) * fv
+        out.append(np.where(ok, val, np.nan))
+    return out[0], out[1]
+
+def click_points(image_path, names=tuple(LANDMARKS)):
+    """Let the user click each named landmark on a frame; returns {name: [u, v]} (Esc skips one)."""
+    import cv2
+    img = cv2.imread(image_path)
+    if img is None:
+        raise IOError(f"Cannot read image: {image_path}")
+    clicked = {}
+    state = {}
+    cv2.namedWindow("calibrate")
+    cv2.setMouseCallback("calibrate", lambda ev, x, y, *_: state.update(pt=(x, y)) if ev == cv2.EVENT_LBUTTONDOWN else None)
+    for name in names:
+        state.clear()
+        while "pt" not in state:
+            view = img.copy()
+            cv2.putText(view, f"Click: {name}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,255), 2)
+            for p in clicked.values():
+                cv2.circle(view, tuple(int(c) for c in p), 5, (0,0,255), -1)
+            cv2.imshow("calibrate", view)
+            if cv2.waitKey(20) == 27:
+                break
+        if "pt" in state:
+            clicked[name] = list(state["pt"])
+    cv2.destroyWindow("calibrate")
+    return clicked
+
+def _read_points(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        unknown = [k for k in data if k not in LANDMARKS]
+        if unknown:
+            raise ValueError(f"Unknown landmarks: {unknown}")
+        return [data[k] for k in data], [LANDMARKS[k] for k in data]
+    return [p["image"] for p in data], [p["world"] for p in data]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit, precompute or apply a per-camera pitch calibration.")
+    parser.add_argument("action", choices=["fit", "lut", "apply"])
+    parser.add_argument("--camera", required=True, help="Profile name (calibrations/<name>.json) or path")
+    parser.add_argument("--points", default=None, help="Clicked points JSON (fit)")
+    parser.add_argument("--click", default=None, help="Frame image to click landmarks on (fit)")
+    parser.add_argument("--imgsize", default=None, help="Calibration image size (fit) or tracking size (lut/apply) WxH")
+    parser.add_argument("--distortion", action="store_true", help="Also fit a radial distortion coefficient")
+    parser.add_argument("--ransac", action="store_true", help="Robust homography fit")
+    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Raw tracks to map (apply)")
+    parser.add_argument("--lut", action="store_true", help="Map through the lookup table (apply)")
+    args = parser.parse_args()
+
+    size = tuple(map(int, args.imgsize.split("x"))) if args.imgsize else None
+    if args.action == "fit":
+        if args.click:
+            import cv2
+            clicked = click_points(args.click)
+            img_pts, world_pts = list(clicked.values()), [LANDMARKS[k] for k in clicked]
+            if size is None:
+                frame = cv2.imread(args.click)
+                size = (frame.shape[1], frame.shape[0])
+        elif args.points:
+            img_pts, world_pts = _read_points(args.points)
+        else:
+            parser.error("fit needs --points or --click")
+        if size is None:
+            parser.error("fit needs --imgsize with --points")
+        profile = fit_calibration(img_pts, world_pts, size, distortion=args.distortion,
+                                  ransac=args.ransac, camera=args.camera)
+        path = save_profile(profile, args.camera)
+        print(f"Saved {path}: {len(img_pts)} points, k1={profile['k1']:.4f}, "
+              f"rms {profile['rms_error_m'] * 100:.1f} cm")
+    else:
+        cal = Calibration.load(args.camera, use_lut=args.lut)
+        size = size or cal.size
+        if args.action == "lut":
+            table = cal.lut(size)
+            print(f"Lookup table {size[0]}x{size[1]}: {table.nbytes / 1e6:.1f} MB")
+        else:
+            from track_store import read_track_arrays
+            raw = read_track_arrays(args.infile)
+            xm, ym = cal.image_to_world(raw["x"], raw["y"], size)
+            for f, x, y in list(zip(raw["frame"], xm, ym))[-5:]:
+                print(f"frame {int(f)}: x={x:.3f} m, y={y:.3f} m")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+decision_rules.py
+Declarative review rules (LBW, no-ball, waist-high no-ball, run-out,
+stumping, catch behind, boundary) evaluated as columnar NumPy masks.
+
+A rule set is plain data: decision name -> list of conditions
+{"column", "op", "value", "reason"}, all of which must hold. Rule sets can
+be kept as JSON next to the playing regulations and swapped without code
+changes. The engine evaluates every distinct condition once per block of
+rows and records, per decision, a bitmask of the conditions that failed;
+the verdict is `failed == 0` and the reasons for any row are decoded from
+the bitmask on demand, so explaining a call costs nothing until asked for.
+
+Usage:
+    python decision_rules.py --in reviews.npz --rules rules.json --explain 5
+    python decision_rules.py --synthetic 5000000
+"""
+import json
+import time
+import argparse
+import numpy as np
+
+# Thresholds as used by the UDRS notebook (enhanced_udrs_with_extra_decisions.py)
+DEFAULT_RULES = {
+    "lbw": [
+        {"column": "snick_peak", "op": "<", "value": 0.2, "reason": "no bat contact"},
+        {"column": "stump_hit_prob", "op": ">", "value": 0.5, "reason": "ball would hit the stumps"},
+        {"column": "impact_x", "op": "between", "value": [3, 7], "reason": "impact in line with the stumps"},
+    ],
+    "no_ball": [
+        {"column": "foot_position", "op": ">", "value": 0.6, "reason": "front foot over the popping crease"},
+    ],
+    "no_ball_waist": [
+        {"column": "ball_height_at_batsman", "op": ">", "value": 1.2, "reason": "full toss above waist height"},
+    ],
+    "run_out": [
+        {"column": "bat_in_crease", "op": "==", "value": 0, "reason": "bat short of the crease"},
+        {"column": "bails_removed", "op": "==", "value": 1, "reason": "bails removed"},
+    ],
+    "stumping": [
+        {"column": "foot_outside_crease", "op": "==", "value": 1, "reason": "foot outside the crease"},
+        {"column": "bails_removed_stump", "op": "==", "value": 1, "reason": "bails removed by the keeper"},
+    ],
+    "catch_behind": [
+        {"column": "snick_detected", "op": "==", "value": 1, "reason": "edge detected"},
+        {"column": "caught_by_keeper", "op": "==", "value": 1, "reason": "caught by the keeper"},
+    ],
+    "boundary": [
+        {"column": "ball_distance_from_rope", "op": "<=", "value": 0, "reason": "ball reached the rope"},
+    ],
+}
+
+# "between" is the open interval lo < x < hi
+OPS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+
+def load_rules(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def _check(rules):
+    for name, conds in rules.items():
+        if not 0 < len(conds) <= 32:
+            raise ValueError(f"Rule {name!r} needs 1-32 conditions")
+        for c in conds:
+            if c["op"] not in OPS and c["op"] != "between":
+                raise ValueError(f"Rule {name!r}: unknown op {c['op']!r}")
+
+class RuleEngine:
+    """
+    Compiled rule set. evaluate() takes any column mapping (dict of arrays,
+    np.load()ed .npz, pandas DataFrame) and returns
+    {"decisions": {name: bool array}, "failed": {name: uint32 bitmask}}
+    where bit k of failed[name] is set when condition k of that rule failed.
+    """
+    def __init__(self, rules=None, block=1 << 16):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        _check(self.rules)
+        self.block = block
+        # distinct (column, op, value) conditions, each evaluated once per block
+        self.conditions = []
+        index = {}
+        self._uses = []     # (condition index, decision name, bit number)
+        for name, conds in self.rules.items():
+            for k, c in enumerate(conds):
+                key = (c["column"], c["op"], json.dumps(c["value"]))
+                if key not in index:
+                    index[key] = len(self.conditions)
+                    self.conditions.append(c)
+                self._uses.append((index[key], name, np.uint32(k)))
+
+    @property
+    def columns(self):
+        return sorted({c["column"] for c in self.conditions})
+
+    def _holds(self, c, x):
+        if c["op"] == "between":
+            lo, hi = c["value"]
+            return (x > lo) & (x < hi)
+        return OPS[c["op"]](x, c["value"])
+
+    def evaluate(self, columns):
+        cols = {c: np.asarray(columns[c]) for c in self.columns}
+        n = len(next(iter(cols.values())))
+        failed = {name: np.zeros(n, dtype=np.uint32) for name in self.rules}
+        # blocks keep the per-condition temporaries in cache
+        for s in range(0, n, self.block):
+            e = min(n, s + self.block)
+            miss = [(~self._holds(c, cols[c["column"]][s:e])).astype(np.uint32) for c in self.conditions]
+            for ci, name, k in self._uses:
+                failed[name][s:e] |= miss[ci] << k
+        return {"decisions": {name: f == 0 for name, f in failed.items()}, "failed": failed}
+
+    def explain(self, result, i):
+        """
+        Reasons for row i: {name: (verdict, [reasons])}. The reasons are the
+        rule's conditions when the verdict is True, else the conditions that failed.
+        """
+        out = {}
+        for name, conds in self.rules.items():
+            f = int(result["failed"][name][i])
+            if f == 0:
+                out[name] = (True, [c["reason"] for c in conds])
+            else:
+                out[name] = (False, [c["reason"] for k, c in enumerate(conds) if f >> k & 1])
+        return out
+
+    def summary(self, result):
+        """Per decision: rows given, and how many rows failed each of its conditions."""
+        out = {}
+        for name, conds in self.rules.items():
+            f = result["failed"][name]
+            out[name] = {"given": int(np.count_nonzero(f == 0)),
+                         "failed": {c["reason"]: int(np.count_nonzero(f & np.uint32(1 << k)))
+                                    for k, c in enumerate(conds)}}
+        return out
+
+def synthetic_reviews(n, seed=0):
+    """Random columns for every default rule (the notebook's simulated distributions)."""
+    rng = np.random.default_rng(seed)
+    return {
+        "impact_x": rng.uniform(0, 10, n), "stump_hit_prob": rng.random(n), "snick_peak": rng.random(n),
+        "foot_position": rng.random(n), "ball_height_at_batsman": rng.uniform(0.5, 2.0, n),
+        "bat_in_crease": rng.integers(0, 2, n, dtype=np.int8), "bails_removed": rng.integers(0, 2, n, dtype=np.int8),
+        "foot_outside_crease": rng.integers(0, 2, n, dtype=np.int8),
+        "bails_removed_stump": rng.integers(0, 2, n, dtype=np.int8),
+        "snick_detected": rng.integers(0, 2, n, dtype=np.int8), "caught_by_keeper": rng.integers(0, 2, n, dtype=np.int8),
+        "ball_distance_from_rope": rng.uniform(-1, 5, n),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the review rules over a columnar dataset.")
+    parser.add_argument("--in", dest="infile", default=None, help="Columns as .npz (one array per column)")
+    parser.add_argument("--rules", default=None, help="Rule set JSON (default: built-in thresholds)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Evaluate N random rows instead of --in")
+    parser.add_argument("--explain", type=int, default=0, help="Print the reasons for the first N rows")
+    args = parser.parse_args()
+
+    engine = RuleEngine(load_rules(args.rules) if args.rules else None)
+    if args.infile:
+        columns = np.load(args.infile)
+    elif args.synthetic:
+        columns = synthetic_reviews(args.synthetic)
+    else:
+        parser.error("need --in or --synthetic")
+    t0 = time.perf_counter()
+    result = engine.evaluate(columns)
+    dt = time.perf_counter() - t0
+    n = len(next(iter(result["failed"].values())))
+    print(f"{n} rows x {len(engine.rules)} decisions in {dt:.3f}s ({n / max(dt, 1e-9) / 1e6:.1f} M rows/s)")
+    print(json.dumps(engine.summary(result), indent=2))
+    for i in range(min(args.explain, n)):
+        print(i, engine.explain(result, i))
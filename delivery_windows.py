@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+delivery_windows.py
+Cheap pre-pass that finds candidate delivery windows in a broadcast clip,
+so the tracker can grab() past replays, crowd shots and run-ups.
+
+Every `step`-th frame is retrieved as a small grayscale thumbnail. A scene
+cut is flagged when the thumbnail histogram changes abruptly; within each
+shot, runs of sustained frame-difference motion become candidate windows.
+
+Usage:
+    python delivery_windows.py input_video.mp4 --out windows.json
+"""
+import cv2
+import numpy as np
+import json
+import argparse
+
+def _thumbnail(frame, thumb):
+    small = cv2.resize(frame, thumb, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+def _runs(mask):
+    """(start, stop) index pairs of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+def find_delivery_windows(video_path, thumb=(128,72), step=2, max_frames=None,
+                          pixel_thresh=8, motion_frac=2e-4, cut_thresh=0.5,
+                          min_seconds=0.4, max_seconds=8.0, pad_seconds=0.33, fps=None):
+    """
+    Returns a sorted list of (start, stop) frame ranges (stop exclusive).
+
+    pixel_thresh:  thumbnail difference (0..255) at which a pixel counts as changed.
+    motion_frac:   fraction of changed pixels that makes a sample "moving";
+                   the default is a couple of thumbnail pixels, i.e. the ball.
+    cut_thresh:    histogram correlation below which two samples are in different shots.
+    min_seconds/max_seconds: accepted window length; longer runs are crowd
+                   or camera pans rather than a delivery.
+    pad_seconds:   margin added on both sides of a window.
+    fps:           clip frame rate used to turn seconds into frames (default: from the file).
+
+    An empty list means no run looked like a delivery; track the whole clip then.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    max_frames = frame_count if max_frames is None else min(frame_count, max_frames)
+    fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+    min_len = int(round(min_seconds * fps))
+    max_len = int(round(max_seconds * fps))
+    pad = int(round(pad_seconds * fps))
+
+    idx = []
+    motion = []
+    cuts = []
+    prev = None
+    prev_hist = None
+    for i in range(max_frames):
+        if not cap.grab():
+            break
+        if i % step:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        g = _thumbnail(frame, thumb)
+        hist = cv2.calcHist([g], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+        if prev is None:
+            diff, cut = 0.0, True
+        else:
+            diff = np.count_nonzero(cv2.absdiff(g, prev) > pixel_thresh) / float(g.size)
+            cut = cv2.compareHist(prev_hist, hist, cv2.HISTCMP_CORREL) < cut_thresh
+        idx.append(i)
+        motion.append(diff)
+        cuts.append(cut)
+        prev, prev_hist = g, hist
+    cap.release()
+
+    if not idx:
+        return []
+    idx = np.array(idx)
+    motion = np.array(motion)
+    shot_starts = np.flatnonzero(cuts).tolist() + [len(idx)]
+    n_frames = int(idx[-1]) + 1
+
+    windows = []
+    for a, b in zip(shot_starts[:-1], shot_starts[1:]):
+        # the cut sample itself differs from a different shot; ignore its motion
+        active = motion[a:b] > motion_frac
+        active[0] = False
+        for s, e in _runs(active):
+            start = int(idx[a + s])
+            stop = int(idx[a + e - 1]) + step
+            if min_len <= stop - start <= max_len:
+                windows.append((max(0, start - pad), min(n_frames, stop + pad)))
+
+    merged = []
+    for s, e in sorted(windows):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find candidate delivery windows in a clip.")
+    parser.add_argument("video", help="Input video path")
+    parser.add_argument("--out", default=None, help="Optional JSON output")
+    parser.add_argument("--step", type=int, default=2, help="Sample every N frames")
+    args = parser.parse_args()
+
+    windows = find_delivery_windows(args.video, step=args.step)
+    for s, e in windows:
+        print(f"frames {s}..{e - 1}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump([list(w) for w in windows], f, indent=2)
+        print("Saved windows to", args.out)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+drs_inference.py
+Low-latency predictions from a saved drs_models.py artifact.
+
+Predictor loads a version once (process-wide) and takes raw NumPy feature
+rows in drs_models.FEATURES order. Tree ensembles (random forest) and
+binary logistic regression are compiled to flat NumPy arrays, so a
+prediction is a handful of vectorised array operations over all trees at
+once instead of sklearn's per-call validation and per-tree dispatch; other
+models, including a single decision tree (one deep tree walks faster in
+sklearn's compiled code than level by level in NumPy), use their own
+predict_proba. --compare times both paths.
+
+MicroBatcher sits in front of a Predictor for concurrent callers: requests
+arriving within `max_wait_ms` of each other (up to `max_batch`) are
+answered by one vectorised call. Both keep p50/p99 latency statistics.
+
+Usage:
+    python drs_inference.py --models models --model "Random Forest" --requests 20000 --clients 8
+    python drs_inference.py --models models --compare --requests 2000
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+from drs_models import MODEL_DIR, FEATURES, load_artifacts, resolve_version
+
+class LatencyStats:
+    """Rolling window of request latencies (seconds)."""
+    def __init__(self, maxlen=100000):
+        self._lat = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._lat.append(seconds)
+
+    def summary(self):
+        with self._lock:
+            lat = np.array(self._lat)
+        if not len(lat):
+            return {"count": 0, "p50_us": None, "p99_us": None, "mean_us": None}
+        p50, p99 = np.percentile(lat, [50, 99]) * 1e6
+        return {"count": int(len(lat)), "p50_us": float(p50), "p99_us": float(p99),
+                "mean_us": float(lat.mean() * 1e6)}
+
+class TreeEnsemble:
+    """
+    Decision trees flattened into padded (trees, nodes) arrays. All trees
+    are walked together one level per step; leaves point at themselves.
+    """
+    def __init__(self, trees):
+        T = len(trees)
+        M = max(t.node_count for t in trees)
+        C = trees[0].value.shape[2]
+        self.depth = max(t.max_depth for t in trees)
+        base = np.arange(T)[:, None] * M
+        self.left = np.tile(np.arange(M), (T, 1)) + base
+        self.right = self.left.copy()
+        self.feature = np.zeros((T, M), dtype=np.intp)
+        self.threshold = np.full((T, M), np.inf)
+        self.value = np.zeros((T, M, C))
+        for k, t in enumerate(trees):
+            n = t.node_count
+            split = t.children_left[:n] != -1
+            self.left[k, :n] = np.where(split, t.children_left[:n] + k * M, self.left[k, :n])
+            self.right[k, :n] = np.where(split, t.children_right[:n] + k * M, self.right[k, :n])
+            self.feature[k, :n] = np.where(split, t.feature[:n], 0)
+            self.threshold[k, :n] = np.where(split, t.threshold[:n], np.inf)
+            v = t.value[:n, 0, :]
+            self.value[k, :n] = v / np.maximum(v.sum(axis=1, keepdims=True), 1e-300)
+        self.left, self.right = self.left.ravel(), self.right.ravel()
+        self.feature, self.threshold = self.feature.ravel(), self.threshold.ravel()
+        self.value = self.value.reshape(T * M, C)
+        self.roots = base[:, 0]
+
+    def predict_proba(self, X):
+        # sklearn compares float32 features against the stored thresholds
+        X = np.asarray(X, dtype=np.float32)
+        n, F = X.shape
+        flat = X.ravel()
+        node = np.repeat(self.roots[:, None], n, axis=1)
+        offs = np.arange(n) * F
+        for _ in range(self.depth):
+            go_left = flat[offs + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=0)
+
+def compile_model(model):
+    """Fast predict_proba(X) for `model` (X already scaled if the model needs it)."""
+    estimators = getattr(model, "estimators_", None)
+    if estimators is not None and len(estimators) > 1 and all(hasattr(e, "tree_") for e in estimators):
+        return TreeEnsemble([e.tree_ for e in estimators]).predict_proba
+    coef = getattr(model, "coef_", None)
+    if (coef is not None and coef.shape[0] == 1 and getattr(model, "loss", "log_loss") == "log_loss"
+            and type(model).__name__ in ("LogisticRegression", "SGDClassifier")):
+        w, b = coef[0].copy(), float(model.intercept_[0])
+
+        def linear(X):
+            p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+            return np.stack([1.0 - p, p], axis=1)
+        return linear
+    return model.predict_proba
+
+# loaded artifacts, keyed on (absolute root, version)
+_LOADED = {}
+
+class Predictor:
+    """One model of a saved artifact version (default: LATEST), ready to serve."""
+    def __init__(self, root=MODEL_DIR, version=None, model="Random Forest", compiled=True):
+        version = resolve_version(root, version)
+        key = (os.path.abspath(root), version)
+        if key not in _LOADED:
+            _LOADED[key] = load_artifacts(root, version)
+        art = _LOADED[key]
+        if model not in art["models"]:
+            raise KeyError(f"Model {model!r} not in version {version}: {sorted(art['models'])}")
+        self.version = version
+        self.name = model
+        self.model = art["models"][model]
+        self.classes = np.asarray(self.model.classes_)
+        self.n_features = len(art["manifest"]["features"])
+        scaler = art["scaler"] if model in art["manifest"]["scaled"] else None
+        self._mean = None if scaler is None else scaler.mean_.copy()
+        self._scale = None if scaler is None else scaler.scale_.copy()
+        self._proba = compile_model(self.model) if compiled else self.model.predict_proba
+        self.latency = LatencyStats()
+
+    def predict_proba(self, X):
+        """Class probabilities for raw feature rows: (F,) or (n, F) -> (n, classes)."""
+        t0 = time.perf_counter()
+        X = np.asarray(X, dtype=float).reshape(-1, self.n_features)
+        if self._mean is not None:
+            X = (X - self._mean) / self._scale
+        p = self._proba(X)
+        self.latency.record(time.perf_counter() - t0)
+        return p
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+def compare_latency(X, root=MODEL_DIR, version=None):
+    """
+    Single-row latency of every model in a version, served (compile_model)
+    vs plain sklearn predict_proba: {name: (served summary, sklearn summary)}.
+    """
+    version = resolve_version(root, version)
+    out = {}
+    for name in sorted(load_artifacts(root, version)["models"]):
+        out[name] = []
+        for compiled in (True, False):
+            p = Predictor(root, version, name, compiled=compiled)
+            for x in X:
+                p.predict_proba(x)
+            out[name].append(p.latency.summary())
+    return out
+
+class MicroBatcher:
+    """
+    Thread-safe front end for concurrent single-delivery requests: a worker
+    thread collects requests for up to `max_wait_ms` (or `max_batch` rows)
+    after the first one arrives and answers them with one call of `fn`
+    (e.g. Predictor.predict_proba). latency covers queueing + batching + compute.
+    """
+    def __init__(self, fn, max_batch=64, max_wait_ms=0.2):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.latency = LatencyStats()
+        self.batches = 0
+        self._q = queue.Queue()
+        self._worker = threading.Thread(target=self._loop, daemon=True)
+        self._worker.start()
+
+    def submit(self, x):
+        """Queue one feature row (or a small (k, F) block); returns a Future of its result rows."""
+        fut = Future()
+        self._q.put((time.perf_counter(), np.atleast_2d(np.asarray(x, dtype=float)), fut))
+        return fut
+
+    def __call__(self, x, timeout=None):
+        return self.submit(x).result(timeout)
+
+    def _loop(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[1])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                try:
+                    nxt = self._q.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._q.put(None)
+                    break
+                batch.append(nxt)
+                rows += len(nxt[1])
+            try:
+                out = self.fn(np.concatenate([b[1] for b in batch]))
+            except Exception as exc:
+                for _, _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            self.batches += 1
+            i = 0
+            now = time.perf_counter()
+            for t0, x, fut in batch:
+                fut.set_result(out[i:i + len(x)])
+                i += len(x)
+                self.latency.record(now - t0)
+
+    def close(self):
+        self._q.put(None)
+        self._worker.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve (and time) DRS model predictions.")
+    parser.add_argument("--models", default=MODEL_DIR, help="Artifact root directory")
+    parser.add_argument("--version", default=None, help="Model version (default: LATEST)")
+    parser.add_argument("--model", default="Random Forest", help="Model name")
+    parser.add_argument("--requests", type=int, default=20000, help="Single-row requests to time")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads for the batched run")
+    parser.add_argument("--max-batch", type=int, default=64, help="Micro-batch size limit")
+    parser.add_argument("--max-wait-ms", type=float, default=0.2, help="Micro-batch collection window")
+    parser.add_argument("--compare", action="store_true",
+                        help="Time single-row p50/p99 of the served path against plain sklearn for every model")
+    args = parser.parse_args()
+
+    from drs_models import synthetic_dataset
+    X, _ = synthetic_dataset(args.requests, seed=7)
+    if args.compare:
+        print(f"{'model':<22}{'served p50':>12}{'sklearn p50':>13}{'served p99':>12}{'sklearn p99':>13}")
+        for name, s in compare_latency(X, args.models, args.version).items():
+            print(f"{name:<22}{s[0]['p50_us']:>10.0f}us{s[1]['p50_us']:>11.0f}us"
+                  f"{s[0]['p99_us']:>10.0f}us{s[1]['p99_us']:>11.0f}us")
+        raise SystemExit(0)
+    pred = Predictor(args.models, args.version, args.model)
+    print(f"{pred.name} ({pred.version})")
+
+    t0 = time.perf_counter()
+    for x in X:
+        pred.predict_proba(x)
+    dt = time.perf_counter() - t0
+    s = pred.latency.summary()
+    print(f"direct:  {len(X) / dt:,.0f} req/s, p50 {s['p50_us']:.0f} us, p99 {s['p99_us']:.0f} us")
+
+    batcher = MicroBatcher(pred.predict_proba, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    def client(rows):
+        for x in rows:
+            batcher(x)
+
+    threads = [threading.Thread(target=client, args=(X[k::args.clients],)) for k in range(args.clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dt = time.perf_counter() - t0
+    batcher.close()
+    s = batcher.latency.summary()
+    print(f"batched: {len(X) / dt:,.0f} req/s over {args.clients} clients, {len(X) / max(batcher.batches, 1):.1f} rows/batch, "
+          f"p50 {s['p50_us']:.0f} us, p99 {s['p99_us']:.0f} us")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+drs_models.py
+Train the DRS review classifiers (SVM, decision tree, random forest,
+logistic regression) once and save them, with the StandardScaler used by
+the SVM and logistic regression, as a versioned artifact directory:
+
+    models/<version>/manifest.json      features, metrics, library versions, file digests
+    models/<version>/scaler.joblib
+    models/<version>/<model>.joblib
+    models/LATEST                       name of the newest version
+
+drs_inference.py loads an artifact once and serves predictions from it, so
+nothing is retrained per delivery.
+
+Usage:
+    python drs_models.py train --out models
+    python drs_models.py train --data features.npz --version 2025-season
+    python drs_models.py train --data synthetic_deliveries --svm-rows 20000
+    python drs_models.py list --out models
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+MODEL_DIR = "models"
+
+# Column order of the feature matrix (enhanced_udrs_with_extra_decisions.py)
+FEATURES = ["impact_x", "impact_y", "angle", "stump_hit_prob", "bat_distance", "snick_peak", "umpire_decision"]
+
+# Models trained on standardised features
+SCALED = ("SVM", "Logistic Regression")
+
+def synthetic_dataset(n_samples=1000, seed=42):
+    """The notebook's synthetic review set as (X, y) arrays (same draws for the same seed)."""
+    rs = np.random.RandomState(seed)
+    cols = {
+        "impact_x": rs.uniform(0, 10, n_samples),
+        "impact_y": rs.uniform(0, 22, n_samples),
+        "angle": rs.uniform(0, 90, n_samples),
+        "stump_hit_prob": rs.rand(n_samples),
+        "bat_distance": rs.uniform(0, 1, n_samples),
+        "snick_peak": rs.uniform(0, 1, n_samples),
+        "umpire_decision": rs.randint(0, 2, n_samples),
+    }
+    X = np.stack([cols[f] for f in FEATURES], axis=1).astype(float)
+    y = (cols["stump_hit_prob"] > 0.5).astype(int) ^ cols["umpire_decision"]
+    return X, y
+
+def make_svm(seed=42):
+    """SVC with Platt-scaled probabilities (what SVC(probability=True) did before its deprecation)."""
+    from sklearn.svm import SVC
+    from sklearn.calibration import CalibratedClassifierCV
+    return CalibratedClassifierCV(SVC(random_state=seed), ensemble=False)
+
+def make_models(seed=42):
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    return {
+        "SVM": make_svm(seed),
+        "Decision Tree": DecisionTreeClassifier(random_state=seed),
+        "Random Forest": RandomForestClassifier(random_state=seed),
+        "Logistic Regression": LogisticRegression(),
+    }
+
+def train_models(X, y, test_size=0.2, seed=42):
+    """
+    Fit every model on a train split (the notebook's split for the same
+    seed). Returns (models, scaler, metrics) with held-out accuracy per model.
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+    scaler = StandardScaler().fit(X_train)
+    models = make_models(seed)
+    metrics = {}
+    for name, model in models.items():
+        scaled = name in SCALED
+        model.fit(scaler.transform(X_train) if scaled else X_train, y_train)
+        acc = model.score(scaler.transform(X_test) if scaled else X_test, y_test)
+        metrics[name] = {"accuracy": float(acc)}
+    return models, scaler, metrics
+
+def train_from_dataset(path, max_rows=None, test_size=0.2, chunk_rows=500000, svm_rows=20000,
+                       tree_rows=200000, n_trees=100, seed=42):
+    """
+    train_models for a synthetic_deliveries.py dataset directory, without
+    loading it into RAM. The last `test_size` of the rows are held out.
+
+    The scaler, the logistic regression (SGD with log loss, partial_fit) and
+    the random forest (warm start: a share of the `n_trees` trees fitted on
+    each chunk, each on at most `tree_rows` bootstrap rows) stream over the
+    training rows in chunks of `chunk_rows`. The SVM and the decision tree,
+    which cannot learn incrementally, are fitted on uniform row samples of
+    `svm_rows` and `tree_rows`. Accuracy is
+    measured on a sample of at most `tree_rows` held-out rows.
+    """
+    from sklearn.tree import DecisionTreeClassifier
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+    from synthetic_deliveries import open_dataset
+    ds = open_dataset(path, FEATURES + ["review_result"])
+    n = ds.pop("manifest")["rows"]
+    n = n if max_rows is None else min(n, max_rows)
+    n_train = int(round(n * (1.0 - test_size)))
+    rng = np.random.default_rng(seed)
+    classes = np.array([0, 1])
+
+    def rows(idx_or_slice):
+        X = np.stack([np.asarray(ds[f][idx_or_slice], dtype=float) for f in FEATURES], axis=1)
+        return X, np.asarray(ds["review_result"][idx_or_slice], dtype=int)
+
+    def sample(lo, hi, k):
+        # sorted indices: the memory-mapped columns are read in one forward sweep
+        return np.sort(rng.choice(np.arange(lo, hi), size=min(k, hi - lo), replace=False))
+
+    chunks = [slice(s, min(s + chunk_rows, n_train)) for s in range(0, n_train, chunk_rows)]
+    scaler = StandardScaler()
+    for c in chunks:
+        scaler.partial_fit(rows(c)[0])
+
+    logreg = SGDClassifier(loss="log_loss", random_state=seed)
+    per_chunk = -(-n_trees // len(chunks))
+    forest = RandomForestClassifier(n_estimators=0, warm_start=True, random_state=seed)
+    for c in chunks:
+        X, y = rows(c)
+        logreg.partial_fit(scaler.transform(X), y, classes=classes)
+        forest.n_estimators = min(n_trees, forest.n_estimators + per_chunk)
+        if forest.n_estimators > len(getattr(forest, "estimators_", [])):
+            forest.max_samples = min(tree_rows, len(y))
+            forest.fit(X, y)
+
+    X, y = rows(sample(0, n_train, svm_rows))
+    svm = make_svm(seed).fit(scaler.transform(X), y)
+    X, y = rows(sample(0, n_train, tree_rows))
+    tree = DecisionTreeClassifier(random_state=seed).fit(X, y)
+
+    models = {"SVM": svm, "Decision Tree": tree, "Random Forest": forest, "Logistic Regression": logreg}
+    X_test, y_test = rows(sample(n_train, n, tree_rows))
+    metrics = {name: {"accuracy": float(m.score(scaler.transform(X_test) if name in SCALED else X_test, y_test))}
+               for name, m in models.items()}
+    return models, scaler, metrics
+
+def model_file(name):
+    return name.lower().replace(" ", "_") + ".joblib"
+
+def _sha256(path):
+    from stage_cache import file_digest
+    return file_digest(path)
+
+def save_artifacts(models, scaler, metrics=None, root=MODEL_DIR, version=None, params=None, latest=True):
+    """Write a new artifact version and (if `latest`) point LATEST at it. Returns the version name."""
+    import joblib
+    import sklearn
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    out = os.path.join(root, version)
+    if os.path.exists(out):
+        raise FileExistsError(f"Model version already exists: {out}")
+    tmp = out + ".tmp"
+    os.makedirs(tmp)
+    files = {"scaler": "scaler.joblib"}
+    joblib.dump(scaler, os.path.join(tmp, files["scaler"]))
+    for name, model in models.items():
+        files[name] = model_file(name)
+        joblib.dump(model, os.path.join(tmp, files[name]))
+    manifest = {"version": version, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "features": FEATURES,
+                "scaled": [n for n in models if n in SCALED], "files": files,
+                "sha256": {k: _sha256(os.path.join(tmp, f)) for k, f in files.items()},
+                "metrics": metrics or {}, "params": params or {},
+                "sklearn": sklearn.__version__, "numpy": np.__version__}
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    # a half-written version is never visible under its final name
+    os.replace(tmp, out)
+    if latest:
+        path = os.path.join(root, "LATEST")
+        with open(path + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(path + ".tmp", path)
+    return version
+
+def list_versions(root=MODEL_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root)
+                  if os.path.exists(os.path.join(root, d, "manifest.json")))
+
+def resolve_version(root=MODEL_DIR, version=None):
+    if version is None:
+        try:
+            with open(os.path.join(root, "LATEST"), "r") as f:
+                version = f.read().strip()
+        except OSError:
+            raise FileNotFoundError(f"No trained models in {root}: run `python drs_models.py train`")
+    return version
+
+def load_artifacts(root=MODEL_DIR, version=None, names=None):
+    """{"version", "manifest", "scaler", "models": {name: model}} for a version (default: LATEST)."""
+    import joblib
+    version = resolve_version(root, version)
+    path = os.path.join(root, version)
+    with open(os.path.join(path, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    files = manifest["files"]
+    wanted = [n for n in files if n != "scaler" and (names is None or n in names)]
+    return {"version": version, "manifest": manifest,
+            "scaler": joblib.load(os.path.join(path, files["scaler"])),
+            "models": {n: joblib.load(os.path.join(path, files[n])) for n in wanted}}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and version the DRS review classifiers.")
+    parser.add_argument("action", choices=["train", "list"])
+    parser.add_argument("--out", default=MODEL_DIR, help="Artifact root directory")
+    parser.add_argument("--version", default=None, help="Version name (default: timestamp)")
+    parser.add_argument("--data", default=None,
+                        help="Training set: .npz with X (n, features) and y, or a synthetic_deliveries.py dataset directory")
+    parser.add_argument("--max-rows", type=int, default=None, help="Train on the first N rows of --data")
+    parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows per streamed chunk of a dataset directory")
+    parser.add_argument("--svm-rows", type=int, default=20000, help="Sampled rows for the SVM on a dataset directory")
+    parser.add_argument("--samples", type=int, default=1000, help="Synthetic training rows")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    if args.action == "list":
+        latest = None
+        try:
+            latest = resolve_version(args.out)
+        except FileNotFoundError:
+            pass
+        for v in list_versions(args.out):
+            with open(os.path.join(args.out, v, "manifest.json"), "r") as f:
+                m = json.load(f)
+            accs = ", ".join(f"{n} {s['accuracy']:.2f}" for n, s in m["metrics"].items())
+            print(("* " if v == latest else "  ") + v, accs)
+    else:
+        t0 = time.perf_counter()
+        if args.data and os.path.isdir(args.data):
+            models, scaler, metrics = train_from_dataset(args.data, max_rows=args.max_rows, chunk_rows=args.chunk_rows,
+                                                         svm_rows=args.svm_rows, seed=args.seed)
+            with open(os.path.join(args.data, "manifest.json"), "r") as f:
+                rows = json.load(f)["rows"]
+            rows = rows if args.max_rows is None else min(rows, args.max_rows)
+        else:
+            if args.data:
+                d = np.load(args.data)
+                X, y = np.asarray(d["X"][:args.max_rows], dtype=float), np.asarray(d["y"][:args.max_rows], dtype=int)
+            else:
+                X, y = synthetic_dataset(args.samples, args.seed)
+            models, scaler, metrics = train_models(X, y, seed=args.seed)
+            rows = len(X)
+        version = save_artifacts(models, scaler, metrics, root=args.out, version=args.version,
+                                 params={"rows": rows, "seed": args.seed, "data": args.data or "synthetic"})
+        print(f"Saved {os.path.join(args.out, version)} in {time.perf_counter() - t0:.1f}s")
+        for name, m in metrics.items():
+            print(f"  {name}: accuracy {m['accuracy']:.2f}")
@@ -14,12 +14,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, roc_curve, auc
+from drs_models import FEATURES, SCALED, MODEL_DIR, train_models, save_artifacts, load_artifacts
 
 # Generate synthetic DRS dataset
 np.random.seed(42)
@@ -42,33 +38,39 @@ data['review_result'] = (
 )
 
 # Features & Target
-X = data.drop(columns='review_result')
-y = data['review_result']
+X = data[FEATURES].values
+y = data['review_result'].values
 
-# Train/Test split
+# Train/Test split (the same split train_models uses)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Scale for SVM/Logistic
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
+# Train once and save the notebook's own artifact version; later runs load it.
+# The models are evaluated on this notebook's split below, so never score
+# another version (e.g. LATEST from `drs_models.py train --data ...`) here:
+# it was trained on other rows and its test scores would be meaningless.
+NOTEBOOK_PARAMS = {"rows": n_samples, "seed": 42, "data": "notebook"}
+NOTEBOOK_VERSION = f"notebook-n{n_samples}-seed42"
+try:
+    artifacts = load_artifacts(MODEL_DIR, NOTEBOOK_VERSION)
+except FileNotFoundError:
+    fitted, fitted_scaler, metrics = train_models(X, y, seed=42)
+    save_artifacts(fitted, fitted_scaler, metrics, version=NOTEBOOK_VERSION, params=NOTEBOOK_PARAMS,
+                   latest=False)
+    artifacts = load_artifacts(MODEL_DIR, NOTEBOOK_VERSION)
+if artifacts['manifest']['params'] != NOTEBOOK_PARAMS:
+    raise ValueError(f"{MODEL_DIR}/{NOTEBOOK_VERSION} was not trained on this notebook's data: "
+                     f"{artifacts['manifest']['params']}; delete it to retrain")
+models = artifacts['models']
+scaler = artifacts['scaler']
 X_test_scaled = scaler.transform(X_test)
-
-# Models
-models = {
-    'SVM': SVC(probability=True),
-    'Decision Tree': DecisionTreeClassifier(),
-    'Random Forest': RandomForestClassifier(),
-    'Logistic Regression': LogisticRegression()
-}
+print("Model version:", artifacts['version'])
 
 results = {}
 
-# Train and evaluate
+# Evaluate (plots are saved to files instead of blocking on plt.show())
 for name, model in models.items():
-    X_fit = X_train_scaled if name in ['SVM', 'Logistic Regression'] else X_train
-    X_eval = X_test_scaled if name in ['SVM', 'Logistic Regression'] else X_test
+    X_eval = X_test_scaled if name in SCALED else X_test
 
-    model.fit(X_fit, y_train)
     y_pred = model.predict(X_eval)
     acc = accuracy_score(y_test, y_pred)
     results[name] = acc
@@ -84,12 +86,13 @@ for name, model in models.items():
     plt.xlabel("Predicted")
     plt.ylabel("Actual")
     plt.tight_layout()
-    plt.show()
+    plt.savefig(f"confusion_{name.lower().replace(' ', '_')}.png")
+    plt.close()
 
 # ROC Curves
 plt.figure(figsize=(8, 6))
 for name, model in models.items():
-    X_eval = X_test_scaled if name in ['SVM', 'Logistic Regression'] else X_test
+    X_eval = X_test_scaled if name in SCALED else X_test
     y_prob = model.predict_proba(X_eval)[:, 1]
     fpr, tpr, _ = roc_curve(y_test, y_prob)
     roc_auc = auc(fpr, tpr)
@@ -102,19 +105,8 @@ plt.title("ROC Curve - DRS Models")
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
-plt.show()
-
-import pandas as pd
-import numpy as np
-# --- LBW Detection Logic ---
-def detect_lbw(row):
-    no_bat_contact = row['snick_peak'] < 0.2
-    ball_would_hit_stumps = row['stump_hit_prob'] > 0.5
-    impact_in_line = 3 < row['impact_x'] < 7  # Assuming 3-7 is the stumps line
-    return int(no_bat_contact and ball_would_hit_stumps and impact_in_line)
-
-data['is_lbw'] = data.apply(detect_lbw, axis=1)
-print("Sample LBW decisions:\n", data[['impact_x', 'snick_peak', 'stump_hit_prob', 'is_lbw']].head())
+plt.savefig("roc_curves.png")
+plt.close()
 
 import pandas as pd
 import numpy as np
@@ -122,9 +114,6 @@ import numpy as np
 # Simulate foot landing position (0 to 1, where >0.6 is overstepping the crease)
 np.random.seed(42)
 data['foot_position'] = np.random.uniform(0, 1, len(data))
-data['is_no_ball'] = (data['foot_position'] > 0.6).astype(int)
-
-print("Sample No-Ball detections:\n", data[['foot_position', 'is_no_ball']].head())
 
 import pandas as pd
 import numpy as np
@@ -133,9 +122,6 @@ import numpy as np
 np.random.seed(42)
 data['bat_in_crease'] = np.random.randint(0, 2, len(data))
 data['bails_removed'] = np.random.randint(0, 2, len(data))
-data['is_run_out'] = ((data['bat_in_crease'] == 0) & (data['bails_removed'] == 1)).astype(int)
-
-print("Sample Run-Out detections:\n", data[['bat_in_crease', 'bails_removed', 'is_run_out']].head())
 
 import pandas as pd
 import numpy as np
@@ -143,91 +129,73 @@ import numpy as np
 np.random.seed(42)
 data['foot_outside_crease'] = np.random.randint(0, 2, len(data))  # 1 = outside, 0 = inside
 data['bails_removed_stump'] = np.random.randint(0, 2, len(data))  # 1 = removed
-data['is_stumping'] = ((data['foot_outside_crease'] == 1) & (data['bails_removed_stump'] == 1)).astype(int)
-print("Sample Stumping detections:\n", data[['foot_outside_crease', 'bails_removed_stump', 'is_stumping']].head())
 
 # --- Catch Behind Detection Simulation ---
 data['snick_detected'] = np.random.randint(0, 2, len(data))  # 1 = detected
 data['caught_by_keeper'] = np.random.randint(0, 2, len(data))  # 1 = caught
-data['is_catch_behind'] = ((data['snick_detected'] == 1) & (data['caught_by_keeper'] == 1)).astype(int)
-print("Sample Catch Behind detections:\n", data[['snick_detected', 'caught_by_keeper', 'is_catch_behind']].head())
 
 # --- Boundary Check Simulation ---
 data['ball_distance_from_rope'] = np.random.uniform(-1, 5, len(data))  # in meters
-data['is_boundary'] = (data['ball_distance_from_rope'] <= 0).astype(int)
-print("Sample Boundary detections:\n", data[['ball_distance_from_rope', 'is_boundary']].head())
 
 # --- No-Ball Above Waist Simulation ---
 data['ball_height_at_batsman'] = np.random.uniform(0.5, 2.0, len(data))  # in meters
-data['is_no_ball_waist'] = (data['ball_height_at_batsman'] > 1.2).astype(int)
+
+# --- All decisions in one pass (LBW, no-balls, run-out, stumping, catch behind, boundary) ---
+# Thresholds live in decision_rules.DEFAULT_RULES (or a JSON rule set via load_rules)
+from decision_rules import RuleEngine
+
+engine = RuleEngine()
+decided = engine.evaluate(data)
+for name, given in decided["decisions"].items():
+    data['is_' + name] = given.astype(int)
+
+print("Sample LBW decisions:\n", data[['impact_x', 'snick_peak', 'stump_hit_prob', 'is_lbw']].head())
+print("Sample No-Ball detections:\n", data[['foot_position', 'is_no_ball']].head())
+print("Sample Run-Out detections:\n", data[['bat_in_crease', 'bails_removed', 'is_run_out']].head())
+print("Sample Stumping detections:\n", data[['foot_outside_crease', 'bails_removed_stump', 'is_stumping']].head())
+print("Sample Catch Behind detections:\n", data[['snick_detected', 'caught_by_keeper', 'is_catch_behind']].head())
+print("Sample Boundary detections:\n", data[['ball_distance_from_rope', 'is_boundary']].head())
 print("Sample No-Ball (above waist) detections:\n", data[['ball_height_at_batsman', 'is_no_ball_waist']].head())
+print("Why (first review):", engine.explain(decided, 0))
 
-import cv2
+import os
 import numpy as np
 import matplotlib.pyplot as plt
+from track_store import read_track_arrays
+from track_features import delivery_features
+
+# Features come from the pipeline's own outputs (udrs_pipeline.py / extract_tracks_kalman.py +
+# physics_reconstruct.py, or a jobs.py job directory): no second decode of the video
+RAW_TRACKS = "raw_tracks.json"
+TRACKS_OUT = "tracks.json"
+
+if os.path.exists(RAW_TRACKS) and os.path.exists(TRACKS_OUT):
+    raw = read_track_arrays(RAW_TRACKS)
+    tracks = read_track_arrays(TRACKS_OUT)
+    ok = np.asarray(raw["valid"], dtype=bool)
+    xs, ys = np.asarray(raw["x"])[ok], np.asarray(raw["y"])[ok]
 
-video_path = "/content/(240) Could You Be a Cricket Umpire_ by The Times - YouTube - Google Chrome 2025-04-20 09-49-39-VEED.mp4"
-cap = cv2.VideoCapture(video_path)
-
-ball_positions = []
-lower_red1 = np.array([0, 100, 100])
-upper_red1 = np.array([10, 255, 255])
-lower_red2 = np.array([160, 100, 100])
-upper_red2 = np.array([180, 255, 255])
-
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame = cv2.resize(frame, (640, 360))
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-    mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-    mask = cv2.bitwise_or(mask1, mask2)
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-    if contours:
-        largest_contour = max(contours, key=cv2.contourArea)
-        if cv2.contourArea(largest_contour) > 10:
-            (x, y), radius = cv2.minEnclosingCircle(largest_contour)
-            ball_positions.append((int(x), int(y)))
-
-cap.release()
-
-if ball_positions:
-    xs, ys = zip(*ball_positions)
     plt.figure(figsize=(10, 6))
     plt.plot(xs, ys, 'ro-', label="Ball Trajectory")
     plt.gca().invert_yaxis()
     plt.xlabel("X Position")
     plt.ylabel("Y Position")
-    plt.title("Tracked Red Ball Trajectory")
+    plt.title("Tracked Ball Trajectory")
     plt.legend()
     plt.grid(True)
-    plt.show()
-
-if ball_positions:
-    import pandas as pd
-    impact_x = np.mean(xs)
-    impact_y = np.mean(ys)
-    angle = np.arctan2(ys[-1] - ys[0], xs[-1] - xs[0]) * 180 / np.pi
-    angle = abs(angle)
-
-    features = pd.DataFrame([{
-        'impact_x': impact_x / 640 * 10,
-        'impact_y': impact_y / 360 * 22,
-        'angle': angle,
-        'stump_hit_prob': 0.7,
-        'bat_distance': 0.1,
-        'snick_peak': 0.05,
-        'umpire_decision': 0
-    }])
-
-    # Use the Random Forest model for prediction:
-    model = models['Random Forest']
-    pred = model.predict(features)[0]
+    plt.savefig("trajectory.png")
+    plt.close()
+
+    # impact point, angle and stump-hit probability from the tracks; the edge and
+    # on-field inputs are not in the ball track (placeholders unless given)
+    feats = delivery_features(raw, tracks, external={'bat_distance': 0.1, 'snick_peak': 0.05, 'umpire_decision': 0})
+    features = np.array([feats[name] for name in FEATURES])
+    print("Features:", {name: round(float(v), 3) for name, v in zip(FEATURES, features)})
+
+    # Use the saved Random Forest model for prediction (loaded once, compiled for single rows):
+    from drs_inference import Predictor
+    pred = Predictor(MODEL_DIR, NOTEBOOK_VERSION, model='Random Forest').predict(features)[0]
     verdict = "OUT" if pred == 1 else "NOT OUT"
-    print(f"Model Verdict: {verdict}")
+    print(f"Model Verdict: {verdict} (ball tracking: {feats['decision']})")
 else:
-    print("Cannot compute decision — no ball trajectory detected.")
\ No newline at end of file
+    print("Cannot compute decision — run the tracker first (no raw_tracks.json / tracks.json).")
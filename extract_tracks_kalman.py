@@ -10,6 +10,16 @@ import json
 import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from batch_kalman import interpolate_missing
+from pipeline_stage import ordered_stage
+
+# Noise parameters of the tracking filter (also part of the stage cache key)
+KALMAN_PROCESS_VAR = 1e-3
+KALMAN_MEAS_VAR = 50.0
+
+# Stage cache versions: bump whenever the stage's output changes for the same inputs
+TRACK_VERSION = 3           # 2: no stale off-stride motion measurement; 3: ROI misses retried full-frame
 
 class Kalman2D:
     def __init__(self, dt=1.0, process_var=1e-3, meas_var=25.0):
@@ -41,8 +51,300 @@ class Kalman2D:
         self.P = (I - K @ self.H) @ self.P
         return self.x[:2].ravel()
 
+    def forecast(self):
+        """Predicted position and innovation covariance for the next frame, without advancing the filter."""
+        x = self.A @ self.x
+        P = self.A @ self.P @ self.A.T + self.Q
+        S = self.H @ P @ self.H.T + self.R
+        return x[:2].ravel(), S
+
+def hsv_detect(fr, hsv_lower, hsv_upper, kernel, min_area=20):
+    """Colour detector: centre of the largest HSV blob, or None."""
+    hsv = cv2.cvtColor(fr, cv2.COLOR_BGR2HSV)
+
+    mask = cv2.inRange(hsv, np.array(hsv_lower), np.array(hsv_upper))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+
+    cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if cnts:
+        c = max(cnts, key=cv2.contourArea)
+        area = cv2.contourArea(c)
+        if area > min_area:
+            (x,y), r = cv2.minEnclosingCircle(c)
+            return (float(x), float(y))
+    return None
+
+def motion_detect(fgbg, fr, kernel, resize):
+    """Motion mask fallback: centre of the largest plausible foreground blob, or None."""
+    fg = fgbg.apply(fr)
+    fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, kernel, iterations=1)
+    cnts2, _ = cv2.findContours(fg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    best = None
+    best_area = 0
+    for c in cnts2:
+        area = cv2.contourArea(c)
+        if 20 < area < 0.06 * (resize[0]*resize[1]) and area > best_area:
+            x,y,w,h = cv2.boundingRect(c)
+            best_area = area
+            best = (int(x + w/2), int(y + h/2))
+    return best
+
+class MotionDetector:
+    """
+    Always-on, low-resolution background model for the motion fallback.
+
+    The MOG2 model is updated on every `stride`-th frame at `scale` times the
+    tracking resolution, whether or not the colour detector fired, so its
+    history is regular and its cost is fixed per frame. `detect()` returns the
+    best blob from the mask of the frame just fed, in tracking-resolution
+    pixels; on off-stride frames it returns None rather than a stale position.
+    The cv2 model is created on first use, so an unused detector pickles.
+    """
+    def __init__(self, scale=0.5, stride=1, history=200, var_threshold=50):
+        self.scale = scale
+        self.stride = max(1, int(stride))
+        self.history = max(1, history // self.stride)
+        self.var_threshold = var_threshold
+        self.kernel = np.ones((3,3), np.uint8)
+        self.fgbg = None
+        self.size = None
+        self.mask = None
+        self.fresh = False
+
+    def shrink(self, fr):
+        """Downscale a tracking-resolution frame (stateless, safe on worker threads)."""
+        h, w = fr.shape[:2]
+        size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        return cv2.resize(fr, size, interpolation=cv2.INTER_AREA)
+
+    def feed(self, i, small):
+        self.fresh = not i % self.stride
+        if not self.fresh:
+            return
+        if self.fgbg is None:
+            self.fgbg = cv2.createBackgroundSubtractorMOG2(history=self.history,
+                                                           varThreshold=self.var_threshold,
+                                                           detectShadows=False)
+        fg = self.fgbg.apply(small)
+        self.mask = cv2.morphologyEx(fg, cv2.MORPH_OPEN, self.kernel, iterations=1)
+        self.size = small.shape[1], small.shape[0]
+
+    def detect(self, resize):
+        if self.mask is None or not self.fresh:
+            return None
+        sx = self.size[0] / float(resize[0])
+        sy = self.size[1] / float(resize[1])
+        cnts, _ = cv2.findContours(self.mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        best = None
+        best_area = 0
+        for c in cnts:
+            # same area gate as motion_detect, measured back at tracking resolution
+            area = cv2.contourArea(c) / (sx * sy)
+            if 20 < area < 0.06 * (resize[0]*resize[1]) and area > best_area:
+                x,y,w,h = cv2.boundingRect(c)
+                best_area = area
+                best = (int((x + w/2) / sx), int((y + h/2) / sy))
+        return best
+
+class KalmanSink:
+    """
+    Ordered tail of the tracker: turns per-frame measurements into smoothed
+    detections. Must be fed in frame order.
+    """
+    def __init__(self):
+        self.kalman = Kalman2D(dt=1.0, process_var=KALMAN_PROCESS_VAR, meas_var=KALMAN_MEAS_VAR)
+        self.last_valid = None
+
+    def push(self, i, meas, source="hsv"):
+        kalman = self.kalman
+        if meas is None:
+            # no detection: append None and advance Kalman
+            kalman.predict()
+            return {"frame": i, "x": None, "y": None}
+        if source == "hsv" and self.last_valid is None:
+            kalman.x[:2,0] = np.array(meas)
+        pred = kalman.update(meas)
+        self.last_valid = (i, meas)
+        return {"frame": i, "x": float(pred[0]), "y": float(pred[1])}
+
+class RoiGate:
+    """
+    Kalman-gated region-of-interest search.
+
+    While the track is locked only a window around the Kalman forecast is
+    searched; it spans the forecast and the last measurement, padded by
+    `n_sigma` innovation standard deviations. A window miss is retried on the
+    full frame (and then the motion fallback), so the gate finds whatever
+    the ungated search finds; after `max_misses` consecutive misses the
+    window is dropped until the ball is found again. Counters are kept on
+    the instance so the gate can be tuned from `summary()`.
+    """
+    def __init__(self, n_sigma=4.0, min_half=24, max_half=160, max_misses=5):
+        self.n_sigma = n_sigma
+        self.min_half = min_half
+        self.max_half = max_half
+        self.max_misses = max_misses
+        self.misses = 0
+        self.frames = 0
+        self.roi_frames = 0
+        self.roi_hits = 0
+        self.full_frames = 0
+        self.full_hits = 0
+        self.retries = 0
+        self.retry_hits = 0
+        self.roi_area = 0
+        self.pixels = 0
+        self.full_pixels = 0
+
+    def window(self, sink, size):
+        """(x0, y0, x1, y1) to search next, or None for a full-frame search."""
+        if sink.last_valid is None or self.misses >= self.max_misses:
+            return None
+        pred, S = sink.kalman.forecast()
+        _, last = sink.last_valid
+        w, h = size
+        pad = self.n_sigma * np.sqrt(np.diag(S))
+        lo = np.minimum(pred, last) - np.maximum(pad, self.min_half)
+        hi = np.maximum(pred, last) + np.maximum(pad, self.min_half)
+        if np.any(hi - lo > 2 * self.max_half):
+            # forecast has drifted from the measurements: trust the last hit
+            lo = np.asarray(last) - self.max_half
+            hi = np.asarray(last) + self.max_half
+        x0, y0 = max(0, int(lo[0])), max(0, int(lo[1]))
+        x1, y1 = min(w, int(np.ceil(hi[0]))), min(h, int(np.ceil(hi[1])))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return (x0, y0, x1, y1)
+
+    def record(self, window, found, size, retry=None):
+        """`retry`: whether the full-frame search after a window miss found the ball (None: not run)."""
+        full = size[0] * size[1]
+        self.frames += 1
+        self.full_pixels += full
+        if window is None:
+            self.full_frames += 1
+            self.full_hits += int(found)
+            self.pixels += full
+        else:
+            x0, y0, x1, y1 = window
+            area = (x1 - x0) * (y1 - y0)
+            self.roi_frames += 1
+            self.roi_hits += int(found)
+            self.roi_area += area
+            self.pixels += area
+            if retry is not None:
+                self.retries += 1
+                self.retry_hits += int(retry)
+                self.pixels += full
+        self.misses = 0 if found or retry else self.misses + 1
+
+    @property
+    def hit_rate(self):
+        return self.roi_hits / self.roi_frames if self.roi_frames else 0.0
+
+    @property
+    def mean_roi_area(self):
+        return self.roi_area / self.roi_frames if self.roi_frames else 0.0
+
+    @property
+    def pixel_fraction(self):
+        return self.pixels / self.full_pixels if self.full_pixels else 1.0
+
+    def summary(self):
+        return {"frames": self.frames, "roi_frames": self.roi_frames,
+                "full_frames": self.full_frames, "hit_rate": self.hit_rate,
+                "retries": self.retries, "retry_hits": self.retry_hits,
+                "mean_roi_area": self.mean_roi_area, "pixel_fraction": self.pixel_fraction}
+
+def read_frames(cap, max_frames, frame_ranges=None):
+    """
+    Yield (i, frame). With frame_ranges, frames outside the [start, stop)
+    ranges are only grab()bed, never retrieved.
+    """
+    if frame_ranges is None:
+        for i in range(max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield i, frame
+        return
+    i = 0
+    for start, stop in sorted(frame_ranges):
+        while i < min(start, max_frames):
+            if not cap.grab():
+                return
+            i += 1
+        while i < min(stop, max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield i, frame
+            i += 1
+
+def _whole_clip_if_empty(frame_ranges):
+    # no delivery windows found: tracking nothing would silently lose the delivery
+    if frame_ranges is not None and len(frame_ranges) == 0:
+        print("Warning: no delivery windows found, tracking the whole clip")
+        return None
+    return frame_ranges
+
 def track_ball(video_path, resize=(960,540), max_frames=None,
-               hsv_lower=(0,50,50), hsv_upper=(30,255,255)):
+               hsv_lower=(0,50,50), hsv_upper=(30,255,255),
+               workers=0, queue_size=32, roi=None, motion=None, frame_ranges=None, cache=None,
+               progress=None):
+    """
+    Track the ball through `video_path`, returning one detection per frame.
+
+    workers > 0 enables the pipelined engine (decoder thread -> `workers`
+    resize/mask/contour threads -> ordered Kalman sink). Output is identical
+    to the serial path.
+
+    roi: optional RoiGate. The colour search is then restricted to the
+    Kalman-gated window and the gate's counters are updated in place.
+
+    motion: optional MotionDetector replacing the on-miss full-resolution
+    MOG2 fallback with an always-on reduced-resolution background model.
+
+    frame_ranges: optional [(start, stop), ...] (e.g. from
+    delivery_windows.find_delivery_windows). Only those frames are decoded
+    and returned; the Kalman filter restarts at the beginning of each range.
+    An empty list falls back to the whole clip with a warning.
+
+    cache: optional stage_cache.StageCache, keyed on the video bytes and
+    every parameter that changes the output. On a hit nothing is decoded
+    (and an `roi` gate's counters are left untouched).
+
+    progress: optional callback(frames_done) called after every frame; an
+    exception raised from it stops the decode (used to cancel jobs).
+    """
+    frame_ranges = _whole_clip_if_empty(frame_ranges)
+
+    def run():
+        detections = iter_detections(video_path, resize=resize, max_frames=max_frames,
+                                     hsv_lower=hsv_lower, hsv_upper=hsv_upper,
+                                     workers=workers, queue_size=queue_size, roi=roi,
+                                     motion=motion, frame_ranges=frame_ranges)
+        if progress is None:
+            return list(detections)
+        out = []
+        for det in detections:
+            out.append(det)
+            progress(len(out))
+        return out
+    if cache is None:
+        return run()
+    params = {"version": TRACK_VERSION, "resize": list(resize), "max_frames": max_frames,
+              "hsv_lower": list(hsv_lower), "hsv_upper": list(hsv_upper),
+              "kalman": [KALMAN_PROCESS_VAR, KALMAN_MEAS_VAR],
+              "roi": roi and [roi.n_sigma, roi.min_half, roi.max_half, roi.max_misses],
+              "motion": motion and [motion.scale, motion.stride, motion.history, motion.var_threshold],
+              "frame_ranges": frame_ranges and [[int(s), int(e)] for s, e in frame_ranges]}
+    return cache.cached("track_ball", cache.video_digest(video_path), params, run)
+
+def iter_detections(video_path, resize=(960,540), max_frames=None,
+                    hsv_lower=(0,50,50), hsv_upper=(30,255,255),
+                    workers=0, queue_size=32, roi=None, motion=None, frame_ranges=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise IOError(f"Cannot open video: {video_path}")
@@ -50,103 +352,233 @@ def track_ball(video_path, resize=(960,540), max_frames=None,
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
     max_frames = frame_count if max_frames is None else min(frame_count, max_frames)
 
-    kalman = Kalman2D(dt=1.0, process_var=1e-3, meas_var=50.0)
-    fgbg = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=50, detectShadows=False)
+    try:
+        yield from track_frames(read_frames(cap, max_frames, frame_ranges), resize=resize,
+                                hsv_lower=hsv_lower, hsv_upper=hsv_upper, workers=workers,
+                                queue_size=queue_size, roi=roi, motion=motion)
+    finally:
+        cap.release()
 
-    detections = []
-    last_valid = None
+def track_frames(frames, resize=(960,540), hsv_lower=(0,50,50), hsv_upper=(30,255,255),
+                 workers=0, queue_size=32, roi=None, motion=None):
+    """
+    Tracker core over any iterator of (frame_index, BGR frame): yields one
+    detection dict per frame, in order. A jump in frame_index starts a new
+    Kalman track.
+    """
+    sink = KalmanSink()
+    fgbg = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=50, detectShadows=False)
     kernel = np.ones((3,3), np.uint8)
 
-    for i in range(max_frames):
+    def vision(frame):
+        fr = cv2.resize(frame, resize)
+        small = motion.shrink(fr) if motion is not None else None
+        if roi is not None:
+            # the window depends on the Kalman state, so the search happens in the sink
+            return fr, small, None
+        return fr, small, hsv_detect(fr, hsv_lower, hsv_upper, kernel)
+
+    def fallback(fr):
+        # the motion model is stateful, so it runs here in frame order
+        if motion is not None:
+            return motion.detect(resize)
+        return motion_detect(fgbg, fr, kernel, resize)
+
+    prev = None
+    for i, (fr, small, meas) in ordered_stage(frames, vision, workers, queue_size):
+        if prev is not None and i != prev + 1:
+            # skipped footage: the next window is a new delivery
+            sink = KalmanSink()
+        prev = i
+        if motion is not None:
+            motion.feed(i, small)
+        window = None
+        if roi is not None:
+            window = roi.window(sink, resize)
+            if window is not None:
+                x0, y0, x1, y1 = window
+                meas = hsv_detect(fr[y0:y1, x0:x1], hsv_lower, hsv_upper, kernel)
+                retry = None
+                if meas is not None:
+                    meas = (meas[0] + x0, meas[1] + y0)
+                else:
+                    # the ball left the window: search the whole frame, as without the gate
+                    meas = hsv_detect(fr, hsv_lower, hsv_upper, kernel)
+                    retry = meas is not None
+                roi.record(window, retry is None, resize, retry)
+            else:
+                meas = hsv_detect(fr, hsv_lower, hsv_upper, kernel)
+        if meas is not None:
+            det = sink.push(i, meas, "hsv")
+        else:
+            det = sink.push(i, fallback(fr), "motion")
+        if roi is not None and window is None:
+            roi.record(None, det["x"] is not None, resize)
+        yield det
+
+def _measure_chunk(video_path, start, stop, preroll, resize, hsv_lower, hsv_upper, motion=None):
+    """
+    Worker for track_ball_parallel: raw measurements for frames [start, stop).
+
+    The capture is seeked to `start - preroll`; the pre-roll frames go through
+    the same detector so the MOG2 history is warmed up the way the serial run
+    would have fed it, but their measurements are dropped.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    first = max(0, start - preroll)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    fgbg = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=50, detectShadows=False)
+    kernel = np.ones((3,3), np.uint8)
+    out = []
+    for i in range(first, stop):
         ret, frame = cap.read()
         if not ret:
             break
-
         fr = cv2.resize(frame, resize)
-        hsv = cv2.cvtColor(fr, cv2.COLOR_BGR2HSV)
-
-        mask = cv2.inRange(hsv, np.array(hsv_lower), np.array(hsv_upper))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=1)
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=1)
-
-        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        found = False
-        if cnts:
-            c = max(cnts, key=cv2.contourArea)
-            area = cv2.contourArea(c)
-            if area > 20:
-                (x,y), r = cv2.minEnclosingCircle(c)
-                meas = (float(x), float(y))
-                if last_valid is None:
-                    kalman.x[:2,0] = np.array(meas)
-                pred = kalman.update(meas)
-                detections.append({"frame": i, "x": float(pred[0]), "y": float(pred[1])})
-                last_valid = (i, meas)
-                found = True
-
-        if not found:
-            # motion mask fallback
-            fg = fgbg.apply(fr)
-            fg = cv2.morphologyEx(fg, cv2.MORPH_OPEN, kernel, iterations=1)
-            cnts2, _ = cv2.findContours(fg, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            best = None
-            best_area = 0
-            for c in cnts2:
-                area = cv2.contourArea(c)
-                if 20 < area < 0.06 * (resize[0]*resize[1]) and area > best_area:
-                    x,y,w,h = cv2.boundingRect(c)
-                    best_area = area
-                    best = (int(x + w/2), int(y + h/2))
-            if best is not None:
-                pred = kalman.update(best)
-                detections.append({"frame": i, "x": float(pred[0]), "y": float(pred[1])})
-                last_valid = (i, best)
+        if motion is not None:
+            motion.feed(i, motion.shrink(fr))
+        meas, source = hsv_detect(fr, hsv_lower, hsv_upper, kernel), "hsv"
+        if meas is None:
+            if motion is not None:
+                meas, source = motion.detect(resize), "motion"
             else:
-                # no detection: append None and advance Kalman
-                kalman.predict()
-                detections.append({"frame": i, "x": None, "y": None})
-
+                meas, source = motion_detect(fgbg, fr, kernel, resize), "motion"
+        if i >= start:
+            out.append((i, meas, source))
     cap.release()
-    return detections
+    return out
 
-def interpolate_missing(detections):
-    frames = [d["frame"] for d in detections]
-    xs = [d["x"] for d in detections]
-    ys = [d["y"] for d in detections]
+def track_ball_parallel(video_path, resize=(960,540), max_frames=None,
+                        hsv_lower=(0,50,50), hsv_upper=(30,255,255),
+                        processes=None, chunk_frames=None, preroll=50, motion=None,
+                        frame_ranges=None):
+    """
+    Multi-process track_ball: the clip is split into frame ranges, each
+    measured in its own process, and the measurements are stitched back in
+    frame order through a single KalmanSink.
 
-    def interp(vals):
-        arr = np.array([v if v is not None else np.nan for v in vals], dtype=float)
-        n = len(arr)
-        idx = np.arange(n)
-        mask = ~np.isnan(arr)
-        if mask.sum() < 2:
-            return arr.tolist()
-        filled = np.interp(idx, idx[mask], arr[mask])
-        return filled.tolist()
+    Because one Kalman filter runs over the stitched stream there is no
+    filter state to reconcile at chunk boundaries. Tolerance against the
+    serial run: every frame the colour detector resolves gives the identical
+    measurement, and the first chunk is identical throughout. Only frames
+    that fall back to the motion mask in later chunks can differ, because
+    their MOG2 model is rebuilt from `preroll` frames instead of the whole
+    history; those differences then carry through the Kalman output.
 
-    xs_f = interp(xs)
-    ys_f = interp(ys)
+    motion: optional (unused) MotionDetector; each worker gets its own copy.
 
-    out = []
-    for i, f in enumerate(detections):
-        out.append({"frame": int(f["frame"]), "x": float(xs_f[i]), "y": float(ys_f[i])})
-    return out
+    frame_ranges: optional delivery windows; each window becomes one chunk
+    with its own Kalman filter, as in track_ball (empty: the whole clip).
+    """
+    frame_ranges = _whole_clip_if_empty(frame_ranges)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+    max_frames = frame_count if max_frames is None else min(frame_count, max_frames)
+
+    processes = processes or os.cpu_count() or 1
+    if chunk_frames is None:
+        chunk_frames = max(1, -(-max_frames // processes))
+    if frame_ranges is not None:
+        bounds = [(s, min(e, max_frames)) for s, e in sorted(frame_ranges) if s < max_frames]
+    else:
+        bounds = [(s, min(s + chunk_frames, max_frames)) for s in range(0, max_frames, chunk_frames)]
 
-def save_tracks(tracks, out_json="raw_tracks.json"):
-    with open(out_json, "w") as f:
-        json.dump(tracks, f, indent=2)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_measure_chunk, video_path, s, e, preroll, resize, hsv_lower, hsv_upper, motion)
+                   for s, e in bounds]
+        sink = KalmanSink()
+        detections = []
+        for (s, e), fut in zip(bounds, futures):
+            if frame_ranges is not None:
+                sink = KalmanSink()
+            chunk = fut.result()
+            for i, meas, source in chunk:
+                detections.append(sink.push(i, meas, source))
+            if len(chunk) < e - s:
+                # the decoder ran out of frames early: stop like the serial read loop
+                for f in futures:
+                    f.cancel()
+                break
+    return detections
+
+def save_tracks(tracks, out_json="raw_tracks.json", fps=None, image_size=None, params=None):
+    """Write tracks as JSON, or in the columnar .trk format for any other extension."""
+    if out_json.lower().endswith(".json"):
+        with open(out_json, "w") as f:
+            json.dump(tracks, f, indent=2)
+    else:
+        from track_store import write_tracks
+        write_tracks(out_json, tracks, fps=fps, image_size=image_size, params=params)
     print("Saved tracks to", out_json)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Track ball and save raw tracks (2D).")
     parser.add_argument("video", nargs='?', default="/mnt/data/lbw.mp4", help="Input video path")
-    parser.add_argument("--out", default="raw_tracks.json", help="Output JSON")
+    parser.add_argument("--out", default="raw_tracks.json", help="Output tracks (.json, or .trk for the binary format)")
     parser.add_argument("--resize", default="960x540", help="Resize WxH")
     parser.add_argument("--maxframes", type=int, default=None, help="Max frames to process")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Vision worker threads (0 = serial, >0 = pipelined decode/process)")
+    parser.add_argument("--roi", action="store_true",
+                        help="Search only a Kalman-gated window once the ball is locked")
+    parser.add_argument("--roi-misses", type=int, default=5,
+                        help="Consecutive ROI misses before a full-frame search")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Split the clip into frame ranges tracked in N processes (0 = off; "
+                             "not with --roi, --workers or --cache)")
+    parser.add_argument("--motion-scale", type=float, default=None,
+                        help="Run an always-on motion model at this fraction of --resize (e.g. 0.5)")
+    parser.add_argument("--motion-stride", type=int, default=1,
+                        help="Update the motion model every N frames")
+    parser.add_argument("--windows", action="store_true",
+                        help="Pre-scan for delivery windows and skip the footage outside them")
+    parser.add_argument("--cache", default=None, help="Stage cache directory (reuse results for the same video + parameters)")
+    parser.add_argument("--cache-mb", type=float, default=512, help="Stage cache disk budget in MB")
+    parser.add_argument("--interp", choices=["linear", "rts"], default="linear",
+                        help="Gap filling: linear interpolation or offline RTS smoothing (re-filters the tracked positions)")
     args = parser.parse_args()
+    if args.processes > 0:
+        # the multi-process tracker has no ROI gate, thread pool or stage cache
+        ignored = [flag for flag, used in (("--roi", args.roi), ("--workers", args.workers > 0),
+                                           ("--cache", args.cache)) if used]
+        if ignored:
+            parser.error(f"--processes cannot be combined with {', '.join(ignored)}")
 
     w,h = map(int, args.resize.split("x"))
     print("Tracking video:", args.video)
-    tracks = track_ball(args.video, resize=(w,h), max_frames=args.maxframes)
-    tracks_interp = interpolate_missing(tracks)
-    save_tracks(tracks_interp, args.out)
+    roi = RoiGate(max_misses=args.roi_misses) if args.roi else None
+    motion = MotionDetector(args.motion_scale, args.motion_stride) if args.motion_scale else None
+    cache = None
+    if args.cache:
+        from stage_cache import StageCache
+        cache = StageCache(args.cache, max_bytes=args.cache_mb * 1e6)
+    frame_ranges = None
+    if args.windows:
+        from delivery_windows import find_delivery_windows
+        frame_ranges = find_delivery_windows(args.video, max_frames=args.maxframes)
+        print("Delivery windows:", frame_ranges)
+    if args.processes > 0:
+        tracks = track_ball_parallel(args.video, resize=(w,h), max_frames=args.maxframes,
+                                     processes=args.processes, motion=motion,
+                                     frame_ranges=frame_ranges)
+    else:
+        tracks = track_ball(args.video, resize=(w,h), max_frames=args.maxframes, workers=args.workers,
+                            roi=roi, motion=motion, frame_ranges=frame_ranges, cache=cache)
+    if roi is not None:
+        print("ROI stats:", json.dumps(roi.summary()))
+    tracks_interp = interpolate_missing(tracks, method=args.interp, cache=cache)
+    if cache is not None:
+        print("Cache:", json.dumps(cache.stats()))
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or None
+    cap.release()
+    save_tracks(tracks_interp, args.out, fps=fps, image_size=(w,h),
+                params={"resize": [w,h], "hsv_lower": [0,50,50], "hsv_upper": [30,255,255],
+                        "interp": args.interp})
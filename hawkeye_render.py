@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+hawkeye_render.py
+Software replay renderer for the blender_render.py scene (green ground,
+brown pitch strip, three stumps, red ball, the same camera), without
+Blender.
+
+The static layer (ground, pitch, stumps) is ray-cast once per camera and
+resolution, with a depth buffer. Per frame only the projected ball (depth
+tested against the stumps) and its trail are composited, and frames go
+straight to cv2.VideoWriter: no PNGs, no make_video pass.
+
+Usage:
+    python hawkeye_render.py tracks.json final_output.mp4 --size 1280x720 --fps 30
+"""
+import time
+import argparse
+import cv2
+import numpy as np
+
+# Scene, as built by blender_render.py (metres, Blender world axes)
+GROUND_HALF = 25.0
+PITCH_X = (-1.0, 1.0)
+PITCH_Y = (-20.0, 0.0)
+STUMP_XS = (-0.15, 0.0, 0.15)
+STUMP_RADIUS = 0.03
+STUMP_HEIGHT = 1.1
+BALL_RADIUS = 0.12
+
+# linear material colours (Blender diffuse_color)
+GROUND_RGB = (0.05, 0.3, 0.05)
+PITCH_RGB = (0.45, 0.35, 0.25)
+STUMP_RGB = (0.9, 0.9, 0.9)
+BALL_RGB = (0.8, 0.1, 0.1)
+SKY_RGB = (0.05, 0.05, 0.05)
+
+# Blender default camera: 50 mm lens on a 36 mm sensor, horizontal fit
+CAMERA_LOCATION = (4.0, -15.0, 5.0)
+CAMERA_ROTATION_DEG = (75.0, 0.0, 30.0)
+LENS_MM = 50.0
+SENSOR_MM = 36.0
+
+# sun straight down (the Blender sun's default orientation) plus a soft fill from the camera side
+SUN_DIR = np.array([0.0, 0.0, 1.0])
+FILL_DIR = np.array([0.6, -0.8, 0.3]) / np.linalg.norm([0.6, -0.8, 0.3])
+
+def _srgb(rgb, shade=1.0):
+    """Linear colour (times a shade factor, any shape) -> 8-bit BGR."""
+    c = np.clip(np.asarray(rgb, dtype=float) * shade, 0.0, 1.0)
+    c = np.where(c <= 0.0031308, 12.92 * c, 1.055 * c ** (1 / 2.4) - 0.055)
+    return (c[..., ::-1] * 255.0 + 0.5).astype(np.uint8)
+
+class VirtualCamera:
+    """Pinhole camera with Blender's conventions (looks down local -Z, XYZ Euler rotation)."""
+    def __init__(self, size=(1280,720), location=CAMERA_LOCATION, rotation_deg=CAMERA_ROTATION_DEG,
+                 lens_mm=LENS_MM, sensor_mm=SENSOR_MM):
+        self.size = tuple(int(s) for s in size)
+        self.C = np.asarray(location, dtype=float)
+        rx, ry, rz = np.radians(rotation_deg)
+        Rx = np.array([[1, 0, 0], [0, np.cos(rx), -np.sin(rx)], [0, np.sin(rx), np.cos(rx)]])
+        Ry = np.array([[np.cos(ry), 0, np.sin(ry)], [0, 1, 0], [-np.sin(ry), 0, np.cos(ry)]])
+        Rz = np.array([[np.cos(rz), -np.sin(rz), 0], [np.sin(rz), np.cos(rz), 0], [0, 0, 1]])
+        self.R = Rz @ Ry @ Rx                      # camera -> world
+        w, h = self.size
+        sensor = sensor_mm if w >= h else sensor_mm * w / float(h)
+        self.f = lens_mm / sensor * w              # focal length in pixels
+
+    def project(self, pts):
+        """World points (N, 3) -> (u, v, depth); depth <= 0 is behind the camera."""
+        pc = (np.asarray(pts, dtype=float) - self.C) @ self.R
+        depth = -pc[:, 2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            u = self.size[0] / 2.0 + self.f * pc[:, 0] / depth
+            v = self.size[1] / 2.0 - self.f * pc[:, 1] / depth
+        return u, v, depth
+
+    def rays(self):
+        """Unit world-space ray directions (h, w, 3) through pixel centres."""
+        w, h = self.size
+        v, u = np.mgrid[0:h, 0:w].astype(float)
+        d = np.stack([(u + 0.5 - w / 2.0) / self.f, -(v + 0.5 - h / 2.0) / self.f, -np.ones_like(u)], axis=2)
+        d = d @ self.R.T
+        return d / np.linalg.norm(d, axis=2, keepdims=True)
+
+def render_static(cam):
+    """Ray-cast ground, pitch and stumps once: (BGR image, depth along the ray)."""
+    d = cam.rays()
+    o = cam.C
+    h, w = d.shape[:2]
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    img[:] = _srgb(SKY_RGB)
+    depth = np.full((h, w), np.inf)
+
+    # ground plane z = 0 (the pitch strip sits 1 cm above it; the offset is invisible here)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(d[..., 2] < 0, -o[2] / d[..., 2], np.inf)
+    gx = o[0] + t * d[..., 0]
+    gy = o[1] + t * d[..., 1]
+    ground = np.isfinite(t) & (np.abs(gx) <= GROUND_HALF) & (np.abs(gy) <= GROUND_HALF)
+    pitch = ground & (gx >= PITCH_X[0]) & (gx <= PITCH_X[1]) & (gy >= PITCH_Y[0]) & (gy <= PITCH_Y[1])
+    lit = max(0.0, SUN_DIR[2]) * 0.8 + 0.2
+    img[ground] = _srgb(GROUND_RGB, lit)
+    img[pitch] = _srgb(PITCH_RGB, lit)
+    depth[ground] = t[ground]
+
+    # stumps: vertical cylinders, nearest hit wins
+    a = d[..., 0] ** 2 + d[..., 1] ** 2
+    for cx in STUMP_XS:
+        ox, oy = o[0] - cx, o[1]
+        b = 2.0 * (d[..., 0] * ox + d[..., 1] * oy)
+        c = ox * ox + oy * oy - STUMP_RADIUS ** 2
+        disc = b * b - 4.0 * a * c
+        hit = disc >= 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ts = (-b - np.sqrt(np.where(hit, disc, 0.0))) / (2.0 * a)
+        z = o[2] + ts * d[..., 2]
+        hit &= (ts > 0) & (z >= 0) & (z <= STUMP_HEIGHT) & (ts < depth)
+        if not hit.any():
+            continue
+        nx = (o[0] + ts[hit] * d[hit, 0] - cx) / STUMP_RADIUS
+        ny = (o[1] + ts[hit] * d[hit, 1]) / STUMP_RADIUS
+        shade = 0.25 + 0.75 * np.maximum(0.0, nx * FILL_DIR[0] + ny * FILL_DIR[1])
+        img[hit] = _srgb(np.asarray(STUMP_RGB)[None, :], shade[:, None])
+        depth[hit] = ts[hit]
+    return img, depth
+
+def _fill_frames(tracks):
+    """Per-frame (frames, (K, 3) positions) from first to last frame, linear between keyframes."""
+    f = np.asarray(tracks["frame"], dtype=float)
+    order = np.argsort(f, kind="stable")
+    f = f[order]
+    frames = np.arange(int(f[0]), int(f[-1]) + 1)
+    pos = np.stack([np.interp(frames, f, np.asarray(tracks[k], dtype=float)[order]) for k in ("x", "y", "z")], axis=1)
+    return frames, pos
+
+# static layers already rendered in this process, keyed on the camera
+_STATIC = {}
+
+class HawkeyeRenderer:
+    """Reusable renderer: the static layer is built once per (camera, size) and process."""
+    def __init__(self, size=(1280,720), trail=45, camera=None):
+        self.camera = camera or VirtualCamera(size)
+        self.size = self.camera.size
+        self.trail = trail
+        key = (self.size, tuple(self.camera.C), tuple(self.camera.R.ravel()), self.camera.f)
+        if key not in _STATIC:
+            _STATIC[key] = render_static(self.camera)
+        self.static, self.depth = _STATIC[key]
+        self.ball_bgr = tuple(int(c) for c in _srgb(BALL_RGB, 0.9))
+        self.hi_bgr = tuple(int(c) for c in _srgb(BALL_RGB, 1.6))
+        self.trail_bgr = tuple(int(c) for c in _srgb((1.0, 0.9, 0.2)))
+
+    def frames(self, tracks):
+        """Yield (frame_number, BGR image) for every frame of the track."""
+        frames, pos = _fill_frames(tracks)
+        u, v, depth = self.camera.project(pos)
+        r_px = self.camera.f * BALL_RADIUS / np.where(depth > 0, depth, np.inf)
+        w, h = self.size
+        # sub-pixel drawing (cv2 shift) keeps slow balls from stepping
+        S = 4
+        pts = np.stack([u, v], axis=1)
+        for k, fr in enumerate(frames):
+            img = self.static.copy()
+            lo = max(0, k - self.trail)
+            tp = pts[lo:k + 1][depth[lo:k + 1] > 0]
+            if len(tp) > 1:
+                cv2.polylines(img, [np.round(tp * S).astype(np.int32)], False, self.trail_bgr, 2, cv2.LINE_AA, 2)
+            if depth[k] > 0 and np.isfinite(u[k]) and -50 < u[k] < w + 50 and -50 < v[k] < h + 50:
+                self._ball(img, u[k], v[k], r_px[k], depth[k], S)
+            yield int(fr), img
+
+    def _ball(self, img, u, v, r, depth, S):
+        w, h = self.size
+        rr = int(np.ceil(r)) + 2
+        x0, y0 = max(0, int(u) - rr), max(0, int(v) - rr)
+        x1, y1 = min(w, int(u) + rr + 1), min(h, int(v) + rr + 1)
+        if x1 <= x0 or y1 <= y0:
+            return
+        # draw into the ROI, then keep the static pixels where the scene is nearer (stumps in front)
+        patch = img[y0:y1, x0:x1].copy()
+        c = (int(round((u - x0) * S)), int(round((v - y0) * S)))
+        cv2.circle(patch, c, max(1, int(round(r * S))), self.ball_bgr, -1, cv2.LINE_AA, 2)
+        hl = (int(round((u - x0 - 0.3 * r) * S)), int(round((v - y0 - 0.3 * r) * S)))
+        cv2.circle(patch, hl, max(1, int(round(0.35 * r * S))), self.hi_bgr, -1, cv2.LINE_AA, 2)
+        front = self.depth[y0:y1, x0:x1] < depth
+        patch[front] = img[y0:y1, x0:x1][front]
+        img[y0:y1, x0:x1] = patch
+
+    def render(self, tracks, out_path, fps=30):
+        """Write the replay to `out_path` (.mp4 or .webm). Returns the number of frames."""
+        ext = out_path.split(".")[-1].lower()
+        fourcc = cv2.VideoWriter_fourcc(*("VP80" if ext == "webm" else "mp4v"))
+        writer = cv2.VideoWriter(out_path, fourcc, fps, self.size)
+        if not writer.isOpened():
+            raise IOError(f"Cannot open video writer: {out_path}")
+        n = 0
+        try:
+            for _, img in self.frames(tracks):
+                writer.write(img)
+                n += 1
+        finally:
+            writer.release()
+        return n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the Hawk-Eye replay with OpenCV (no Blender).")
+    parser.add_argument("tracks", help="3D tracks (.json or .trk)")
+    parser.add_argument("out", nargs="?", default="final_output.mp4", help="Output video (.mp4 or .webm)")
+    parser.add_argument("--size", default="1280x720", help="Output resolution WxH")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frames per second")
+    parser.add_argument("--trail", type=int, default=45, help="Trail length in frames (0 for none)")
+    args = parser.parse_args()
+
+    from track_store import read_track_arrays
+    tracks = read_track_arrays(args.tracks)
+    if not tracks["meta"]["n"]:
+        raise SystemExit("No track points to render")
+    w,h = map(int, args.size.split("x"))
+    t0 = time.perf_counter()
+    renderer = HawkeyeRenderer(size=(w,h), trail=args.trail)
+    t1 = time.perf_counter()
+    n = renderer.render(tracks, args.out, fps=args.fps)
+    t2 = time.perf_counter()
+    print(f"Saved: {args.out} | {n} frames | static layer {t1 - t0:.2f}s, frames {t2 - t1:.2f}s")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+hit_probability.py
+Monte Carlo hit probability: instead of one deterministic path checked
+against the stumps, sample the state at the last observed frame from the
+tracker's uncertainty and propagate every sample to the stumps plane.
+
+Uncertainty model (x lateral, y forward, metres):
+    - position/velocity covariance of the constant-velocity Kalman filter
+      run over the raw track (batch_kalman, same noise as the tracker),
+      mapped from pixels to metres
+    - plus the spread of the last per-frame velocities that
+      physics_reconstruct takes the median of
+    - impact height: the straight-line height ramp is a heuristic, so it
+      gets a fixed spread `z_sigma` around its end value
+
+Samples are drawn from one seeded generator in fixed-size chunks, so memory
+is bounded by `chunk` and the result does not depend on the chunk size.
+
+Usage:
+    python hit_probability.py --in raw_tracks.json --samples 100000 --seed 0
+"""
+import json
+import time
+import argparse
+import numpy as np
+from batch_kalman import BatchKalman2D
+from stump_geometry import STUMP_HALF_WIDTH, STUMP_HEIGHT, BALL_RADIUS, plane_margin
+# Straight-line model height at the stumps (physics_reconstruct zend) and its spread
+Z_IMPACT = 0.2
+Z_SIGMA = 0.15
+
+def state_distribution(frames, xs_img, ys_img, image_size=(960,540), pitch_length_m=20.12, fps=30.0,
+                       tail=5, process_var=1e-3, meas_var=50.0, calibration=None):
+    """
+    Mean and covariance of [x, y, v_lateral, v_forward] (metres, m/s) at the
+    last observed frame. The mean is what reconstruct_arrays extrapolates from.
+    """
+    from physics_reconstruct import reconstruct_arrays, pixels_to_pitch
+    frames = np.asarray(frames, dtype=int)
+    xs_img = np.asarray(xs_img, dtype=float)
+    ys_img = np.asarray(ys_img, dtype=float)
+    tracks, info = reconstruct_arrays(frames, xs_img, ys_img, image_size=image_size,
+                                      pitch_length_m=pitch_length_m, fps=fps, calibration=calibration)
+    n = info["n_observed"]
+    mean = np.array([tracks["x"][n - 1], tracks["y"][n - 1], info["v_lateral"], info["v_forward"]])
+
+    # filter covariance in pixels / (pixels per frame)
+    kf = BatchKalman2D(1, process_var=process_var, meas_var=meas_var)
+    z = np.stack([xs_img, ys_img], axis=1)[None]
+    _, Pf, _, _ = kf.filter(z)
+    # local pixel -> metre Jacobian at the last point (constant for the linear scale)
+    if calibration is not None:
+        Jp = calibration.jacobian(xs_img[-1], ys_img[-1], image_size)
+    else:
+        Jp = np.diag([3.0 / image_size[0], -pitch_length_m / image_size[1]])
+    J = np.zeros((4, 4))
+    J[:2, :2] = Jp
+    # v_forward = -dy_m/dt
+    J[2:, 2:] = np.diag([1.0, -1.0]) @ Jp * fps
+    cov = J @ Pf[0, -1] @ J.T
+
+    # spread of the per-frame velocities behind the median estimate
+    if n >= 2:
+        t = frames / float(fps)
+        x_m, y_m = pixels_to_pitch(xs_img, ys_img, image_size, pitch_length_m, calibration)
+        for k, v in ((2, np.gradient(x_m, t)), (3, -np.gradient(y_m, t))):
+            v = v[-tail:]
+            mad = 1.4826 * np.median(np.abs(v - np.median(v)))
+            cov[k, k] += mad ** 2 / len(v)
+    return mean, cov
+
+def _classify(x, z, half_width, height, radius):
+    """0 = missing, 1 = clipping (ball touches, centre outside), 2 = hitting (centre inside)."""
+    m = plane_margin(x, z, radius, half_width, height)
+    return (m >= 0).astype(np.int8) + (m >= radius).astype(np.int8)
+
+def hit_probability(mean, cov, n_samples=100000, chunk=20000, seed=0, z_impact=Z_IMPACT, z_sigma=Z_SIGMA,
+                    half_width=STUMP_HALF_WIDTH, height=STUMP_HEIGHT, radius=BALL_RADIUS,
+                    bins=(40, 20)):
+    """
+    Propagate `n_samples` straight-line paths from N(mean, cov) to y = 0.
+
+    Returns a dict with p_hit (ball touches the stumps), p_hitting (ball
+    centre inside the stumps), p_clipping, p_missing, the impact-point
+    distribution (moments, percentiles and a 2D histogram over x/z) and a
+    verdict: HITTING when most samples have the centre inside, MISSING when
+    most samples miss, UMPIRE'S CALL in between.
+    """
+    rng = np.random.default_rng(seed)
+    L = np.linalg.cholesky(cov + np.eye(4) * 1e-12)
+    x_edges = np.linspace(-1.0, 1.0, bins[0] + 1)
+    z_edges = np.linspace(0.0, 1.5, bins[1] + 1)
+    hist = np.zeros(bins, dtype=np.int64)
+    counts = np.zeros(3, dtype=np.int64)
+    arrive = 0
+    sums = np.zeros(4)
+    xs, zs = [], []
+    # every `stride`-th sample is kept for the percentiles (at most ~20k points)
+    stride = -(-n_samples // 20000)
+
+    done = 0
+    while done < n_samples:
+        m = min(chunk, n_samples - done)
+        # one draw per sample (4 state + 1 height), so the stream is independent of `chunk`
+        u = rng.standard_normal((m, 5))
+        s = mean + u[:, :4] @ L.T
+        ok = s[:, 3] > 0
+        t = np.where(ok, s[:, 1], 0.0) / np.where(ok, s[:, 3], 1.0)
+        sub = (np.arange(done, done + m) % stride == 0)[ok]
+        x = (s[:, 0] + s[:, 2] * t)[ok]
+        z = np.maximum(z_impact + z_sigma * u[:, 4], 0.0)[ok]
+
+        cls = _classify(x, z, half_width, height, radius)
+        counts += np.bincount(cls, minlength=3)
+        counts[0] += m - ok.sum()
+        arrive += x.size
+        sums += (x.sum(), (x * x).sum(), z.sum(), (z * z).sum())
+        hist += np.histogram2d(np.clip(x, -1.0, 1.0), np.clip(z, 0.0, 1.5), bins=(x_edges, z_edges))[0].astype(np.int64)
+        xs.append(x[sub])
+        zs.append(z[sub])
+        done += m
+
+    xs, zs = np.concatenate(xs), np.concatenate(zs)
+    p_missing, p_clipping, p_hitting = counts / float(n_samples)
+    p_hit = p_clipping + p_hitting
+    if p_hitting >= 0.5:
+        verdict = "HITTING"
+    elif p_hit < 0.5:
+        verdict = "MISSING"
+    else:
+        verdict = "UMPIRE'S CALL"
+    a = max(1, arrive)
+    x_mean, z_mean = sums[0] / a, sums[2] / a
+    pct = [2.5, 50.0, 97.5]
+    return {
+        "n_samples": int(n_samples), "seed": seed,
+        "p_hit": float(p_hit), "p_hitting": float(p_hitting),
+        "p_clipping": float(p_clipping), "p_missing": float(p_missing),
+        "verdict": verdict,
+        "impact": {
+            "x_mean": float(x_mean), "x_std": float(np.sqrt(max(0.0, sums[1] / a - x_mean ** 2))),
+            "z_mean": float(z_mean), "z_std": float(np.sqrt(max(0.0, sums[3] / a - z_mean ** 2))),
+            "x_pct": np.percentile(xs, pct).tolist() if xs.size else None,
+            "z_pct": np.percentile(zs, pct).tolist() if zs.size else None,
+            "hist": hist.tolist(), "x_edges": x_edges.tolist(), "z_edges": z_edges.tolist(),
+        },
+        # the band where the ball touches the stumps with its centre outside
+        "umpires_call_band": {"x": [half_width, half_width + radius], "z": [height, height + radius]},
+    }
+
+def track_hit_probability(frames, xs_img, ys_img, image_size=(960,540), pitch_length_m=20.12, fps=30.0,
+                          calibration=None, **kwargs):
+    """hit_probability() for one raw 2D track (image-space arrays)."""
+    t0 = time.perf_counter()
+    mean, cov = state_distribution(frames, xs_img, ys_img, image_size=image_size,
+                                   pitch_length_m=pitch_length_m, fps=fps, calibration=calibration)
+    out = hit_probability(mean, cov, **kwargs)
+    out["state_mean"] = mean.tolist()
+    out["state_std"] = np.sqrt(np.diag(cov)).tolist()
+    out["seconds"] = time.perf_counter() - t0
+    return out
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo probability that the ball hits the stumps.")
+    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Input raw tracks (2D JSON or .trk)")
+    parser.add_argument("--out", dest="outfile", default=None, help="Optional JSON report")
+    parser.add_argument("--imgsize", default="960x540", help="Image size used during tracking WxH")
+    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS")
+    parser.add_argument("--pitchlen", type=float, default=20.12, help="Pitch length in metres")
+    parser.add_argument("--samples", type=int, default=100000, help="Number of sampled trajectories")
+    parser.add_argument("--chunk", type=int, default=20000, help="Samples propagated per chunk")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    from track_store import read_track_arrays
+    raw = read_track_arrays(args.infile)
+    ok = np.asarray(raw["valid"], dtype=bool)
+    w,h = map(int, args.imgsize.split("x"))
+    report = track_hit_probability(np.asarray(raw["frame"])[ok], np.asarray(raw["x"])[ok],
+                                   np.asarray(raw["y"])[ok], image_size=(w,h),
+                                   pitch_length_m=args.pitchlen, fps=args.fps,
+                                   n_samples=args.samples, chunk=args.chunk, seed=args.seed)
+    if args.outfile:
+        with open(args.outfile, "w") as f:
+            json.dump(report, f, indent=2)
+    imp = report["impact"]
+    print(f"P(hit) {report['p_hit']:.3f} | hitting {report['p_hitting']:.3f}, clipping {report['p_clipping']:.3f}, "
+          f"missing {report['p_missing']:.3f} -> {report['verdict']}")
+    print(f"Impact x {imp['x_mean']:.3f} +/- {imp['x_std']:.3f} m, z {imp['z_mean']:.3f} +/- {imp['z_std']:.3f} m "
+          f"({report['n_samples']} samples in {report['seconds']:.3f}s)")
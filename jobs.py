@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+jobs.py
+Background review jobs for the Streamlit app (or any other front end):
+tracking -> reconstruction -> decision run in a bounded process pool, one
+job per submitted clip, so concurrent reviewers neither block the page nor
+overwrite each other's tracks.
+
+Every job gets its own directory under `.udrs_jobs/<job_id>/` holding a copy
+of the clip, its raw_tracks.json / tracks.json, result.json (the decision,
+stage timings and the options the job ran with, fps resolved from the clip
+unless given) and status.json.
+The worker rewrites status.json (atomically, a few times a second) with the
+current stage and its frames per second; the front end polls it.
+Cancelling a queued job drops it from the pool; a running job sees the
+`cancel` flag file at its next frame and stops.
+
+A job left active on disk by a server process that is gone (its worker or
+owner pid no longer exists, or it started more than a day ago) is
+reported as failed, so cleanup() can remove its directory.
+
+Workers are started with the "spawn" method, since the Streamlit server is
+multi-threaded. Each worker keeps its own StageCache handle on the shared
+cache directory (cache writes are atomic).
+
+Usage:
+    python jobs.py clip1.mp4 clip2.mp4 --max-workers 2 --cache .udrs_cache
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+JOBS_DIR = ".udrs_jobs"
+STATUS_FILE = "status.json"
+RESULT_FILE = "result.json"
+CANCEL_FILE = "cancel"
+RAW_TRACKS = "raw_tracks.json"
+TRACKS_OUT = "tracks.json"
+
+ACTIVE_STATES = ("queued", "running")
+
+# an active job older than this with no future in this process is orphaned
+STALE_S = 24 * 3600
+
+class JobCancelled(Exception):
+    pass
+
+def _write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _pid_alive(pid):
+    """False if no process `pid` exists; None where that cannot be checked safely."""
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _orphaned(status, stale_s=STALE_S):
+    """Whether an active-looking status belongs to a worker or server process that is gone."""
+    pid = status.get("pid") if status["state"] == "running" else status.get("owner")
+    if pid and _pid_alive(pid) is False:
+        return True
+    since = status.get("started") or status.get("submitted") or 0
+    return time.time() - since > stale_s
+
+# StageCache handles per worker process, keyed on the cache directory
+_CACHES = {}
+
+def _run_job(job_dir, video_path, options):
+    """
+    Worker-process entry point: run the review pipeline on `video_path`,
+    writing progress to status.json and outputs into `job_dir`. Returns the
+    final status dict.
+    """
+    import cv2
+    from udrs_pipeline import ReviewPipeline
+
+    status_path = os.path.join(job_dir, STATUS_FILE)
+    cancel_path = os.path.join(job_dir, CANCEL_FILE)
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    fps = options.get("fps") or cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    status = {"state": "running", "stage": "track", "frames": 0, "total_frames": total, "fps": 0.0,
+              "stages": {}, "started": time.time(), "pid": os.getpid()}
+    clock = {"stage": time.perf_counter(), "written": 0.0}
+
+    def check_cancel():
+        if os.path.exists(cancel_path):
+            raise JobCancelled()
+
+    def on_frame(n, interval=0.25):
+        # throttle: status.json is rewritten (and the cancel flag checked) a few times a second
+        now = time.perf_counter()
+        if now - clock["written"] < interval:
+            return
+        clock["written"] = now
+        check_cancel()
+        status["frames"] = n
+        status["fps"] = n / max(now - clock["stage"], 1e-9)
+        _write_json(status_path, status)
+
+    def on_stage(stage, info):
+        frames = info.get("frames") or info.get("points")
+        status["stages"][stage] = {"seconds": info["seconds"], "frames": frames,
+                                   "fps": frames / info["seconds"] if frames and info["seconds"] else None}
+        if stage == "track":
+            status["frames"] = frames
+        nxt = {"track": "interpolate", "interpolate": "reconstruct", "reconstruct": "decide"}.get(stage)
+        status["stage"] = nxt
+        clock["stage"] = time.perf_counter()
+        _write_json(status_path, status)
+        check_cancel()
+
+    cache = None
+    if options.get("cache_dir"):
+        key = os.path.abspath(options["cache_dir"])
+        if key not in _CACHES:
+            from stage_cache import StageCache
+            _CACHES[key] = StageCache(options["cache_dir"], max_bytes=options.get("cache_mb", 2048) * 1e6)
+        cache = _CACHES[key]
+    calibration = None
+    if options.get("calibration"):
+        from calibration import Calibration
+        calibration = Calibration.load(options["calibration"])
+
+    try:
+        check_cancel()
+        _write_json(status_path, status)
+        pipe = ReviewPipeline(resize=tuple(options.get("resize", (960,540))), fps=fps,
+                              pitch_length_m=options.get("pitch_length_m", 20.12),
+                              track_options={"workers": options.get("workers", 0), "progress": on_frame},
+                              progress=on_stage, cache=cache, calibration=calibration)
+        result = pipe.run(video_path)
+        pipe.save(result, os.path.join(job_dir, RAW_TRACKS), os.path.join(job_dir, TRACKS_OUT))
+        _write_json(os.path.join(job_dir, RESULT_FILE),
+                    {"decision": result["decision"], "timings": result["timings"],
+                     "options": {"resize": list(pipe.resize), "fps": pipe.fps, "pitch_length_m": pipe.pitch_length_m,
+                                 "calibration": options.get("calibration")}})
+        status["state"] = "done"
+    except JobCancelled:
+        status["state"] = "cancelled"
+    except Exception as exc:
+        status["state"] = "failed"
+        status["error"] = f"{type(exc).__name__}: {exc}"
+    status["finished"] = time.time()
+    _write_json(status_path, status)
+    return status
+
+class JobManager:
+    """
+    Submits review jobs to a pool of at most `max_workers` processes; extra
+    jobs wait in the pool's queue with state "queued". One manager per server
+    process (e.g. via st.cache_resource); job state lives on disk, so any
+    session can poll any job id.
+    """
+    def __init__(self, root=JOBS_DIR, max_workers=2, cache_dir=None, cache_mb=2048):
+        self.root = root
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.cache_mb = cache_mb
+        os.makedirs(root, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._futures = {}
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def path(self, job_id, name):
+        """Path of a job output (RAW_TRACKS, TRACKS_OUT, or any file the caller keeps there)."""
+        return os.path.join(self.job_dir(job_id), name)
+
+    def submit(self, video_path, resize=(960,540), fps=None, pitch_length_m=20.12, workers=0, calibration=None):
+        """Copy the clip into a fresh job directory and queue it (fps=None: the clip's). Returns the job id."""
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir)
+        # the job owns its input: the caller's upload temp file may be gone before the job starts
+        video = os.path.join(job_dir, "input" + (os.path.splitext(video_path)[1] or ".mp4"))
+        shutil.copyfile(video_path, video)
+        _write_json(os.path.join(job_dir, STATUS_FILE), {"state": "queued", "stage": None, "frames": 0,
+                                                        "stages": {}, "submitted": time.time(),
+                                                        "owner": os.getpid()})
+        options = {"resize": list(resize), "fps": fps, "pitch_length_m": pitch_length_m, "workers": workers,
+                   "calibration": calibration, "cache_dir": self.cache_dir, "cache_mb": self.cache_mb}
+        self._futures[job_id] = self.pool.submit(_run_job, job_dir, video, options)
+        return job_id
+
+    def status(self, job_id):
+        """The job's status dict ({"state", "stage", "frames", "total_frames", "fps", "stages", ...})."""
+        status = _read_json(self.path(job_id, STATUS_FILE))
+        if status is None:
+            return {"state": "unknown"}
+        fut = self._futures.get(job_id)
+        if fut is not None and fut.done() and status["state"] in ACTIVE_STATES:
+            # the worker died (or the job was dropped) without writing a final status
+            exc = None if fut.cancelled() else fut.exception()
+            status["state"] = "cancelled" if fut.cancelled() else "failed"
+            if exc is not None:
+                status["error"] = f"{type(exc).__name__}: {exc}"
+        elif fut is None and status["state"] in ACTIVE_STATES and _orphaned(status):
+            # left behind by a server process that is gone: it will never finish
+            status["error"] = f"orphaned {status['state']} job"
+            status["state"] = "failed"
+        return status
+
+    def result(self, job_id):
+        """{"decision", "timings", "options"} of a finished job, else None."""
+        return _read_json(self.path(job_id, RESULT_FILE))
+
+    def cancel(self, job_id):
+        fut = self._futures.get(job_id)
+        if fut is not None and fut.cancel():
+            status = self.status(job_id)
+            status["state"] = "cancelled"
+            _write_json(self.path(job_id, STATUS_FILE), status)
+            return
+        # already running: the worker polls the flag file
+        open(self.path(job_id, CANCEL_FILE), "w").close()
+
+    def active(self):
+        return [j for j in self._futures if self.status(j)["state"] in ACTIVE_STATES]
+
+    def cleanup(self, max_age_s=24 * 3600):
+        """
+        Delete finished (or orphaned) job directories older than `max_age_s`.
+        Returns how many were removed.
+        """
+        removed = 0
+        now = time.time()
+        for job_id in os.listdir(self.root):
+            status = self.status(job_id)
+            if status["state"] in ACTIVE_STATES:
+                continue
+            try:
+                age = now - os.path.getmtime(self.job_dir(job_id))
+            except OSError:
+                continue
+            if age > max_age_s:
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+                self._futures.pop(job_id, None)
+                removed += 1
+        return removed
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait, cancel_futures=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run review jobs in a bounded process pool and show their progress.")
+    parser.add_argument("videos", nargs="+", help="Input video paths (one job each)")
+    parser.add_argument("--max-workers", type=int, default=2, help="Concurrent jobs")
+    parser.add_argument("--root", default=JOBS_DIR, help="Jobs directory")
+    parser.add_argument("--cache", default=None, help="Stage cache directory")
+    parser.add_argument("--resize", default="960x540", help="Resize WxH")
+    parser.add_argument("--fps", type=float, default=None, help="Video FPS used for timing (default: the clip's)")
+    args = parser.parse_args()
+
+    w,h = map(int, args.resize.split("x"))
+    manager = JobManager(args.root, max_workers=args.max_workers, cache_dir=args.cache)
+    ids = [manager.submit(v, resize=(w,h), fps=args.fps) for v in args.videos]
+    try:
+        while True:
+            states = [manager.status(j) for j in ids]
+            print(" | ".join(f"{j}: {s['state']} {s.get('stage') or ''} {s.get('frames', 0)}f {s.get('fps') or 0:.0f}fps"
+                             for j, s in zip(ids, states)))
+            if all(s["state"] not in ACTIVE_STATES for s in states):
+                break
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        for j in ids:
+            manager.cancel(j)
+    finally:
+        manager.shutdown()
+    for j in ids:
+        res = manager.result(j)
+        print(j, "->", manager.job_dir(j), res and res["decision"]["decision"])
@@ -1,23 +1,66 @@
 #!/usr/bin/env python3
+"""
+make_video.py
+Encode a folder (or glob / printf-style sequence) of image frames into a video.
+
+Frames are ordered by frame number (frame_2.png before frame_10.png) and
+decoded ahead of the encoder on a thread pool, so the writer is never
+waiting on imread.
+
+Usage:
+    python make_video.py --frames frames --out final_output.mp4
+    python make_video.py --frames "frames/frame_*.png" --out final_output.mp4
+    python make_video.py --frames frames/frame_%04d.png --out final_output.mp4 --workers 4
+"""
 import cv2
 import os
+import re
+import glob
 import argparse
 from tqdm import tqdm
+from pipeline_stage import ordered_stage
 
 def is_image(filename):
     return filename.lower().endswith((".png", ".jpg", ".jpeg"))
 
-def create_video(frames_dir, output_file, fps=30, interpolate=False):
-    if not os.path.exists(frames_dir):
+def natural_key(path):
+    """Sort key that compares digit runs as numbers: frame_2 < frame_10."""
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r"(\d+)", os.path.basename(path))]
+
+def list_frames(source):
+    """
+    Image paths for a directory, a glob ("frames/*.png") or a printf-style
+    sequence ("frames/frame_%04d.png"), sorted by frame number.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, f) for f in os.listdir(source) if is_image(f)]
+    elif re.search(r"%0?\d*d", source):
+        # printf pattern: glob for candidates, then keep exact matches only
+        head, tail = re.split(r"%0?\d*d", source, maxsplit=1)
+        width = re.search(r"%0?(\d*)d", source).group(1)
+        digits = r"\d{%s,}" % width if width else r"\d+"
+        rx = re.compile(re.escape(head) + digits + re.escape(tail) + "$")
+        paths = [p for p in glob.glob(glob.escape(head) + "*" + glob.escape(tail)) if rx.match(p)]
+    else:
+        paths = [p for p in glob.glob(source) if is_image(p)]
+    return sorted(paths, key=natural_key)
+
+def prefetch_frames(paths, workers=4, prefetch=16):
+    """Yield (path, image) in order while up to `prefetch` frames are decoded ahead on `workers` threads."""
+    for i, img in ordered_stage(enumerate(paths), cv2.imread, workers=workers, queue_size=max(1, prefetch)):
+        yield paths[i], img
+
+def create_video(frames_dir, output_file, fps=30, interpolate=False, workers=4, prefetch=16):
+    if not os.path.isdir(frames_dir) and not glob.has_magic(frames_dir) and "%" not in frames_dir:
         print(f"ERROR: Frames directory '{frames_dir}' does not exist.")
         return
 
-    frames = sorted([f for f in os.listdir(frames_dir) if is_image(f)])
+    frames = list_frames(frames_dir)
     if not frames:
         print("ERROR: No image frames found!")
         return
 
-    first_frame = cv2.imread(os.path.join(frames_dir, frames[0]))
+    first_frame = cv2.imread(frames[0])
     height, width, _ = first_frame.shape
 
     ext = output_file.split(".")[-1].lower()
@@ -32,8 +75,8 @@ def create_video(frames_dir, output_file, fps=30, interpolate=False):
     writer = cv2.VideoWriter(output_file, fourcc, fps, (width, height))
     print(f"Creating video: {output_file} | FPS: {fps} | Frames: {len(frames)} | Interp: {interpolate}")
 
-    for fn in tqdm(frames, desc="Writing frames"):
-        img = cv2.imread(os.path.join(frames_dir, fn))
+    reader = prefetch_frames(frames, workers=workers, prefetch=prefetch)
+    for fn, img in tqdm(reader, total=len(frames), desc="Writing frames"):
         if img is None:
             print("Warning: couldn't read", fn)
             continue
@@ -47,10 +90,14 @@ def create_video(frames_dir, output_file, fps=30, interpolate=False):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Encode frames into video")
-    parser.add_argument("--frames", default="frames", help="Frames folder")
+    parser.add_argument("--frames", default="frames",
+                        help="Frames folder, glob (\"frames/*.png\") or sequence (frames/frame_%%04d.png)")
     parser.add_argument("--out", default="output.mp4", help="Output file (.mp4 or .webm)")
     parser.add_argument("--fps", type=int, default=30, help="Frames per second")
     parser.add_argument("--smooth", action="store_true", help="Duplicate frames for simple smoothing")
+    parser.add_argument("--workers", type=int, default=4, help="Decoder threads (0 reads inline)")
+    parser.add_argument("--prefetch", type=int, default=16, help="Max frames decoded ahead of the writer")
     args = parser.parse_args()
 
-    create_video(args.frames, args.out, fps=args.fps, interpolate=args.smooth)
+    create_video(args.frames, args.out, fps=args.fps, interpolate=args.smooth,
+                 workers=args.workers, prefetch=args.prefetch)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+overlay.py
+Broadcast-style overlay on the source footage, from the same decode pass
+that tracks the ball: the tracked path, the predicted path to the stumps,
+the pitching point and the impact marker with the decision.
+
+Decoded frames are scaled to the tracking size for the tracker and to the
+output size for a bounded buffer before anything is queued, so no source
+resolution frame is held: at most `buffer_frames` tracked frames are held
+back, fewer if they and the frames the pipelined tracker has decoded ahead
+(at both sizes) would not fit in `buffer_mb` megabytes. Frames leave the buffer annotated with the track
+so far. The prediction is made when the track is
+lost for `lost_frames` frames (the delivery is over) or at the end of the
+clip, and only the frames still buffered then, which cover the end of the
+delivery, are drawn with it. Output defaults to the source size capped at
+MAX_OUT_SIZE, so 4K sources do not fill the buffer with 4K frames.
+
+Usage:
+    python overlay.py input_video.mp4 --out overlay.mp4 --buffer 90 --buffer-mb 512
+"""
+import cv2
+import time
+import argparse
+import numpy as np
+from bisect import bisect_right
+from collections import deque
+from extract_tracks_kalman import track_frames, read_frames
+
+TRACK_BGR = (0, 215, 255)
+PRED_BGR = (255, 160, 0)
+PITCH_BGR = (255, 255, 255)
+OUT_BGR = (0, 0, 230)
+NOT_OUT_BGR = (0, 200, 0)
+
+# default output is the source size scaled down to fit this
+MAX_OUT_SIZE = (1920, 1080)
+
+def pitching_frame(frames, ys, min_ratio=4.0):
+    """
+    Index of the pitching point in a gap-filled 2D track: the sharpest change
+    of the ball's vertical image velocity, if it stands out from the rest of
+    the track by `min_ratio`; otherwise None.
+    """
+    ys = np.asarray(ys, dtype=float)
+    if len(ys) < 5 or not np.isfinite(ys).all():
+        return None
+    acc = np.abs(np.gradient(np.gradient(ys, frames), frames))
+    inner = acc[2:-2]
+    k = int(np.argmax(inner))
+    if inner[k] <= min_ratio * (np.median(inner) + 1e-9):
+        return None
+    return k + 2
+
+def _polyline(img, pts, color, thickness, S=4):
+    pts = pts[np.isfinite(pts).all(axis=1)]
+    if len(pts) > 1:
+        cv2.polylines(img, [np.round(pts * S).astype(np.int32)], False, color, thickness, cv2.LINE_AA, 2)
+
+def fit_size(size, limit=MAX_OUT_SIZE):
+    """`size` scaled down (aspect kept, even dimensions) to fit within `limit`."""
+    k = min(1.0, limit[0] / float(size[0]), limit[1] / float(size[1]))
+    if k >= 1.0:
+        return tuple(size)
+    return (max(2, int(size[0] * k) // 2 * 2), max(2, int(size[1] * k) // 2 * 2))
+
+def draw_overlay(img, scale, tracked, predicted=None, pitch=None, impact=None, decision=None):
+    """Draw in place. Points are tracking-resolution pixels; `scale` maps them to `img`."""
+    t = max(1, int(round(2 * scale.mean())))
+    _polyline(img, tracked * scale, TRACK_BGR, t)
+    if predicted is not None:
+        _polyline(img, predicted * scale, PRED_BGR, t)
+    if pitch is not None:
+        c = tuple(int(v) for v in np.round(pitch * scale))
+        cv2.circle(img, c, 4 * t, PITCH_BGR, t, cv2.LINE_AA)
+    if impact is not None and decision is not None:
+        color = OUT_BGR if decision["decision"] == "OUT" else NOT_OUT_BGR
+        c = tuple(int(v) for v in np.round(impact * scale))
+        cv2.drawMarker(img, c, color, cv2.MARKER_TILTED_CROSS, 10 * t, t, cv2.LINE_AA)
+        label = decision["decision"]
+        if decision.get("margin") is not None:
+            label += f"  ({decision['margin'] * 100:+.1f} cm)"
+        cv2.putText(img, label, (20 * t, 30 * t), cv2.FONT_HERSHEY_SIMPLEX, 0.8 * t, color, t, cv2.LINE_AA)
+
+def overlay_video(video_path, out_path, pipeline=None, out_size=None, buffer_frames=90, buffer_mb=512,
+                  lost_frames=15, max_frames=None, workers=0, queue_size=32, roi=None, motion=None):
+    """
+    Track `video_path` and write the annotated clip to `out_path` in one
+    decode pass. `pipeline` is a udrs_pipeline.ReviewPipeline (interpolation,
+    reconstruction and decision settings). out_size defaults to the source
+    size fitted to MAX_OUT_SIZE. Returns the pipeline result dict
+    ({"raw", "tracks", "decision", "timings"}) plus "overlay_frames".
+    """
+    from udrs_pipeline import ReviewPipeline
+    from physics_reconstruct import pitch_to_pixels
+    pipe = pipeline or ReviewPipeline()
+    resize = pipe.resize
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or pipe.fps
+    src = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    out_size = tuple(out_size or fit_size(src))
+    scale = np.array([out_size[0] / float(resize[0]), out_size[1] / float(resize[1])])
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    max_frames = frame_count if max_frames is None else min(frame_count, max_frames)
+
+    # frames the decoder thread buffers ahead of the tracker (its queue + the reorder window);
+    # each of those is held at tracking size in the queue and at output size in `buf`
+    ahead = 2 * queue_size + workers if workers > 0 else 0
+    out_bytes = out_size[0] * out_size[1] * 3
+    ahead_bytes = ahead * (out_bytes + resize[0] * resize[1] * 3)
+    by_bytes = int((buffer_mb * 1e6 - ahead_bytes) // out_bytes)
+    keep = max(1, min(buffer_frames, by_bytes))
+
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, out_size)
+    if not writer.isOpened():
+        cap.release()
+        raise IOError(f"Cannot open video writer: {out_path}")
+
+    buf = deque()
+
+    def frames():
+        # the one decode pass: every frame goes to the buffer at output size and to the
+        # tracker at tracking size (the same resize track_frames would do, so it is a no-op there)
+        for i, frame in read_frames(cap, max_frames):
+            buf.append((i, frame if out_size == src else cv2.resize(frame, out_size, interpolation=cv2.INTER_AREA)))
+            yield i, frame if resize == src else cv2.resize(frame, resize)
+
+    t0 = time.perf_counter()
+    detections = []
+    track_f = []                    # frames of the tracked points, in order
+    track_xy = np.empty((256, 2))   # tracked points at tracking resolution, grown by doubling
+    written = 0
+    drawn = {}                      # prediction, once made: predicted, pitch, impact, decision
+    result = None
+
+    def emit(i, img, predicted=None, pitch=None, impact=None, decision=None):
+        tracked = track_xy[:bisect_right(track_f, i)]
+        if pitch is not None and i < pitch[0]:
+            pitch = None
+        draw_overlay(img, scale, tracked, predicted, None if pitch is None else pitch[1], impact, decision)
+        writer.write(img)
+
+    def predict():
+        pipe.stage_done("track", t0, frames=len(detections))
+        if not track_f:
+            return {"raw": None, "tracks": None, "decision": None}
+        raw = pipe.interpolate(detections)
+        tracks = pipe.reconstruct(raw)
+        decision = pipe.decide(tracks)
+        # predicted part of the 3D path back in tracking pixels (image y is forward distance)
+        n = len(raw["frame"])
+        u, v = pitch_to_pixels(tracks["x"][n - 1:], tracks["y"][n - 1:], resize, pipe.pitch_length_m,
+                               pipe.calibration)
+        k = pitching_frame(raw["frame"], raw["y"])
+        impact = None
+        if decision["x"] is not None:
+            impact = np.array(pitch_to_pixels(decision["x"], decision["y"], resize, pipe.pitch_length_m,
+                                              pipe.calibration), dtype=float)
+        drawn.update(predicted=np.stack([u, v], axis=1), impact=impact, decision=decision,
+                     pitch=None if k is None else (raw["frame"][k], np.array([raw["x"][k], raw["y"][k]])))
+        return {"raw": raw, "tracks": tracks, "decision": decision}
+
+    def flush(upto):
+        nonlocal written
+        while buf and buf[0][0] <= upto:
+            emit(*buf.popleft(), **drawn)
+            written += 1
+
+    try:
+        for det in track_frames(frames(), resize=resize, workers=workers, queue_size=queue_size,
+                                roi=roi, motion=motion):
+            detections.append(det)
+            if det["x"] is not None:
+                if len(track_f) == len(track_xy):
+                    track_xy = np.concatenate([track_xy, np.empty_like(track_xy)])
+                track_xy[len(track_f)] = (det["x"], det["y"])
+                track_f.append(det["frame"])
+            elif result is None and track_f and det["frame"] - track_f[-1] >= lost_frames:
+                # the delivery is over: predict now, while its end is still buffered
+                result = predict()
+                flush(det["frame"])
+                drawn.clear()
+            # hold back `keep` tracked frames; frames decoded ahead stay until their detection is known
+            while buf and det["frame"] - buf[0][0] + 1 > keep:
+                emit(*buf.popleft())
+                written += 1
+
+        if result is None:
+            result = predict()
+        flush(detections[-1]["frame"] if detections else -1)
+    finally:
+        cap.release()
+        writer.release()
+    result["timings"] = dict(pipe.timings)
+    result["overlay_frames"] = written
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track a clip and overlay the tracked/predicted path in one pass.")
+    parser.add_argument("video", help="Input video path")
+    parser.add_argument("--out", default="overlay.mp4", help="Annotated output video")
+    parser.add_argument("--resize", default="960x540", help="Tracking resolution WxH")
+    parser.add_argument("--out-size", default=None, help="Output resolution WxH (default: source, at most 1920x1080)")
+    parser.add_argument("--buffer", type=int, default=90, help="Frames held back waiting for the prediction")
+    parser.add_argument("--buffer-mb", type=float, default=512, help="Memory limit of the held-back frames")
+    parser.add_argument("--lost", type=int, default=15, help="Missed frames that end the delivery")
+    parser.add_argument("--maxframes", type=int, default=None, help="Max frames to process")
+    parser.add_argument("--workers", type=int, default=0, help="Vision worker threads")
+    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS (used for timing)")
+    parser.add_argument("--pitchlen", type=float, default=20.12, help="Pitch length in metres")
+    parser.add_argument("--calibration", default=None, help="Camera profile (calibrations/<name>.json or path)")
+    args = parser.parse_args()
+
+    from udrs_pipeline import ReviewPipeline
+    calibration = None
+    if args.calibration:
+        from calibration import Calibration
+        calibration = Calibration.load(args.calibration)
+    w,h = map(int, args.resize.split("x"))
+    pipe = ReviewPipeline(resize=(w,h), fps=args.fps, pitch_length_m=args.pitchlen, calibration=calibration)
+    out_size = tuple(map(int, args.out_size.split("x"))) if args.out_size else None
+    t0 = time.perf_counter()
+    result = overlay_video(args.video, args.out, pipeline=pipe, out_size=out_size, buffer_frames=args.buffer,
+                           buffer_mb=args.buffer_mb, lost_frames=args.lost, max_frames=args.maxframes,
+                           workers=args.workers)
+    d = result["decision"]
+    print(f"Saved {args.out}: {result['overlay_frames']} frames in {time.perf_counter() - t0:.2f}s")
+    print("Decision:", "NO TRACK" if d is None else d["decision"])
@@ -8,9 +8,13 @@ Usage:
 Input:
     raw_tracks.json  (list of {"frame": int, "x": float, "y": float})
       - x,y are image-space coordinates (same as produced by extract_tracks_kalman.py)
+      - a .trk file (see track_store.py) is read through a memory map instead
+      - with --calibration, pixels are mapped through a per-camera homography
+        (see calibration.py) instead of the fixed linear scale
 
 Output:
     tracks.json  (list of {"frame": int, "x": float, "y": float, "z": float})
+      - written in the binary .trk format when the path does not end in .json
       - x: lateral meters (-~1.5..1.5)
       - y: forward meters (stumps at y=0)
       - z: height in meters (plausible estimate)
@@ -20,142 +24,288 @@ import numpy as np
 import argparse
 import os
 import math
+import warnings
+from track_store import read_track_arrays, write_tracks
+
+# Stage cache version: bump whenever the reconstruction's output changes for the same inputs
+RECONSTRUCT_VERSION = 1
 
 def straight_line_reconstruct(raw_json="raw_tracks.json", out_json="tracks.json",
                               image_size=(960,540), pitch_length_m=20.12, fps=30.0,
-                              min_forward_speed=0.5, max_extrap_seconds=4.0):
+                              min_forward_speed=0.5, max_extrap_seconds=4.0, cache=None, calibration=None):
     if not os.path.exists(raw_json):
         raise FileNotFoundError(f"Input file not found: {raw_json}")
 
-    with open(raw_json, "r") as f:
-        raw = json.load(f)
-
-    if not raw:
+    raw = read_track_arrays(raw_json)
+    meta = raw["meta"]
+    if not meta["n"]:
         raise ValueError("raw_tracks.json is empty")
 
+    if image_size is None:
+        image_size = meta.get("image_size") or (960,540)
+    if fps is None:
+        fps = meta.get("fps") or 30.0
+
+    tracks, info = reconstruct_arrays(raw["frame"], raw["x"], raw["y"], image_size=image_size,
+                                      pitch_length_m=pitch_length_m, fps=fps,
+                                      min_forward_speed=min_forward_speed,
+                                      max_extrap_seconds=max_extrap_seconds, cache=cache,
+                                      calibration=calibration)
+    out_points = [{"frame": int(f), "x": float(x), "y": float(y), "z": float(z)}
+                  for f, x, y, z in zip(tracks["frame"], tracks["x"], tracks["y"], tracks["z"])]
+
+    # Save to JSON (or .trk)
+    write_tracks(out_json, tracks, fps=fps, image_size=image_size,
+                 params={"pitch_length_m": pitch_length_m, "min_forward_speed": min_forward_speed,
+                         "max_extrap_seconds": max_extrap_seconds,
+                         "calibration": calibration.path if calibration is not None else None})
+
+    print(f"Saved reconstructed 3D tracks to {out_json}")
+    print(f"Original frames: {info['n_observed']}, total output points: {len(out_points)}")
+    print(f"Estimated forward speed: {info['v_forward']:.2f} m/s, lateral speed: {info['v_lateral']:.3f} m/s")
+    return out_points
+
+def reconstruct_arrays(frames, xs_img, ys_img, image_size=(960,540), pitch_length_m=20.12, fps=30.0,
+                       min_forward_speed=0.5, max_extrap_seconds=4.0, cache=None, calibration=None):
+    """
+    Array-level straight_line_reconstruct: image-space track arrays in,
+    ({"frame", "x", "y", "z"} column arrays, {"v_forward", "v_lateral", "n_observed"}) out.
+
+    cache: optional stage_cache.StageCache keyed on the input arrays and parameters.
+    calibration: optional calibration.Calibration for the pixel -> metre mapping.
+    """
     # Extract arrays
-    frames = np.array([int(p["frame"]) for p in raw], dtype=int)
-    xs_img = np.array([float(p["x"]) for p in raw], dtype=float)
-    ys_img = np.array([float(p["y"]) for p in raw], dtype=float)
+    frames = np.asarray(frames, dtype=int)
+    xs_img = np.asarray(xs_img, dtype=float)
+    ys_img = np.asarray(ys_img, dtype=float)
+    if frames.size == 0:
+        raise ValueError("Cannot reconstruct an empty track")
 
+    if cache is not None:
+        from stage_cache import data_digest
+        params = {"version": RECONSTRUCT_VERSION, "image_size": list(image_size),
+                  "pitch_length_m": pitch_length_m, "fps": fps,
+                  "min_forward_speed": min_forward_speed, "max_extrap_seconds": max_extrap_seconds}
+        if calibration is not None:
+            params["calibration"] = calibration.digest()
+            params["calibration_mapping"] = calibration.mapping(image_size)
+        return cache.cached("reconstruct", data_digest([frames, xs_img, ys_img]), params,
+                            lambda: reconstruct_arrays(frames, xs_img, ys_img, image_size, pitch_length_m,
+                                                       fps, min_forward_speed, max_extrap_seconds,
+                                                       calibration=calibration))
+
+    cols, info = reconstruct_batch([frames], [xs_img], [ys_img], image_size=image_size,
+                                   pitch_length_m=pitch_length_m, fps=fps,
+                                   min_forward_speed=min_forward_speed,
+                                   max_extrap_seconds=max_extrap_seconds, calibration=calibration)
+    tracks = {k: cols[k] for k in ("frame", "x", "y", "z")}
+    info = {"v_forward": float(info["v_forward"][0]), "v_lateral": float(info["v_lateral"][0]),
+            "n_observed": int(info["n_observed"][0])}
+    return tracks, info
+
+def pixels_to_pitch(xs_img, ys_img, image_size=(960,540), pitch_length_m=20.12, calibration=None):
+    """
+    Image pixels -> (lateral, forward) metres. Without a calibration this is
+    the fixed linear scale: x over 3 m wide, y over the pitch length.
+    """
+    if calibration is not None:
+        return calibration.image_to_world(xs_img, ys_img, image_size)
     img_w, img_h = image_size
 
     # Map image X -> lateral meters (-1.5 .. 1.5)
-    x_m = (xs_img / img_w) * 3.0 - 1.5
+    x_m = (np.asarray(xs_img) / img_w) * 3.0 - 1.5
 
     # Map image Y -> forward distance along pitch (0 .. pitch_length_m), invert y
     # Note: image y increases downward; mapping makes top -> pitch_length_m, bottom -> 0
-    y_m = (1.0 - (ys_img / img_h)) * pitch_length_m
+    y_m = (1.0 - (np.asarray(ys_img) / img_h)) * pitch_length_m
+    return x_m, y_m
 
-    # Time vector
-    t = frames / float(fps)
-    dt = 1.0 / float(fps)
+def pitch_to_pixels(x_m, y_m, image_size=(960,540), pitch_length_m=20.12, calibration=None):
+    """Inverse of pixels_to_pitch: (lateral, forward) metres -> image pixels."""
+    if calibration is not None:
+        return calibration.world_to_image(x_m, y_m, image_size)
+    img_w, img_h = image_size
+    u = (np.asarray(x_m) + 1.5) / 3.0 * img_w
+    v = (1.0 - np.asarray(y_m) / pitch_length_m) * img_h
+    return u, v
 
-    # Robust velocity estimates: use median of gradient over last N valid points
-    if len(t) >= 2:
-        dy_dt = np.gradient(y_m, t)          # dy/dt (note sign: likely negative if moving toward stumps)
-        dx_dt = np.gradient(x_m, t)
-    else:
-        dy_dt = np.array([0.0])
-        dx_dt = np.array([0.0])
+def _pad(rows, dtype, fill):
+    """Ragged list of 1D arrays -> (N, T) array padded with `fill`, plus lengths."""
+    lengths = np.array([len(r) for r in rows], dtype=int)
+    out = np.full((len(rows), max(1, lengths.max(initial=0))), fill, dtype=dtype)
+    for i, r in enumerate(rows):
+        out[i, :len(r)] = r
+    return out, lengths
 
-    # Forward speed toward stumps should be positive scalar. Since y decreases as it moves forward,
-    # we take -dy_dt to get a positive forward speed.
-    forward_speeds = -dy_dt
-    # filter out negative/noisy values
-    forward_speeds = forward_speeds[np.isfinite(forward_speeds)]
+def _row_gradient(f, t, lengths):
+    """
+    np.gradient(f[i, :L], t[i, :L]) for every row at once: second-order
+    central differences inside, one-sided at both ends, 0 for single points.
+    """
+    n, T = f.shape
+    g = np.zeros_like(f)
+    if T < 2:
+        return g
+    rows = np.arange(n)
+    hs = t[:, 1:-1] - t[:, :-2]
+    hd = t[:, 2:] - t[:, 1:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        g[:, 1:-1] = (hs**2 * f[:, 2:] + (hd**2 - hs**2) * f[:, 1:-1] - hd**2 * f[:, :-2]) / (hs * hd * (hd + hs))
+        g[:, 0] = (f[:, 1] - f[:, 0]) / (t[:, 1] - t[:, 0])
+        last = np.maximum(lengths - 1, 1)
+        g[rows, last] = (f[rows, last] - f[rows, last - 1]) / (t[rows, last] - t[rows, last - 1])
+    g[lengths < 2, 0] = 0.0
+    return g
 
-    if forward_speeds.size == 0:
-        v_forward = min_forward_speed
-    else:
-        # Use median of last few entries for robustness
-        n = min(5, len(forward_speeds))
-        v_forward = float(np.median(forward_speeds[-n:]))
-        if v_forward <= 0 or not np.isfinite(v_forward):
-            v_forward = min_forward_speed
-
-    # Lateral velocity: median of last few dx/dt
-    lateral_speeds = dx_dt[np.isfinite(dx_dt)]
-    if lateral_speeds.size == 0:
-        v_lateral = 0.0
+def _tail_median(v, lengths, n=5):
+    """Median of the last min(n, L) finite values of each row (NaN if none)."""
+    idx = lengths[:, None] - n + np.arange(n)[None, :]
+    ok = idx >= 0
+    tail = np.take_along_axis(v, np.maximum(idx, 0), axis=1)
+    tail = np.where(ok & np.isfinite(tail), tail, np.nan)
+    with warnings.catch_warnings():
+        # all-NaN rows are expected (the caller falls back to a default speed)
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmedian(tail, axis=1)
+
+def reconstruct_batch(frames, xs_img, ys_img, lengths=None, image_size=(960,540), pitch_length_m=20.12,
+                      fps=30.0, min_forward_speed=0.5, max_extrap_seconds=4.0, calibration=None):
+    """
+    Reconstruct many raw tracks in one call.
+
+    frames/xs_img/ys_img are either ragged lists of 1D arrays or padded
+    (N, T) arrays with `lengths`. Returns (cols, info):
+        cols: concatenated {"track", "frame", "x", "y", "z"} arrays for all tracks
+              plus "offsets" (N + 1), so track i is cols[k][offsets[i]:offsets[i+1]]
+        info: per-track arrays "v_forward", "v_lateral", "n_observed"
+    The forward extrapolation is closed-form: the time of arrival at the
+    stumps is last_y / v_forward, and the extra frames are one np.arange.
+    """
+    if lengths is None:
+        if isinstance(frames, np.ndarray) and frames.ndim == 2:
+            lengths = np.full(frames.shape[0], frames.shape[1], dtype=int)
+            frames = frames.astype(float)
+            xs_img = np.asarray(xs_img, dtype=float)
+            ys_img = np.asarray(ys_img, dtype=float)
+        else:
+            frames, lengths = _pad([np.asarray(f, dtype=float) for f in frames], float, np.nan)
+            xs_img, _ = _pad([np.asarray(x, dtype=float) for x in xs_img], float, np.nan)
+            ys_img, _ = _pad([np.asarray(y, dtype=float) for y in ys_img], float, np.nan)
     else:
-        v_lateral = float(np.median(lateral_speeds[-n:]))
+        lengths = np.asarray(lengths, dtype=int)
+        frames = np.asarray(frames, dtype=float)
+        xs_img = np.asarray(xs_img, dtype=float)
+        ys_img = np.asarray(ys_img, dtype=float)
+    if np.any(lengths < 1):
+        raise ValueError("Cannot reconstruct an empty track")
+    n_tracks, T = frames.shape
+    rows = np.arange(n_tracks)
+    valid = np.arange(T)[None, :] < lengths[:, None]
+
+    x_m, y_m = pixels_to_pitch(xs_img, ys_img, image_size, pitch_length_m, calibration)
 
-    # Build an initial z profile: linear from assumed release height to near-ground
-    # These are heuristics — Blender will animate based on these z values.
+    # Time vector
+    t = frames / float(fps)
+    dt = 1.0 / float(fps)
+
+    # Robust velocity estimates: median of the gradient over the last 5 points.
+    # Forward speed toward the stumps is -dy/dt (y decreases as the ball comes on).
+    v_forward = _tail_median(-_row_gradient(y_m, t, lengths), lengths)
+    v_forward = np.where(np.isfinite(v_forward) & (v_forward > 0), v_forward, min_forward_speed)
+    v_lateral = np.nan_to_num(_tail_median(_row_gradient(x_m, t, lengths), lengths))
+
+    # Initial z profile: linear from assumed release height to near-ground over the
+    # known frames. These are heuristics — Blender will animate based on these z values.
     z0 = 1.6   # typical release height (meters)
     zend = 0.2  # height near impact (meters)
-    # Create z for known frames as linear interpolation between z0 and zend across known frames
-    if len(t) >= 2:
-        z_known = np.linspace(z0, zend, len(t))
-    else:
-        z_known = np.array([z0])
+    frac = np.arange(T)[None, :] / np.maximum(lengths - 1, 1)[:, None]
+    z_known = z0 + (zend - z0) * frac
+    z_known[lengths < 2] = z0
 
-    # Build output points from the known frames
-    out_points = []
-    for xi, yi, zi, fi in zip(x_m, y_m, z_known, frames):
-        out_points.append({"frame": int(fi), "x": float(xi), "y": float(yi), "z": float(max(0.0, zi))})
+    last = lengths - 1
+    last_frame = frames[rows, last]
+    last_x = x_m[rows, last]
+    last_y = y_m[rows, last]
+    last_z = z_known[rows, last]
 
-    # Extrapolate forward in straight line until y <= 0 (stumps) or safety time limit
-    last_frame = int(frames[-1])
-    last_x = float(x_m[-1])
-    last_y = float(y_m[-1])
-    last_z = float(z_known[-1])
+    # Safety: if forward speed is tiny, use the fallback speed
+    v_forward = np.maximum(v_forward, min_forward_speed)
+    max_extra_frames = int(math.ceil(max_extrap_seconds * fps))
 
-    # Safety: if forward speed is tiny, set a reasonable fallback (fast bowling speed ~10 m/s; use smaller)
-    if v_forward < min_forward_speed:
-        v_forward = min_forward_speed
+    # Closed-form time of arrival at the stumps (y = 0); z moves linearly to zend by then
+    with np.errstate(divide="ignore", invalid="ignore"):
+        time_to_stumps = np.where(v_forward > 1e-6, last_y / v_forward, 0.0)
+    z_rate = np.where(time_to_stumps > 0, (zend - last_z) / np.where(time_to_stumps > 0, time_to_stumps, 1.0),
+                      (zend - last_z) / max(1.0, max_extrap_seconds))
+    steps = np.ceil(np.round(time_to_stumps / dt, 9))
+    n_extra = np.where(last_y > 0.0, np.minimum(steps, max_extra_frames), 0).astype(int)
 
-    max_extra_frames = int(math.ceil(max_extrap_seconds * fps))
-    extra = 0
+    # If the time limit stops us short of the stumps, add one final point at y = 0
+    y_after = last_y - v_forward * n_extra * dt
+    forced = (last_y > 0.0) & (y_after > 1e-12)
 
-    # Compute z rate to move from last_z -> zend over time_to_stumps (linear)
-    time_to_stumps = (last_y / v_forward) if v_forward > 1e-6 else None
-    if time_to_stumps and time_to_stumps > 0:
-        z_rate = (zend - last_z) / time_to_stumps
-    else:
-        # fallback small downward rate
-        z_rate = (zend - last_z) / max(1.0, max_extrap_seconds)
-
-    # iterate
-    while last_y > 0.0 and extra < max_extra_frames:
-        last_frame += 1
-        last_x = last_x + v_lateral * dt
-        last_y = last_y - v_forward * dt   # decrease toward 0
-        last_z = last_z + z_rate * dt
-        # clamp
-        last_y = max(last_y, 0.0)
-        last_z = max(last_z, 0.0)
-        out_points.append({"frame": int(last_frame), "x": float(last_x), "y": float(last_y), "z": float(last_z)})
-        extra += 1
-
-    # If we stopped because of time limit and still last_y > 0, optionally add one final point at stumps
-    if last_y > 0.0:
-        # force final impact point at y=0 using linear extrapolation
-        est_extra_frames_needed = int(math.ceil(last_y / v_forward)) if v_forward > 1e-6 else max_extra_frames
-        final_frame = out_points[-1]["frame"] + est_extra_frames_needed
-        final_x = out_points[-1]["x"] + v_lateral * (est_extra_frames_needed * dt)
-        final_z = max(0.0, zend)
-        out_points.append({"frame": int(final_frame), "x": float(final_x), "y": 0.0, "z": float(final_z)})
-
-    # Save to JSON
-    with open(out_json, "w") as f:
-        json.dump(out_points, f, indent=2)
+    counts = lengths + n_extra + forced
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    total = int(offsets[-1])
+    track = np.repeat(rows, counts)
+    out = {"track": track, "frame": np.empty(total, dtype=int), "x": np.empty(total),
+           "y": np.empty(total), "z": np.empty(total), "offsets": offsets}
 
-    print(f"Saved reconstructed 3D tracks to {out_json}")
-    print(f"Original frames: {len(frames)}, total output points: {len(out_points)}")
-    print(f"Estimated forward speed: {v_forward:.2f} m/s, lateral speed: {v_lateral:.3f} m/s")
-    return out_points
+    # known frames
+    known = (offsets[:-1, None] + np.arange(T)[None, :])[valid]
+    out["frame"][known] = frames[valid].astype(int)
+    out["x"][known] = x_m[valid]
+    out["y"][known] = y_m[valid]
+    out["z"][known] = np.maximum(0.0, z_known[valid])
+
+    # straight-line extrapolation, all tracks and frames in one step
+    ext_track = np.repeat(rows, n_extra)
+    k = np.arange(ext_track.size) - np.repeat(np.cumsum(n_extra) - n_extra, n_extra) + 1
+    ext = offsets[ext_track] + lengths[ext_track] - 1 + k
+    out["frame"][ext] = last_frame[ext_track].astype(int) + k
+    out["x"][ext] = last_x[ext_track] + v_lateral[ext_track] * k * dt
+    out["y"][ext] = np.maximum(last_y[ext_track] - v_forward[ext_track] * k * dt, 0.0)
+    out["z"][ext] = np.maximum(last_z[ext_track] + z_rate[ext_track] * k * dt, 0.0)
+
+    # forced final impact point (frame count estimate kept from the original loop version)
+    fi = np.flatnonzero(forced)
+    if fi.size:
+        prev = offsets[fi + 1] - 2
+        y_left = np.maximum(y_after[fi], 0.0)
+        est = np.where(v_forward[fi] > 1e-6, np.ceil(y_left / v_forward[fi]), max_extra_frames).astype(int)
+        pos = offsets[fi + 1] - 1
+        out["frame"][pos] = out["frame"][prev] + est
+        out["x"][pos] = out["x"][prev] + v_lateral[fi] * (est * dt)
+        out["y"][pos] = 0.0
+        out["z"][pos] = max(0.0, zend)
+
+    info = {"v_forward": v_forward, "v_lateral": v_lateral, "n_observed": lengths}
+    return out, info
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Reconstruct 3D straight-line trajectory to stumps.")
-    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Input raw tracks (2D JSON)")
-    parser.add_argument("--out", dest="outfile", default="tracks.json", help="Output 3D tracks JSON")
-    parser.add_argument("--imgsize", default="960x540", help="Image size used during tracking WxH")
-    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS (used for timing)")
+    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Input raw tracks (2D JSON or .trk)")
+    parser.add_argument("--out", dest="outfile", default="tracks.json", help="Output 3D tracks (.json or .trk)")
+    parser.add_argument("--imgsize", default=None,
+                        help="Image size used during tracking WxH (default: .trk header, else 960x540)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Video FPS used for timing (default: .trk header, else 30)")
     parser.add_argument("--pitchlen", type=float, default=20.12, help="Pitch length in metres")
+    parser.add_argument("--cache", default=None, help="Stage cache directory")
+    parser.add_argument("--calibration", default=None, help="Camera profile (calibrations/<name>.json or path)")
+    parser.add_argument("--lut", action="store_true", help="Map pixels through the calibration's lookup table")
     args = parser.parse_args()
 
-    w,h = map(int, args.imgsize.split("x"))
+    cache = None
+    if args.cache:
+        from stage_cache import StageCache
+        cache = StageCache(args.cache)
+    calibration = None
+    if args.calibration:
+        from calibration import Calibration
+        # the table is built once per camera and resolution, memory-mapped on later runs
+        calibration = Calibration.load(args.calibration, use_lut=args.lut)
+    imgsize = tuple(map(int, args.imgsize.split("x"))) if args.imgsize else None
     straight_line_reconstruct(raw_json=args.infile, out_json=args.outfile,
-                              image_size=(w,h), pitch_length_m=args.pitchlen, fps=args.fps)
+                              image_size=imgsize, pitch_length_m=args.pitchlen, fps=args.fps,
+                              cache=cache, calibration=calibration)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+pipeline_stage.py
+Threaded, order-preserving map over a stream of frames: a decoder thread
+reads ahead into a bounded queue while worker threads run the per-frame
+function, and results come back in frame order. Used by the tracker
+(extract_tracks_kalman) and the frame encoder (make_video).
+
+Usage:
+    from pipeline_stage import ordered_stage
+    for i, out in ordered_stage(enumerate(paths), cv2.imread, workers=4):
+        ...
+"""
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def _put(q, item, stop):
+    """Put into a bounded queue unless `stop` is set first. Returns False if stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _decoder(frames, q, stop):
+    # every put checks `stop`: the consumer may have gone away with the queue full
+    try:
+        for item in frames:
+            if not _put(q, item, stop):
+                return
+        _put(q, None, stop)
+    except BaseException as exc:
+        _put(q, exc, stop)
+
+def ordered_stage(frames, fn, workers=0, queue_size=32):
+    """
+    Yield (i, fn(frame)) in frame order for an iterator of (i, frame).
+
+    workers=0 runs everything inline. Otherwise a decoder thread feeds a
+    bounded queue, `workers` threads run `fn` (OpenCV releases the GIL) and
+    results are handed back in order through a bounded reorder window.
+    """
+    if workers <= 0:
+        for i, frame in frames:
+            yield i, fn(frame)
+        return
+
+    q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decoder, args=(frames, q, stop), daemon=True)
+    decoder.start()
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                item = q.get()
+                if isinstance(item, BaseException):
+                    raise item
+                if item is None:
+                    break
+                i, frame = item
+                pending.append((i, pool.submit(fn, frame)))
+                if len(pending) >= queue_size:
+                    j, fut = pending.popleft()
+                    yield j, fut.result()
+            while pending:
+                j, fut = pending.popleft()
+                yield j, fut.result()
+    finally:
+        stop.set()
+        decoder.join()
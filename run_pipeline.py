@@ -2,14 +2,16 @@
 """
 run_pipeline.py
 Orchestrates:
-1) extract_tracks_kalman.py -> raw_tracks.json
-2) physics_reconstruct.py -> tracks.json
+1) tracking + gap filling (in-process, udrs_pipeline) -> raw_tracks.json
+2) 3D reconstruction + decision (in-process, udrs_pipeline) -> tracks.json
 3) Blender headless call to render frames (blender_render.py)
-4) make_video.py -> final_output.mp4
+4) make_video.create_video -> final_output.mp4
+   (without Blender, 3+4 are replaced by the OpenCV renderer, hawkeye_render.py)
 """
 import subprocess
-import sys
 import os
+from udrs_pipeline import ReviewPipeline
+from stage_cache import StageCache
 
 # Change this if Blender is installed elsewhere
 BLENDER_EXE = r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe"
@@ -22,6 +24,10 @@ TRACKS_3D = "tracks.json"
 FRAMES_DIR = "frames"
 OUTPUT_VIDEO = "final_output.mp4"
 
+# Results of tracking/reconstruction are reused for the same video + parameters
+CACHE_DIR = ".udrs_cache"
+CACHE_MAX_BYTES = 2 * 1024**3
+
 def run(cmd, env=None):
     print(">", " ".join(cmd))
     subprocess.check_call(cmd, env=env)
@@ -30,19 +36,29 @@ def main():
     cwd = os.getcwd()
     print("Working dir:", cwd)
 
+    cache = StageCache(CACHE_DIR, max_bytes=CACHE_MAX_BYTES)
+    pipe = ReviewPipeline(resize=(960,540), fps=30.0, cache=cache)
+
     # 1) Extract tracks
     print("\n1) Extracting 2D tracks...")
-    run([sys.executable, "extract_tracks_kalman.py", VIDEO_IN, "--out", RAW_TRACKS, "--resize", "960x540"])
+    raw = pipe.interpolate(pipe.track(VIDEO_IN))
+    pipe.save({"raw": raw}, raw_path=RAW_TRACKS)
 
     # 2) Physics reconstruct
     print("\n2) Reconstructing 3D trajectory...")
-    run([sys.executable, "physics_reconstruct.py", "--in", RAW_TRACKS, "--out", TRACKS_3D, "--imgsize", "960x540", "--fps", "30"])
+    tracks = pipe.reconstruct(raw)
+    pipe.save({"tracks": tracks}, tracks_path=TRACKS_3D)
+    print("Decision:", pipe.decide(tracks)["decision"])
+    print("Stage cache:", cache.stats())
 
     # 3) Render in Blender
     print("\n3) Rendering frames in Blender (headless)...")
     if not os.path.exists(BLENDER_EXE):
-        print("ERROR: Blender executable not found at:", BLENDER_EXE)
-        print("Please set BLENDER_EXE in run_pipeline.py to your blender.exe path and re-run.")
+        print("Blender executable not found at:", BLENDER_EXE)
+        print("Rendering the replay with OpenCV instead (set BLENDER_EXE to use Blender).")
+        from hawkeye_render import HawkeyeRenderer
+        n = HawkeyeRenderer().render(tracks, OUTPUT_VIDEO, fps=30)
+        print(f"\nPipeline finished. Output: {OUTPUT_VIDEO} ({n} frames)")
         return
 
     # Ensure frames folder exists (Blender will fill it)
@@ -51,9 +67,10 @@ def main():
 
     run([BLENDER_EXE, "--background", "--python", "blender_render.py", "--", TRACKS_3D, OUTPUT_VIDEO])
 
-    # 4) Encode final video using system Python (make_video.py)
+    # 4) Encode final video
     print("\n4) Encoding final video from frames...")
-    run([sys.executable, "make_video.py", "--frames", FRAMES_DIR, "--out", OUTPUT_VIDEO, "--fps", "30"])
+    from make_video import create_video
+    create_video(FRAMES_DIR, OUTPUT_VIDEO, fps=30)
 
     print("\nPipeline finished. Output:", OUTPUT_VIDEO)
 
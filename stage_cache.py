@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+stage_cache.py
+Content-addressed result cache for the pipeline stages (track_ball,
+interpolate_missing, straight_line_reconstruct / reconstruct_arrays).
+
+An entry is keyed on the SHA-256 of the stage input (video bytes, or the
+array/detection data) plus the stage name and its parameters, so reopening
+the same clip with the same settings is a pickle load. Each stage puts its
+version constant (e.g. extract_tracks_kalman.TRACK_VERSION) in the
+parameters; bumping it when the stage's output changes retires old entries. Entries are evicted
+least-recently-used first once the cache directory exceeds `max_bytes`.
+Each handle keeps a running total of the directory size, so a write only
+scans the directory when that total goes over the budget; the scan also
+picks up what other processes sharing the directory have written.
+
+Video digests are remembered per (path, size, mtime) in the cache directory,
+so a repeat lookup does not re-read a multi-hundred-MB clip.
+
+Usage:
+    python stage_cache.py --dir .udrs_cache            # show size and entries
+    python stage_cache.py --dir .udrs_cache --clear
+"""
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import argparse
+import threading
+import numpy as np
+
+def file_digest(path, index=None, chunk=1 << 20):
+    """SHA-256 of a file's bytes; `index` is an optional dict memo keyed on (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    if index is not None and memo_key in index:
+        return index[memo_key]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    if index is not None:
+        index[memo_key] = digest
+    return digest
+
+def data_digest(obj):
+    """SHA-256 of in-memory stage input: arrays, dicts of arrays, or JSON-able data."""
+    h = hashlib.sha256()
+
+    def feed(o):
+        if isinstance(o, np.ndarray):
+            a = np.ascontiguousarray(o)
+            h.update(f"nd{a.dtype.str}{a.shape}".encode())
+            h.update(a.tobytes())
+        elif isinstance(o, dict):
+            h.update(b"{")
+            for k in sorted(o):
+                h.update(repr(k).encode())
+                feed(o[k])
+            h.update(b"}")
+        elif isinstance(o, (list, tuple)):
+            h.update(b"[")
+            for v in o:
+                feed(v)
+            h.update(b"]")
+        else:
+            h.update(repr(o).encode())
+
+    feed(obj)
+    return h.hexdigest()
+
+class StageCache:
+    def __init__(self, root=".udrs_cache", max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # running size of the directory, known after the first scan
+        self._bytes = None
+        os.makedirs(root, exist_ok=True)
+        self._index_path = os.path.join(root, "digests.json")
+        try:
+            with open(self._index_path, "r") as f:
+                self._digests = json.load(f)
+        except (OSError, ValueError):
+            self._digests = {}
+
+    def video_digest(self, path):
+        n = len(self._digests)
+        digest = file_digest(path, self._digests)
+        if len(self._digests) != n:
+            self._write_atomic(self._index_path, json.dumps(self._digests).encode("utf-8"))
+        return digest
+
+    def key(self, stage, input_digest, params):
+        blob = json.dumps({"stage": stage, "input": input_digest, "params": params},
+                          sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".pkl")
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return False, None
+        # mtime doubles as the LRU clock
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            old = os.path.getsize(path)
+        except OSError:
+            old = 0
+        self._write_atomic(path, data)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(data) - old
+            over = self._bytes is None or self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def cached(self, stage, input_digest, params, compute):
+        """Return the cached result for (stage, input, params), computing and storing it on a miss."""
+        key = self.key(stage, input_digest, params)
+        found, value = self.get(key)
+        if found:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def entries(self):
+        """[(path, size, mtime)] of all cached results, oldest first."""
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for fn in files:
+                if fn.endswith(".pkl"):
+                    p = os.path.join(dirpath, fn)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    out.append((p, st.st_size, st.st_mtime))
+        return sorted(out, key=lambda e: e[2])
+
+    def size(self):
+        return sum(e[1] for e in self.entries())
+
+    def evict(self):
+        """Scan the directory, drop the oldest entries down to `max_bytes` and resync the running size."""
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._bytes = total
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+        self._digests = {}
+        with self._lock:
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self.size(), "max_bytes": self.max_bytes}
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the stage cache.")
+    parser.add_argument("--dir", default=".udrs_cache", help="Cache directory")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result")
+    args = parser.parse_args()
+
+    cache = StageCache(args.dir)
+    if args.clear:
+        cache.clear()
+        print("Cleared", args.dir)
+    else:
+        entries = cache.entries()
+        print(f"{len(entries)} entries, {sum(e[1] for e in entries) / 1e6:.1f} MB in {args.dir}")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+stream_tracks.py
+Live tracker: follows a growing video file or a capture device and writes
+each smoothed detection as one NDJSON line as soon as it is known.
+
+Usage:
+    python stream_tracks.py replay.ts --out live_tracks.ndjson
+    python stream_tracks.py 0 --out -            # device 0, lines to stdout
+
+Each line is {"frame": int, "x": float|null, "y": float|null, "latency_ms": float}
+where latency_ms is the time from decoding the frame to emitting its line.
+Gaps are filled by linear interpolation once the next detection arrives,
+but a frame is never held back for more than --lookahead frames: after
+that it is emitted with the last known position (or null before the first
+detection).
+"""
+import cv2
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from extract_tracks_kalman import track_frames, RoiGate
+
+def follow_frames(source, stamps, poll=0.05, idle_timeout=5.0, max_frames=None):
+    """
+    Yield (i, frame) from a device index or a file that may still be growing.
+
+    When a file runs dry it is reopened and seeked to the next frame until
+    no new frame has appeared for `idle_timeout` seconds. The decode time of
+    each frame is recorded in `stamps[i]`.
+    """
+    device = isinstance(source, int)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened() and device:
+        raise IOError(f"Cannot open capture device: {source}")
+    i = 0
+    idle_since = None
+    try:
+        while max_frames is None or i < max_frames:
+            ret, frame = cap.read() if cap.isOpened() else (False, None)
+            if ret:
+                stamps[i] = time.perf_counter()
+                yield i, frame
+                i += 1
+                idle_since = None
+                continue
+            if device:
+                break
+            now = time.perf_counter()
+            idle_since = idle_since or now
+            if now - idle_since > idle_timeout:
+                break
+            time.sleep(poll)
+            cap.release()
+            cap = cv2.VideoCapture(source)
+            if cap.isOpened() and i:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+    finally:
+        cap.release()
+
+class StreamInterpolator:
+    """Incremental counterpart of interpolate_missing with a bounded lookahead."""
+    def __init__(self, lookahead=15):
+        self.lookahead = lookahead
+        self.last = None          # (frame, x, y) of the last detection
+        self.pending = []         # frames waiting for the next detection
+
+    def push(self, det):
+        """Feed one detection; returns the list of records now ready to emit."""
+        out = []
+        if det["x"] is None:
+            self.pending.append(det["frame"])
+            while len(self.pending) > self.lookahead:
+                out.append(self._hold(self.pending.pop(0)))
+            return out
+        f, x, y = det["frame"], det["x"], det["y"]
+        if self.pending:
+            if self.last is None:
+                out.extend({"frame": p, "x": x, "y": y} for p in self.pending)
+            else:
+                f0, x0, y0 = self.last
+                w = (np.array(self.pending, dtype=float) - f0) / float(f - f0)
+                out.extend({"frame": p, "x": float(x0 + (x - x0) * a), "y": float(y0 + (y - y0) * a)}
+                           for p, a in zip(self.pending, w))
+            self.pending = []
+        self.last = (f, x, y)
+        out.append({"frame": f, "x": x, "y": y})
+        return out
+
+    def flush(self):
+        out = [self._hold(p) for p in self.pending]
+        self.pending = []
+        return out
+
+    def _hold(self, frame):
+        if self.last is None:
+            return {"frame": frame, "x": None, "y": None}
+        return {"frame": frame, "x": self.last[1], "y": self.last[2]}
+
+def stream_tracks(source, out, resize=(960,540), lookahead=15, idle_timeout=5.0,
+                  max_frames=None, workers=0, roi=None):
+    """Track `source` and write NDJSON lines to the file object `out`. Returns latencies (ms)."""
+    stamps = {}
+    latencies = []
+    interp = StreamInterpolator(lookahead)
+
+    def emit(records):
+        now = time.perf_counter()
+        for r in records:
+            r["latency_ms"] = (now - stamps.pop(r["frame"])) * 1000.0
+            latencies.append(r["latency_ms"])
+            out.write(json.dumps(r) + "\n")
+        if records:
+            out.flush()
+
+    frames = follow_frames(source, stamps, idle_timeout=idle_timeout, max_frames=max_frames)
+    # workers are kept small here: a deep reorder window would add latency
+    for det in track_frames(frames, resize=resize, workers=workers, queue_size=max(2, workers), roi=roi):
+        emit(interp.push(det))
+    emit(interp.flush())
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream smoothed ball detections as NDJSON.")
+    parser.add_argument("source", help="Growing video file, or an integer capture device index")
+    parser.add_argument("--out", default="-", help="NDJSON output file ('-' for stdout)")
+    parser.add_argument("--resize", default="960x540", help="Resize WxH")
+    parser.add_argument("--lookahead", type=int, default=15, help="Max frames to hold back for gap interpolation")
+    parser.add_argument("--idle-timeout", type=float, default=5.0, help="Stop after this many seconds without new frames")
+    parser.add_argument("--maxframes", type=int, default=None, help="Max frames to process")
+    parser.add_argument("--workers", type=int, default=0, help="Vision worker threads")
+    parser.add_argument("--roi", action="store_true", help="Kalman-gated ROI search")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    w,h = map(int, args.resize.split("x"))
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        lat = stream_tracks(source, out, resize=(w,h), lookahead=args.lookahead,
+                            idle_timeout=args.idle_timeout, max_frames=args.maxframes,
+                            workers=args.workers, roi=RoiGate() if args.roi else None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if lat:
+        p50, p95 = np.percentile(lat, [50, 95])
+        print(f"Emitted {len(lat)} frames | latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {max(lat):.1f} ms",
+              file=sys.stderr)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+stump_geometry.py
+Stump dimensions and the analytic trajectory/stumps intersection used for
+the Hitting/Missing call.
+
+The 3D track is treated as a polyline of straight segments between
+consecutive points (x lateral, y forward with the stumps at y=0, z height,
+metres). Every segment is intersected in closed form with the stumps'
+bounding box padded by the ball radius, so the impact is found at
+sub-frame precision and the cost is O(1) per segment however sparsely the
+path is sampled.
+
+Usage:
+    python stump_geometry.py --in tracks.json --fps 30
+"""
+import json
+import argparse
+import numpy as np
+
+# Stumps (metres): 22.86 cm across the three stumps, 71.1 cm high, 3.5 cm thick
+STUMP_HALF_WIDTH = 0.1143
+STUMP_HEIGHT = 0.711
+STUMP_HALF_DEPTH = 0.0175
+BALL_RADIUS = 0.036
+
+def stumps_box(radius=BALL_RADIUS, half_width=STUMP_HALF_WIDTH, height=STUMP_HEIGHT,
+               half_depth=STUMP_HALF_DEPTH):
+    """(lo, hi) corners of the stumps' bounding box padded by `radius`: the volume the ball centre must enter."""
+    lo = np.array([-half_width - radius, -half_depth - radius, -radius])
+    hi = np.array([half_width + radius, half_depth + radius, height + radius])
+    return lo, hi
+
+def plane_margin(x, z, radius=BALL_RADIUS, half_width=STUMP_HALF_WIDTH, height=STUMP_HEIGHT):
+    """
+    Signed distance of ball-centre positions (x, z) in the stumps plane from
+    the padded stumps outline: positive = inside by that much, negative =
+    missing by that much. A margin >= radius means the centre itself is
+    inside the stumps. Vectorised over arrays.
+    """
+    dx = half_width + radius - np.abs(np.asarray(x, dtype=float))
+    dz = height + radius - np.asarray(z, dtype=float)
+    inside = np.minimum(dx, dz)
+    outside = np.hypot(np.minimum(dx, 0.0), np.minimum(dz, 0.0))
+    return np.where((dx >= 0) & (dz >= 0), inside, -outside)
+
+def segment_box_entry(p0, p1, lo, hi):
+    """
+    Slab test of segments p0 -> p1 (S, 3) against the box [lo, hi].
+    Returns (hit (S,), s (S,)) where s in [0, 1] is the entry fraction along each segment.
+    """
+    p0 = np.asarray(p0, dtype=float)
+    d = np.asarray(p1, dtype=float) - p0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (lo - p0) / d
+        t2 = (hi - p0) / d
+    # segments parallel to a slab are either always or never inside it
+    flat = d == 0
+    inside = (p0 >= lo) & (p0 <= hi)
+    near = np.where(flat, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+    far = np.where(flat, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+    t_in = near.max(axis=1)
+    t_out = far.min(axis=1)
+    hit = (t_in <= t_out) & (t_out >= 0.0) & (t_in <= 1.0)
+    return hit, np.clip(t_in, 0.0, 1.0)
+
+def intersect_stumps(frames, xs, ys, zs, fps=30.0, radius=BALL_RADIUS, half_width=STUMP_HALF_WIDTH,
+                     height=STUMP_HEIGHT, half_depth=STUMP_HALF_DEPTH):
+    """
+    First impact of a 3D track with the padded stumps box.
+
+    Returns {"hit": bool, "frame": sub-frame index, "time": seconds,
+             "point": (x, y, z), "margin": metres} for the first segment that
+    enters the box; when none does, the point where the path crosses the
+    stumps plane (y = 0) is reported with hit=False and a negative margin.
+    Returns None if the path never reaches the stumps plane.
+    """
+    frames = np.asarray(frames, dtype=float)
+    pts = np.stack([np.asarray(xs, dtype=float), np.asarray(ys, dtype=float),
+                    np.asarray(zs, dtype=float)], axis=1)
+    if len(pts) == 0:
+        return None
+    if len(pts) == 1:
+        p0 = p1 = pts
+        f0 = f1 = frames
+    else:
+        p0, p1 = pts[:-1], pts[1:]
+        f0, f1 = frames[:-1], frames[1:]
+
+    lo, hi = stumps_box(radius, half_width, height, half_depth)
+    hit, s = segment_box_entry(p0, p1, lo, hi)
+    if hit.any():
+        i = int(np.argmax(hit))
+        si = s[i]
+    else:
+        # first segment reaching the stumps plane (y = 0) from in front of it
+        cross = ((p0[:, 1] > 0) & (p1[:, 1] <= 0)) | (p0[:, 1] == 0)
+        if not cross.any():
+            return None
+        i = int(np.argmax(cross))
+        dy = p0[i, 1] - p1[i, 1]
+        si = p0[i, 1] / dy if dy > 0 else 0.0
+    point = p0[i] + si * (p1[i] - p0[i])
+    frame = f0[i] + si * (f1[i] - f0[i])
+    margin = float(plane_margin(point[0], point[2], radius, half_width, height))
+    return {"hit": bool(hit.any()), "frame": float(frame), "time": float(frame / fps),
+            "point": tuple(float(v) for v in point), "margin": margin}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intersect a 3D track with the stumps.")
+    parser.add_argument("--in", dest="infile", default="tracks.json", help="Input 3D tracks (.json or .trk)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS")
+    args = parser.parse_args()
+
+    from track_store import read_track_arrays
+    cols = read_track_arrays(args.infile)
+    impact = intersect_stumps(cols["frame"], cols["x"], cols["y"], cols["z"], fps=args.fps)
+    print(json.dumps(impact, indent=2))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+synthetic_deliveries.py
+Physically consistent synthetic deliveries for training the review models,
+generated in fixed-size chunks, in parallel, straight into a columnar
+on-disk dataset.
+
+Every delivery is simulated in the pipeline's coordinates (metres: x
+lateral, y forward with the striker's stumps at y=0 and the bowler's at
+y=20.12, z height): release point and speed, swing in the air, a bounce
+at the sampled length and line (restitution, seam deviation), the ball
+meeting the pad, and the continued path to the stumps plane, judged with
+stump_geometry. On top of the true path it derives what the review sees:
+the classifier features (drs_models.FEATURES, in track_features' units),
+an edge signal, the on-field call, and the LBW / review_result labels.
+
+The dataset is a directory with one .npy file per column (memory-mapped;
+each worker writes its chunk's rows in place) and manifest.json. Chunk k
+always uses child k of SeedSequence(seed), so the data is identical for
+any number of workers and memory stays at one chunk per worker.
+
+Usage:
+    python synthetic_deliveries.py --rows 20000000 --chunk 500000 --workers 4 --out synthetic_deliveries
+"""
+import os
+import json
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from stump_geometry import STUMP_HALF_WIDTH, BALL_RADIUS, plane_margin
+from drs_models import FEATURES
+
+PITCH_LENGTH_M = 20.12
+GRAVITY = 9.81
+
+# Sampling distributions (metres, m/s, m/s^2)
+DEFAULT_PARAMS = {
+    "release_x": [-0.9, 0.9],           # uniform: over / around the wicket
+    "release_y": [18.0, 18.9],          # uniform: just in front of the bowler's popping crease
+    "release_z": [2.1, 0.15],           # normal (mean, sd)
+    "speed": [22.0, 42.0],              # uniform: ~80-150 km/h
+    "swing": [0.0, 1.5],                # normal lateral acceleration in the air
+    "length": [5.5, 2.0],               # normal bounce distance from the stumps
+    "length_range": [1.0, 14.0],
+    "line": [0.0, 0.35],                # normal bounce x
+    "restitution": [0.4, 0.6],          # uniform vertical coefficient of restitution
+    "friction": [0.85, 0.95],           # uniform forward speed retained at the bounce
+    "seam": [0.0, 0.5],                 # normal lateral velocity change at the bounce
+    "impact_y": [0.5, 2.5],             # uniform pad position in front of the stumps
+    "p_edge": 0.08,                     # probability of bat contact
+    "p_edge_heard": 0.7,                # the on-field umpire hears an edge
+    "umpire_sd": 0.06,                  # on-field misjudgement of the margin (m)
+    "track_sd": 0.01,                   # tracking error of the predicted stumps point, per metre travelled
+}
+
+FLOAT_COLUMNS = ["release_x", "release_y", "release_z", "speed", "swing", "bounce_x", "bounce_y", "seam",
+                 "impact_x_m", "impact_y_m", "impact_z_m", "stump_x", "stump_z", "margin"]
+FLAG_COLUMNS = ["hit", "in_line", "edge", "lbw", "review_result"]
+COLUMNS = FLOAT_COLUMNS + FLAG_COLUMNS + [f for f in FEATURES if f not in FLOAT_COLUMNS]
+
+def column_dtype(name):
+    if name in FLAG_COLUMNS or name == "umpire_decision":
+        return np.int8
+    return np.float32
+
+def simulate(n, rng, params=None):
+    """Column dict for `n` deliveries drawn from `rng` (np.random.Generator)."""
+    from physics_reconstruct import pitch_to_pixels
+    from track_features import IMPACT_X_UNITS, IMPACT_Y_UNITS
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    r = BALL_RADIUS
+
+    x0 = rng.uniform(*p["release_x"], n)
+    y0 = rng.uniform(*p["release_y"], n)
+    z0 = np.maximum(rng.normal(*p["release_z"], n), 1.0)
+    speed = rng.uniform(*p["speed"], n)
+    swing = rng.normal(*p["swing"], n)
+    yb = np.clip(rng.normal(*p["length"], n), *p["length_range"])
+    xb = rng.normal(*p["line"], n)
+
+    # release -> bounce: aim at (xb, yb) under gravity and constant swing
+    tb = np.hypot(xb - x0, y0 - yb) / speed
+    vx = (xb - x0 - 0.5 * swing * tb ** 2) / tb
+    vy = -(y0 - yb) / tb
+    vz = (r - z0 + 0.5 * GRAVITY * tb ** 2) / tb
+
+    # bounce
+    e = rng.uniform(*p["restitution"], n)
+    seam = rng.normal(*p["seam"], n)
+    vx2 = vx + swing * tb + seam
+    vy2 = vy * rng.uniform(*p["friction"], n)
+    vz2 = e * np.abs(vz - GRAVITY * tb)
+
+    # bounce -> pad (the batsman stands behind the bounce)
+    lo, hi = p["impact_y"]
+    yi = lo + rng.random(n) * (np.minimum(hi, yb - 0.1) - lo)
+    ti = (yb - yi) / -vy2
+    xi = xb + vx2 * ti
+    zi = np.maximum(r + vz2 * ti - 0.5 * GRAVITY * ti ** 2, r)
+    vzi = vz2 - GRAVITY * ti
+
+    # pad -> stumps plane (the path the review predicts)
+    ts = yi / -vy2
+    xs = xi + vx2 * ts
+    zs = np.maximum(zi + vzi * ts - 0.5 * GRAVITY * ts ** 2, r)
+    margin = plane_margin(xs, zs)
+    hit = margin >= 0
+    in_line = np.abs(xi) <= STUMP_HALF_WIDTH + r
+
+    # what the review sees
+    edge = rng.random(n) < p["p_edge"]
+    snick = np.where(edge, rng.uniform(0.3, 1.0, n), rng.uniform(0.0, 0.15, n))
+    bat_distance = np.where(edge, rng.uniform(0.0, 0.05, n), rng.uniform(0.05, 1.0, n))
+    # predicted-margin uncertainty grows with the distance from pad to stumps;
+    # P(hit) uses the logistic approximation of the normal CDF
+    sd = p["track_sd"] * (yi + 1.0)
+    measured = margin + rng.normal(0.0, 1.0, n) * sd
+    stump_hit_prob = 1.0 / (1.0 + np.exp(-1.702 * measured / sd))
+    heard = edge & (rng.random(n) < p["p_edge_heard"])
+    umpire = (margin + rng.normal(0.0, p["umpire_sd"], n) >= 0) & in_line & ~heard
+    lbw = hit & in_line & ~edge
+
+    u, v = pitch_to_pixels(xi, yi, (IMPACT_X_UNITS, IMPACT_Y_UNITS), PITCH_LENGTH_M)
+    # track angle in tracking pixels (track_features.track_angle), release -> pad
+    pu0, pv0 = pitch_to_pixels(x0, y0, (960,540), PITCH_LENGTH_M)
+    pu1, pv1 = pitch_to_pixels(xi, yi, (960,540), PITCH_LENGTH_M)
+    angle = np.abs(np.degrees(np.arctan2(pv1 - pv0, pu1 - pu0)))
+
+    cols = {"release_x": x0, "release_y": y0, "release_z": z0, "speed": speed, "swing": swing,
+            "bounce_x": xb, "bounce_y": yb, "seam": seam, "impact_x_m": xi, "impact_y_m": yi, "impact_z_m": zi,
+            "stump_x": xs, "stump_z": zs, "margin": margin, "hit": hit, "in_line": in_line, "edge": edge,
+            "lbw": lbw, "review_result": lbw ^ umpire,
+            "impact_x": u, "impact_y": v, "angle": angle, "stump_hit_prob": stump_hit_prob,
+            "bat_distance": bat_distance, "snick_peak": snick, "umpire_decision": umpire}
+    return {k: np.asarray(cols[k]).astype(column_dtype(k)) for k in COLUMNS}
+
+def _write_chunk(out, k, start, stop, seed_seq, params):
+    """Worker: simulate rows [start, stop) with the chunk's own seed and write them in place."""
+    cols = simulate(stop - start, np.random.default_rng(seed_seq), params)
+    for name, values in cols.items():
+        mm = np.load(os.path.join(out, name + ".npy"), mmap_mode="r+")
+        mm[start:stop] = values
+        mm.flush()
+        del mm
+    return k, int(cols["hit"].sum()), int(cols["review_result"].sum())
+
+def generate(out, rows, chunk=500000, workers=None, seed=0, params=None, progress=None):
+    """
+    Write `rows` deliveries to the dataset directory `out`. Returns the manifest.
+    progress: optional callback(chunks_done, n_chunks).
+    """
+    os.makedirs(out, exist_ok=True)
+    manifest_path = os.path.join(out, "manifest.json")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    for name in COLUMNS:
+        np.lib.format.open_memmap(os.path.join(out, name + ".npy"), mode="w+",
+                                  dtype=column_dtype(name), shape=(rows,))
+    bounds = [(s, min(rows, s + chunk)) for s in range(0, rows, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    hits = reviews = done = 0
+    if workers <= 1:
+        results = (_write_chunk(out, k, s, e, seeds[k], params) for k, (s, e) in enumerate(bounds))
+        for _, h, rv in results:
+            hits, reviews, done = hits + h, reviews + rv, done + 1
+            if progress is not None:
+                progress(done, len(bounds))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_write_chunk, out, k, s, e, seeds[k], params)
+                       for k, (s, e) in enumerate(bounds)]
+            for fut in futures:
+                _, h, rv = fut.result()
+                hits, reviews, done = hits + h, reviews + rv, done + 1
+                if progress is not None:
+                    progress(done, len(bounds))
+    manifest = {"rows": rows, "chunk": chunk, "seed": seed, "params": dict(DEFAULT_PARAMS, **(params or {})),
+                "columns": {c: np.dtype(column_dtype(c)).str for c in COLUMNS}, "features": FEATURES,
+                "hit_rate": hits / float(rows) if rows else 0.0,
+                "review_result_rate": reviews / float(rows) if rows else 0.0,
+                "seconds": time.perf_counter() - t0}
+    # the manifest is written last: its presence marks a complete dataset
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def open_dataset(path, columns=None):
+    """Memory-mapped columns of a generated dataset, plus "manifest"."""
+    with open(os.path.join(path, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    cols = {c: np.load(os.path.join(path, c + ".npy"), mmap_mode="r") for c in (columns or manifest["columns"])}
+    cols["manifest"] = manifest
+    return cols
+
+def iter_chunks(path, columns=None, rows=1000000):
+    """Yield column dicts of at most `rows` rows (copies), to stream a dataset larger than RAM."""
+    ds = open_dataset(path, columns)
+    n = ds.pop("manifest")["rows"]
+    for s in range(0, n, rows):
+        yield {c: np.array(a[s:s + rows]) for c, a in ds.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a columnar dataset of simulated deliveries.")
+    parser.add_argument("--rows", type=int, default=1000000, help="Deliveries to generate")
+    parser.add_argument("--chunk", type=int, default=500000, help="Rows per chunk (bounds memory per worker)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="Root seed")
+    parser.add_argument("--params", default=None, help="JSON file overriding DEFAULT_PARAMS")
+    parser.add_argument("--out", default="synthetic_deliveries", help="Dataset directory")
+    args = parser.parse_args()
+
+    params = None
+    if args.params:
+        with open(args.params, "r") as f:
+            params = json.load(f)
+    m = generate(args.out, args.rows, chunk=args.chunk, workers=args.workers, seed=args.seed, params=params,
+                 progress=lambda d, n: print(f"\rchunk {d}/{n}", end="", flush=True))
+    print(f"\nSaved {args.out}: {m['rows']} rows in {m['seconds']:.1f}s "
+          f"({m['rows'] / max(m['seconds'], 1e-9) / 1e6:.2f} M rows/s), "
+          f"hitting {m['hit_rate']:.1%}, review overturned {m['review_result_rate']:.1%}")
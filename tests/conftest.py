@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# the modules are flat scripts at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def write_clip(path, positions, size=(320,180), fps=30, radius=5):
+    """Synthetic clip: an orange ball at `positions` [(x, y) or None per frame] on green."""
+    import cv2
+    import numpy as np
+    out = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for p in positions:
+        frame = np.full((size[1], size[0], 3), (40,120,40), np.uint8)
+        if p is not None:
+            cv2.circle(frame, (int(p[0]), int(p[1])), radius, (0,120,255), -1)
+        out.write(frame)
+    out.release()
+    return str(path)
+
+@pytest.fixture
+def make_clip(tmp_path):
+    """make_clip(name, positions, size=(320,180), radius=5) -> path of a synthetic clip in tmp_path."""
+    return lambda name, positions, **kw: write_clip(tmp_path / name, positions, **kw)
+
+@pytest.fixture
+def straight_clip(make_clip):
+    """straight_clip(name, n) -> clip of `n` frames with the ball crossing left to right."""
+    return lambda name, n, size=(320,180): make_clip(
+        name, [(10 + i * (size[0] - 20) / n, size[1] // 2) for i in range(n)], size=size)
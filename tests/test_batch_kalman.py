@@ -0,0 +1,46 @@
+import numpy as np
+from batch_kalman import BatchKalman2D, rts_smooth
+from extract_tracks_kalman import Kalman2D, KalmanSink
+
+def noisy_track(n=80, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n, dtype=float)
+    truth = np.stack([100 + 6 * t, 40 + 3 * t], axis=1)
+    z = truth + rng.normal(0, 5, truth.shape)
+    z[20:30] = np.nan                      # the ball is hidden for ten frames
+    return truth, z
+
+def test_forward_pass_is_the_textbook_kalman2d():
+    truth, z = noisy_track()
+    xf = BatchKalman2D(1, process_var=1e-3, meas_var=50.0).filter(z[None])[0][0]
+    kf = Kalman2D(process_var=1e-3, meas_var=50.0)
+    kf.x[:2, 0] = z[0]
+    out = []
+    for k, m in enumerate(z):
+        if k > 0:
+            kf.predict()
+        if np.isfinite(m).all():
+            kf.update(m)
+        out.append(kf.x[:2, 0].copy())
+    assert np.allclose(xf[:, :2], out)
+
+def test_smoother_beats_the_filter_and_fills_gaps():
+    truth, z = noisy_track()
+    xf = BatchKalman2D(1).filter(z[None])[0][0, :, :2]
+    xs = rts_smooth(z[None])[0, :, :2]
+    assert np.isfinite(xs).all()
+    rms = lambda p: np.sqrt(np.mean(np.sum((p - truth) ** 2, axis=1)))
+    assert rms(xs) < rms(xf)
+    gap = slice(20, 30)
+    assert np.abs(xs[gap] - truth[gap]).max() < 10
+
+def test_smoother_beats_the_tracker_filter():
+    # KalmanSink (predict on misses only) is what the tracker writes out
+    truth, z = noisy_track()
+    sink = KalmanSink()
+    dets = [sink.push(k, tuple(m) if np.isfinite(m).all() else None) for k, m in enumerate(z)]
+    hit = np.array([d["x"] is not None for d in dets])
+    tracked = np.array([(d["x"], d["y"]) for d in dets if d["x"] is not None])
+    xs = rts_smooth(z[None])[0, :, :2]
+    err = lambda p, t: np.sqrt(np.mean(np.sum((p - t) ** 2, axis=1)))
+    assert err(xs[hit], truth[hit]) < err(tracked, truth[hit])
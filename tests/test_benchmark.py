@@ -0,0 +1,28 @@
+from benchmark import compare
+
+def result(track_fps=100.0, rss=200.0, error=2.0, name="640x360x90"):
+    return {"cases": [{"name": name,
+                       "stages": {"track_ball": {"fps": track_fps, "peak_rss_mb": rss},
+                                  "reconstruct": {"fps": 5000.0, "peak_rss_mb": 150.0}},
+                       "tracking_error": {"mean_px": error}}]}
+
+def test_within_thresholds_is_not_a_regression():
+    rows, regressions = compare(result(track_fps=92.0, rss=240.0, error=2.9), result())
+    assert regressions == []
+    assert [r["metric"] for r in rows] == ["track_ball", "reconstruct"]
+    assert abs(rows[0]["fps_change"] + 0.08) < 1e-12 and abs(rows[0]["rss_change"] - 0.2) < 1e-12
+
+def test_regressions_are_reported():
+    _, regressions = compare(result(track_fps=85.0, rss=260.0, error=3.5), result())
+    assert len(regressions) == 3
+    assert "track_ball: -15.0% fps" in regressions[0]
+    assert "track_ball: +30.0% peak RSS" in regressions[1]
+    assert "tracking error: 2.00 -> 3.50 px" in regressions[2]
+    _, lost = compare(result(error=None), result())
+    assert lost == ["640x360x90 tracking: ball no longer detected"]
+    # thresholds are parameters
+    assert compare(result(track_fps=85.0), result(), fps_threshold=0.2)[1] == []
+
+def test_cases_missing_from_the_baseline_are_skipped():
+    rows, regressions = compare(result(track_fps=1.0, name="1920x1080x600"), result())
+    assert rows == [] and regressions == []
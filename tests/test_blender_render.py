@@ -0,0 +1,93 @@
+import types
+import numpy as np
+import blender_render
+
+class Obj(types.SimpleNamespace):
+    def animation_data_create(self):
+        self.animation_data = types.SimpleNamespace(action=None, action_slot=None)
+
+class KeyframePoints:
+    def __init__(self):
+        self.co = []
+
+    def add(self, n):
+        self.co.extend([(0.0, 0.0)] * n)
+
+    def foreach_set(self, attr, flat):
+        assert attr == "co" and len(flat) == 2 * len(self.co)
+        self.co = list(zip(flat[0::2], flat[1::2]))
+
+class FCurves(list):
+    def new(self, data_path, index=0):
+        fc = types.SimpleNamespace(data_path=data_path, array_index=index, keyframe_points=KeyframePoints(),
+                                   updated=False)
+        fc.update = lambda: setattr(fc, "updated", True)
+        self.append(fc)
+        return fc
+
+def stub_bpy():
+    """The parts of the bpy API blender_render touches."""
+    bpy = types.SimpleNamespace()
+    scene = types.SimpleNamespace(camera=None, eevee=types.SimpleNamespace(taa_render_samples=64),
+                                  render=types.SimpleNamespace(image_settings=types.SimpleNamespace(),
+                                                               resolution_percentage=100))
+    bpy.context = types.SimpleNamespace(scene=scene, active_object=None)
+    bpy.objects = []
+
+    def add(kind):
+        def op(**kwargs):
+            obj = Obj(kind=kind, name=f"{kind}{len(bpy.objects)}", scale=[1.0, 1.0, 1.0],
+                      data=types.SimpleNamespace(materials=[], energy=None), animation_data=None, **kwargs)
+            bpy.objects.append(obj)
+            bpy.context.active_object = obj
+        return op
+
+    bpy.ops = types.SimpleNamespace(
+        wm=types.SimpleNamespace(read_factory_settings=lambda use_empty: bpy.objects.clear()),
+        mesh=types.SimpleNamespace(primitive_plane_add=add("plane"), primitive_cylinder_add=add("cylinder"),
+                                   primitive_uv_sphere_add=add("sphere")),
+        object=types.SimpleNamespace(camera_add=add("camera"), light_add=add("light")))
+    bpy.data = types.SimpleNamespace(
+        filepath="",
+        materials=types.SimpleNamespace(new=lambda name: types.SimpleNamespace(name=name, diffuse_color=None)),
+        actions=types.SimpleNamespace(new=lambda name: types.SimpleNamespace(name=name, fcurves=FCurves())))
+    return bpy
+
+def test_build_scene():
+    bpy = stub_bpy()
+    ball = blender_render.build_scene(bpy)
+    kinds = [o.kind for o in bpy.objects]
+    assert kinds.count("cylinder") == 3 and kinds.count("plane") == 2
+    assert ball.kind == "sphere"
+    assert bpy.context.scene.camera.kind == "camera"
+
+def test_animate_ball_keyframes():
+    bpy = stub_bpy()
+    ball = blender_render.build_scene(bpy)
+    frames = np.arange(10, 40)
+    xs, ys, zs = np.linspace(0, 0.3, 30), np.linspace(18, 0, 30), np.linspace(1.6, 0.2, 30)
+    blender_render.animate_ball(bpy, ball, frames, xs, ys, zs)
+    fcurves = ball.animation_data.action.fcurves
+    assert [(fc.data_path, fc.array_index) for fc in fcurves] == [("location", i) for i in range(3)]
+    for fc, values in zip(fcurves, (xs, ys, zs)):
+        assert fc.updated
+        assert len(fc.keyframe_points.co) == len(frames)
+        np.testing.assert_allclose(np.array(fc.keyframe_points.co), np.stack([frames, values], axis=1))
+
+def test_setup_render_profiles():
+    bpy = stub_bpy()
+    scene = blender_render.setup_render(bpy, "frames", 12, 48, profile="preview")
+    assert scene.render.resolution_percentage == 40
+    assert scene.eevee.taa_render_samples == 4
+    assert (scene.frame_start, scene.frame_end, scene.frame_step) == (12, 48, 2)
+
+    bpy = stub_bpy()
+    scene = blender_render.setup_render(bpy, "frames", 0, 90, profile="final")
+    assert scene.render.resolution_percentage == 100
+    assert scene.eevee.taa_render_samples == 64
+    assert scene.frame_step == 1
+
+def test_frame_range_around_impact():
+    frames = np.arange(0, 120)
+    assert blender_render.frame_range(frames) == (0, 119)
+    assert blender_render.frame_range(frames, impact=100, window=30) == (70, 119)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from calibration import Calibration, LANDMARKS, fit_calibration
+
+SIZE = (320, 180)
+
+def _calibration(tmp_path, use_lut=False):
+    # a broadcast-style view down the pitch with some barrel distortion
+    names = list(LANDMARKS)
+    img = [(160 + 60 * x / (1 + 0.06 * y), 170 - 150 * y / (y + 8.0)) for x, y in (LANDMARKS[n] for n in names)]
+    profile = fit_calibration(img, [LANDMARKS[n] for n in names], SIZE, distortion=True)
+    profile["k1"] = 0.05
+    return Calibration(profile, str(tmp_path / "cam.json"), use_lut=use_lut)
+
+def test_lut_is_opt_in(tmp_path):
+    cal = _calibration(tmp_path)
+    u, v = np.array([10.3, 200.7]), np.array([120.2, 90.9])
+    direct = cal.image_to_world(u, v, SIZE)
+    cal.lut(SIZE)
+    assert np.array_equal(cal.image_to_world(u, v, SIZE), direct)
+    assert not np.array_equal(_calibration(tmp_path, use_lut=True).image_to_world(u, v, SIZE), direct)
+
+def test_lut_max_world_error(tmp_path):
+    cal = _calibration(tmp_path)
+    lut = _calibration(tmp_path, use_lut=True)
+    rng = np.random.default_rng(0)
+    u = rng.uniform(0, SIZE[0] - 1, 20000)
+    v = rng.uniform(0, SIZE[1] - 1, 20000)
+    x0, y0 = cal.image_to_world(u, v, SIZE)
+    x1, y1 = lut.image_to_world(u, v, SIZE)
+    err = np.hypot(x1 - x0, y1 - y0)
+    # within the pitch area (y up to the far stumps) the table is good to a few mm
+    near = (y0 > -2) & (y0 < 22)
+    assert near.sum() > 1000
+    assert err[near].max() < 5e-3
+    # tracking at a different resolution samples that resolution's own table
+    xs, ys = lut.image_to_world(u / 2, v / 2, (160, 90))
+    assert np.nanmax(np.hypot(xs - x0, ys - y0)[near]) < 2e-2
+
+def test_fit_recovers_landmarks_and_inverse(tmp_path):
+    from calibration import save_profile
+    cal = _calibration(tmp_path)
+    names = list(LANDMARKS)
+    world = np.array([LANDMARKS[n] for n in names])
+    u, v = cal.world_to_image(world[:, 0], world[:, 1])
+    # a profile fitted to these clicks maps them back onto the landmarks
+    profile = fit_calibration(np.stack([u, v], axis=1), world, SIZE, distortion=True)
+    assert profile["rms_error_m"] < 1e-3
+    assert abs(profile["k1"] - 0.05) < 5e-3
+    # world_to_image inverts image_to_world, also at another tracking resolution
+    x, y = Calibration(profile).image_to_world(u * 3, v * 3, (960, 540))
+    assert np.allclose(np.stack([x, y], axis=1), world, atol=1e-3)
+    path = save_profile(profile, str(tmp_path / "lords.json"))
+    loaded = Calibration.load(path)
+    assert loaded.digest() == Calibration(profile).digest()
+    assert Calibration.load(path) is loaded
+    assert Calibration.load(path, use_lut=True).use_lut and not loaded.use_lut
@@ -0,0 +1,47 @@
+import json
+import numpy as np
+import pytest
+from decision_rules import RuleEngine, synthetic_reviews
+
+def old_rules(r):
+    # the notebook's per-row rules that the engine replaced
+    return {
+        "lbw": int(r["snick_peak"] < 0.2 and r["stump_hit_prob"] > 0.5 and 3 < r["impact_x"] < 7),
+        "no_ball": int(r["foot_position"] > 0.6),
+        "no_ball_waist": int(r["ball_height_at_batsman"] > 1.2),
+        "run_out": int(r["bat_in_crease"] == 0 and r["bails_removed"] == 1),
+        "stumping": int(r["foot_outside_crease"] == 1 and r["bails_removed_stump"] == 1),
+        "catch_behind": int(r["snick_detected"] == 1 and r["caught_by_keeper"] == 1),
+        "boundary": int(r["ball_distance_from_rope"] <= 0),
+    }
+
+def test_engine_matches_per_row_rules():
+    cols = synthetic_reviews(3000, seed=3)
+    cols["impact_x"][:4] = [3.0, 7.0, 5.0, 2.9]        # "between" is open at both ends
+    engine = RuleEngine(block=256)                      # several blocks, a ragged last one
+    result = engine.evaluate(cols)
+    for i in range(3000):
+        row = {k: v[i] for k, v in cols.items()}
+        expected = old_rules(row)
+        for name, given in expected.items():
+            assert int(result["decisions"][name][i]) == given, (i, name)
+
+def test_failed_bitmask_and_explain():
+    engine = RuleEngine()
+    cols = synthetic_reviews(10, seed=0)
+    cols["snick_peak"][0], cols["stump_hit_prob"][0], cols["impact_x"][0] = 0.5, 0.9, 8.0
+    result = engine.evaluate(cols)
+    # conditions 0 (no bat contact) and 2 (in line) failed, condition 1 held
+    assert result["failed"]["lbw"][0] == 0b101
+    verdict, reasons = engine.explain(result, 0)["lbw"]
+    assert not verdict and reasons == ["no bat contact", "impact in line with the stumps"]
+    summary = engine.summary(result)
+    assert sum(summary["boundary"]["failed"].values()) + summary["boundary"]["given"] == 10
+
+def test_custom_rules_from_json():
+    rules = {"wide": [{"column": "line_offset", "op": ">=", "value": 0.9, "reason": "outside the wide line"}]}
+    engine = RuleEngine(json.loads(json.dumps(rules)))
+    out = engine.evaluate({"line_offset": np.array([0.2, 0.9, 1.5])})
+    assert out["decisions"]["wide"].tolist() == [False, True, True]
+    with pytest.raises(ValueError):
+        RuleEngine({"wide": [{"column": "line_offset", "op": "~", "value": 1, "reason": ""}]})
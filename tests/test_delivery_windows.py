@@ -0,0 +1,21 @@
+from delivery_windows import find_delivery_windows
+
+def test_single_delivery_window(make_clip):
+    # 1.3 s of idle pitch, a one-second delivery, then 2.7 s of idle pitch again
+    pts = [None] * 40 + [(20 + 9 * i, 40 + 3 * i) for i in range(30)] + [None] * 80
+    clip = make_clip("delivery.mp4", pts)
+    windows = find_delivery_windows(clip)
+    assert len(windows) == 1
+    start, stop = windows[0]
+    pad = 10                                 # 0.33 s at 30 fps
+    assert 40 - pad - 2 <= start <= 40 - pad + 2
+    assert 70 + pad - 2 <= stop <= 70 + pad + 2
+
+def test_idle_clip_has_no_window(make_clip):
+    clip = make_clip("idle.mp4", [None] * 60)
+    assert find_delivery_windows(clip) == []
+
+def test_short_flicker_is_not_a_delivery(make_clip):
+    # motion for 4 frames (0.13 s) is below min_seconds
+    pts = [None] * 30 + [(100 + 5 * i, 90) for i in range(4)] + [None] * 30
+    assert find_delivery_windows(make_clip("flicker.mp4", pts)) == []
@@ -0,0 +1,17 @@
+import warnings
+import numpy as np
+from drs_inference import compile_model
+from drs_models import make_models, synthetic_dataset
+
+def test_compiled_models_match_sklearn():
+    X, y = synthetic_dataset(3000, seed=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        models = {name: m.fit(X, y) for name, m in make_models(seed=0).items()}
+    forest = models["Random Forest"]
+    assert np.allclose(compile_model(forest)(X[:500]), forest.predict_proba(X[:500]))
+    # a single deep tree is faster in sklearn's own code, so it is not compiled
+    tree = models["Decision Tree"]
+    assert compile_model(tree) == tree.predict_proba
+    p = compile_model(models["SVM"])(X[:10])
+    assert p.shape == (10, 2) and np.allclose(p.sum(axis=1), 1.0)
@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import subprocess
+import sys
+import threading
+import pytest
+from extract_tracks_kalman import track_ball
+from jobs import JobManager, STATUS_FILE, ACTIVE_STATES
+
+def wait_for(manager, job_id, states, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status["state"] in states:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} stuck in {manager.status(job_id)}")
+
+class Stop(Exception):
+    pass
+
+def test_track_ball_cancel_near_end(straight_clip):
+    # 40 frames, queue_size=4: after frame 32 is handed out the decoder is blocked
+    # handing over end-of-stream to a full queue when the callback raises
+    clip = straight_clip("clip.mp4", 40)
+    box = {}
+
+    def progress(n):
+        if n == 33:
+            raise Stop()
+
+    def run():
+        try:
+            track_ball(clip, resize=(320,180), workers=2, queue_size=4, progress=progress)
+        except Stop as exc:
+            box["error"] = exc
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(10)
+    assert not t.is_alive(), "track_ball hung after the progress callback raised"
+    assert isinstance(box.get("error"), Stop)
+
+def test_cancel_running_job_frees_slot(tmp_path, straight_clip):
+    long_clip = straight_clip("long.mp4", 1500)
+    short_clip = straight_clip("short.mp4", 20)
+    manager = JobManager(str(tmp_path / "jobs"), max_workers=1)
+    try:
+        job = manager.submit(long_clip, resize=(320,180), workers=2)
+        wait_for(manager, job, ("running",), 60)
+        manager.cancel(job)
+        assert wait_for(manager, job, ("cancelled", "done", "failed"), 30)["state"] == "cancelled"
+        # the single pool slot is free again
+        nxt = manager.submit(short_clip, resize=(320,180), workers=2)
+        assert wait_for(manager, nxt, ("cancelled", "done", "failed"), 60)["state"] == "done"
+        # the options the job ran with, fps read from the clip
+        assert manager.result(nxt)["options"] == {"resize": [320, 180], "fps": 30.0, "pitch_length_m": 20.12,
+                                                  "calibration": None}
+    finally:
+        manager.shutdown()
+
+def test_cleanup_removes_orphaned_jobs(tmp_path):
+    root = tmp_path / "jobs"
+    manager = JobManager(str(root), max_workers=1)
+    try:
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+        old = time.time() - 2 * 24 * 3600
+        orphans = {"running-dead-pid": {"state": "running", "pid": dead.pid, "started": time.time()},
+                   "queued-old": {"state": "queued", "submitted": old}}
+        for job_id, status in orphans.items():
+            os.makedirs(root / job_id)
+            with open(root / job_id / STATUS_FILE, "w") as f:
+                json.dump(status, f)
+            os.utime(root / job_id, (old, old))
+        for job_id in orphans:
+            assert manager.status(job_id)["state"] not in ACTIVE_STATES
+        assert manager.cleanup() == 2
+        assert os.listdir(root) == []
+    finally:
+        manager.shutdown()
@@ -0,0 +1,15 @@
+import numpy as np
+from extract_tracks_kalman import MotionDetector
+
+def test_no_stale_measurement_on_off_stride_frames():
+    motion = MotionDetector(scale=1.0, stride=3)
+    frame = np.zeros((90, 160, 3), np.uint8)
+    found = {}
+    for i in range(30):
+        fr = frame.copy()
+        if i >= 20:
+            fr[40:50, 10 + 5 * i - 100:20 + 5 * i - 100] = 255
+        motion.feed(i, motion.shrink(fr))
+        found[i] = motion.detect((160, 90))
+    assert all(found[i] is None for i in range(30) if i % 3)
+    assert any(found[i] is not None for i in range(21, 30, 3))
@@ -0,0 +1,52 @@
+import threading
+import pytest
+from pipeline_stage import ordered_stage
+
+def _run_with_timeout(fn, timeout=5.0):
+    done = threading.Event()
+    box = {}
+
+    def target():
+        try:
+            box["result"] = fn()
+        except BaseException as exc:
+            box["error"] = exc
+        done.set()
+    threading.Thread(target=target, daemon=True).start()
+    assert done.wait(timeout), "ordered_stage did not return"
+    if "error" in box:
+        raise box["error"]
+    return box.get("result")
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_results_in_order(workers):
+    out = list(ordered_stage(((i, i) for i in range(50)), lambda x: x * 2, workers=workers, queue_size=4))
+    assert out == [(i, 2 * i) for i in range(50)]
+
+def test_close_early_with_full_queue():
+    def consume():
+        g = ordered_stage(((i, i) for i in range(8)), lambda x: x, workers=2, queue_size=4)
+        first = next(g)
+        g.close()
+        return first
+    assert _run_with_timeout(consume) == (0, 0)
+
+def test_decoder_error_after_early_close():
+    def frames():
+        for i in range(8):
+            yield i, i
+        raise RuntimeError("decode failed")
+
+    def consume():
+        g = ordered_stage(frames(), lambda x: x, workers=2, queue_size=4)
+        next(g)
+        g.close()
+    _run_with_timeout(consume)
+
+def test_decoder_error_is_raised():
+    def frames():
+        yield 0, 0
+        raise RuntimeError("decode failed")
+
+    with pytest.raises(RuntimeError):
+        _run_with_timeout(lambda: list(ordered_stage(frames(), lambda x: x, workers=2, queue_size=4)))
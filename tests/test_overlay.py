@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+import pytest
+from extract_tracks_kalman import track_ball
+from overlay import overlay_video
+from udrs_pipeline import ReviewPipeline
+
+def delivery(n=60):
+    # source at twice the tracking size; the ball leaves the frame near the end
+    return [(40 + 9 * i, 60 + 4 * i) if i < 45 else None for i in range(n)]
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_overlay_tracks_like_track_ball(make_clip, tmp_path, workers):
+    clip = make_clip("src.mp4", delivery(), size=(640,360), radius=10)
+    pipe = ReviewPipeline(resize=(320,180))
+    out = str(tmp_path / "overlay.mp4")
+    result = overlay_video(clip, out, pipeline=pipe, workers=workers, queue_size=4, buffer_mb=4)
+    detections = track_ball(clip, resize=(320,180))
+    assert sum(d["x"] is not None for d in detections) > 30
+    expected = pipe.interpolate(detections)
+    for k in ("frame", "x", "y"):
+        assert np.array_equal(result["raw"][k], expected[k])
+    assert result["overlay_frames"] == 60
+    cap = cv2.VideoCapture(out)
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 60
+    assert (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))) == (640, 360)
+    cap.release()
+
+def test_pitching_frame_needs_a_filled_track():
+    from overlay import pitching_frame
+    frames = np.arange(20)
+    ys = np.where(frames < 10, 10.0 * frames, 100.0 - 5.0 * (frames - 10))
+    assert pitching_frame(frames, ys) == 10
+    assert pitching_frame(frames, np.full(20, np.nan)) is None
@@ -0,0 +1,73 @@
+import math
+import numpy as np
+from physics_reconstruct import reconstruct_arrays, reconstruct_batch
+
+def baseline(frames, xs, ys, image_size=(960,540), pitch_length_m=20.12, fps=30.0,
+             min_forward_speed=0.5, max_extrap_seconds=4.0):
+    # the per-track loop reconstruction that reconstruct_batch replaced
+    w, h = image_size
+    x_m = xs / w * 3.0 - 1.5
+    y_m = (1.0 - ys / h) * pitch_length_m
+    t, dt = frames / fps, 1.0 / fps
+    dy = np.gradient(y_m, t) if len(t) >= 2 else np.array([0.0])
+    dx = np.gradient(x_m, t) if len(t) >= 2 else np.array([0.0])
+    n = min(5, len(dy))
+    v_fwd = float(np.median(-dy[-n:]))
+    if v_fwd <= 0:
+        v_fwd = min_forward_speed
+    v_lat = float(np.median(dx[-n:]))
+    z = np.linspace(1.6, 0.2, len(t)) if len(t) >= 2 else np.array([1.6])
+    pts = [(int(f), x, y, max(0.0, zi)) for f, x, y, zi in zip(frames, x_m, y_m, z)]
+    f, x, y, zl = int(frames[-1]), x_m[-1], y_m[-1], z[-1]
+    v_fwd = max(v_fwd, min_forward_speed)
+    max_extra = int(math.ceil(max_extrap_seconds * fps))
+    tts = y / v_fwd
+    z_rate = (0.2 - zl) / tts if tts > 0 else (0.2 - zl) / max(1.0, max_extrap_seconds)
+    extra = 0
+    while y > 0.0 and extra < max_extra:
+        f, x, y, zl = f + 1, x + v_lat * dt, max(y - v_fwd * dt, 0.0), max(zl + z_rate * dt, 0.0)
+        pts.append((f, x, y, zl))
+        extra += 1
+    if y > 0.0:
+        k = int(math.ceil(y / v_fwd))
+        pts.append((pts[-1][0] + k, pts[-1][1] + v_lat * k * dt, 0.0, 0.2))
+    return np.array(pts)
+
+def random_tracks(n, seed=0):
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for _ in range(n):
+        L = int(rng.integers(1, 40))
+        start = int(rng.integers(0, 100))
+        # mostly incoming deliveries; some slow or receding ones hit the fallback speed / time limit
+        vy = rng.choice([rng.uniform(3, 20), rng.uniform(-2, 0.3)])
+        frames = start + np.arange(L)
+        xs = rng.uniform(200, 760) + rng.uniform(-3, 3) * np.arange(L) + rng.normal(0, 0.5, L)
+        ys = rng.uniform(20, 300) + vy * np.arange(L) + rng.normal(0, 0.5, L)
+        tracks.append((frames, xs, ys))
+    return tracks
+
+def test_batch_matches_per_track_baseline():
+    tracks = random_tracks(300)
+    cols, info = reconstruct_batch(*zip(*tracks))
+    off = cols["offsets"]
+    for i, (frames, xs, ys) in enumerate(tracks):
+        ref = baseline(frames, xs, ys)
+        got = np.stack([cols[k][off[i]:off[i + 1]] for k in ("frame", "x", "y", "z")], axis=1)
+        assert got.shape == ref.shape, i
+        assert np.array_equal(got[:, 0], ref[:, 0]), i
+        assert np.allclose(got[:, 1:], ref[:, 1:], atol=1e-9), i
+    assert info["n_observed"].tolist() == [len(f) for f, _, _ in tracks]
+
+def test_padded_input_and_single_track_wrapper():
+    tracks = random_tracks(20, seed=1)
+    ragged, _ = reconstruct_batch(*zip(*tracks))
+    lengths = [len(f) for f, _, _ in tracks]
+    pad = lambda rows: np.stack([np.pad(r.astype(float), (0, 40 - len(r)), constant_values=np.nan) for r in rows])
+    padded, _ = reconstruct_batch(*(pad(c) for c in zip(*tracks)), lengths=lengths)
+    for k in ("frame", "x", "y", "z", "offsets"):
+        assert np.array_equal(ragged[k], padded[k])
+    single, _ = reconstruct_arrays(*tracks[3])
+    s = slice(ragged["offsets"][3], ragged["offsets"][4])
+    for k in ("frame", "x", "y", "z"):
+        assert np.array_equal(single[k], ragged[k][s])
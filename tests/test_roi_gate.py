@@ -0,0 +1,11 @@
+from extract_tracks_kalman import track_ball, RoiGate
+
+def test_roi_gate_finds_what_the_full_frame_search_finds(make_clip):
+    # the ball jumps out of the gated window halfway through, then vanishes for a while
+    positions = [(20 + 4 * i, 90) for i in range(30)] + [(290 - 4 * i, 30) for i in range(30)]
+    positions += [None] * 10 + [(150, 150)] * 10
+    clip = make_clip("jump.mp4", positions)
+    gate = RoiGate()
+    gated = track_ball(clip, resize=(320,180), roi=gate)
+    assert gated == track_ball(clip, resize=(320,180))
+    assert gate.roi_frames > 0 and gate.retry_hits > 0
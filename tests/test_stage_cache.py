@@ -0,0 +1,42 @@
+import os
+import numpy as np
+import stage_cache
+from stage_cache import StageCache
+
+def test_eviction_keeps_the_budget_without_scanning_every_put(tmp_path, monkeypatch):
+    cache = StageCache(str(tmp_path), max_bytes=10000)
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(stage_cache.os, "walk", lambda *a, **k: walks.append(1) or real_walk(*a, **k))
+    cache.put(cache.key("s", "0", {}), np.zeros(100))        # first put sizes the directory
+    scans = len(walks)
+    for i in range(1, 5):
+        cache.put(cache.key("s", str(i), {}), np.zeros(100))  # ~1 kB each, under budget
+    assert len(walks) == scans
+    for i in range(5, 30):
+        cache.put(cache.key("s", str(i), {}), np.zeros(100))
+    assert cache.size() <= 10000 and cache.evictions > 0
+    # the newest entries survive, the oldest went first
+    assert cache.get(cache.key("s", "29", {}))[0]
+
+def test_cached_hit_and_version_in_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or 42
+    assert cache.cached("stage", "digest", {"version": 1}, compute) == 42
+    assert cache.cached("stage", "digest", {"version": 1}, compute) == 42
+    assert cache.cached("stage", "digest", {"version": 2}, compute) == 42
+    assert len(calls) == 2 and cache.hits == 1
+
+def test_reconstruct_key_includes_calibration_mapping(tmp_path):
+    from calibration import Calibration
+    from physics_reconstruct import reconstruct_arrays
+    H = [[0.01, 0.0, -1.6], [0.0, -0.12, 21.6], [0.0, 0.0, 1.0]]
+    direct = Calibration({"H": H, "image_size": [320, 180]})
+    lut = Calibration({"H": H, "image_size": [320, 180]}, use_lut=True)
+    cache = StageCache(str(tmp_path))
+    frames = np.arange(20)
+    xs, ys = 160.0 + frames, 20.0 + 7.0 * frames
+    for cal in (direct, lut, lut):
+        reconstruct_arrays(frames, xs, ys, image_size=(320, 180), cache=cache, calibration=cal)
+    assert cache.misses == 2 and cache.hits == 1
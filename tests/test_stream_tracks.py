@@ -0,0 +1,30 @@
+import io
+import json
+from extract_tracks_kalman import track_ball, interpolate_missing
+from stream_tracks import StreamInterpolator, stream_tracks
+
+def test_stream_matches_offline_gap_fill(make_clip):
+    # a 10-frame gap fits in the lookahead, so streaming gives the offline result
+    pts = [(20 + 3 * i, 40 + i) for i in range(60)]
+    clip = make_clip("live.mp4", [None if 25 <= i < 35 else p for i, p in enumerate(pts)])
+    out = io.StringIO()
+    latencies = stream_tracks(clip, out, resize=(320,180), lookahead=15, idle_timeout=0.1)
+    lines = [json.loads(l) for l in out.getvalue().splitlines()]
+    assert [l["frame"] for l in lines] == list(range(60)) and len(latencies) == 60
+    offline = interpolate_missing(track_ball(clip, resize=(320,180)))
+    assert [(l["x"], l["y"]) for l in lines] == [(d["x"], d["y"]) for d in offline]
+
+def test_lookahead_bounds_the_hold_back():
+    interp = StreamInterpolator(lookahead=3)
+    assert interp.push({"frame": 0, "x": None, "y": None}) == []
+    assert interp.push({"frame": 1, "x": 10.0, "y": 20.0}) == [{"frame": 0, "x": 10.0, "y": 20.0},
+                                                              {"frame": 1, "x": 10.0, "y": 20.0}]
+    held = []
+    for f in range(2, 7):
+        held += interp.push({"frame": f, "x": None, "y": None})
+    # frames 2 and 3 could not wait any longer: emitted at the last known position
+    assert held == [{"frame": 2, "x": 10.0, "y": 20.0}, {"frame": 3, "x": 10.0, "y": 20.0}]
+    out = interp.push({"frame": 7, "x": 16.0, "y": 26.0})
+    assert [r["frame"] for r in out] == [4, 5, 6, 7]
+    assert out[0] == {"frame": 4, "x": 13.0, "y": 23.0}
+    assert interp.flush() == []
@@ -0,0 +1,30 @@
+import numpy as np
+from drs_models import FEATURES
+from synthetic_deliveries import COLUMNS, generate, iter_chunks, open_dataset
+
+def test_chunks_are_identical_for_any_worker_count(tmp_path):
+    serial = generate(str(tmp_path / "w1"), 2500, chunk=600, workers=1, seed=7)
+    pooled = generate(str(tmp_path / "w3"), 2500, chunk=600, workers=3, seed=7)
+    assert serial["hit_rate"] == pooled["hit_rate"]
+    a, b = open_dataset(str(tmp_path / "w1")), open_dataset(str(tmp_path / "w3"))
+    for c in COLUMNS:
+        assert np.array_equal(a[c], b[c]), c
+    # a different root seed gives different data
+    generate(str(tmp_path / "s8"), 2500, chunk=600, workers=1, seed=8)
+    other = open_dataset(str(tmp_path / "s8"))
+    assert not np.array_equal(a["speed"], other["speed"])
+
+def test_dataset_columns_and_labels(tmp_path):
+    out = str(tmp_path / "ds")
+    m = generate(out, 3000, chunk=1000, workers=1, seed=0)
+    assert m["rows"] == 3000 and set(FEATURES) <= set(m["columns"])
+    ds = open_dataset(out)
+    assert all(np.isfinite(ds[c]).all() for c in COLUMNS)
+    # LBW needs a hit, in line, without an edge; the review overturns the on-field call when they differ
+    lbw = ds["hit"].astype(bool) & ds["in_line"].astype(bool) & ~ds["edge"].astype(bool)
+    assert np.array_equal(ds["lbw"].astype(bool), lbw)
+    assert np.array_equal(ds["review_result"], ds["lbw"] ^ ds["umpire_decision"])
+    assert 0.0 <= ds["stump_hit_prob"].min() and ds["stump_hit_prob"].max() <= 1.0
+    chunks = list(iter_chunks(out, ["speed"], rows=1200))
+    assert [len(c["speed"]) for c in chunks] == [1200, 1200, 600]
+    assert np.array_equal(np.concatenate([c["speed"] for c in chunks]), ds["speed"])
@@ -0,0 +1,26 @@
+import pytest
+from extract_tracks_kalman import track_ball, track_ball_parallel
+
+def delivery(n=90):
+    # the ball crosses, disappears (motion fallback and Kalman prediction), then returns
+    pts = [(20 + 3 * i, 40 + i) for i in range(n)]
+    return [None if 40 <= i < 50 else p for i, p in enumerate(pts)]
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_pipelined_matches_serial(make_clip, workers):
+    clip = make_clip("delivery.mp4", delivery())
+    serial = track_ball(clip, resize=(320,180))
+    assert sum(d["x"] is not None for d in serial) > 0
+    assert track_ball(clip, resize=(320,180), workers=workers, queue_size=4) == serial
+
+def test_multiprocess_matches_serial(make_clip):
+    # every frame resolved by the colour detector: the stitched run is identical
+    clip = make_clip("visible.mp4", [(20 + 3 * i, 40 + i) for i in range(90)])
+    serial = track_ball(clip, resize=(320,180))
+    assert track_ball_parallel(clip, resize=(320,180), processes=2, chunk_frames=25) == serial
+
+def test_multiprocess_windows_match_serial(make_clip):
+    clip = make_clip("windows.mp4", delivery())
+    ranges = [(5, 30), (55, 80)]
+    serial = track_ball(clip, resize=(320,180), frame_ranges=ranges)
+    assert track_ball_parallel(clip, resize=(320,180), processes=2, frame_ranges=ranges) == serial
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from drs_models import FEATURES
+from physics_reconstruct import reconstruct_arrays
+from track_features import build_features
+
+def delivery(x0, dx, n=20):
+    # raw 2D track coming down the image (towards the stumps) at 960x540
+    frames = np.arange(10, 10 + n)
+    xs = x0 + dx * np.arange(n, dtype=float)
+    ys = 100.0 + 15.0 * np.arange(n)
+    raw = {"frame": frames, "x": xs, "y": ys, "valid": np.ones(n, dtype=np.uint8),
+           "meta": {"image_size": [960, 540], "fps": 30.0}}
+    tracks, _ = reconstruct_arrays(frames, xs, ys, image_size=(960, 540), fps=30.0)
+    return raw, tracks
+
+def test_features_from_tracks():
+    straight, wide = delivery(480.0, 0.0), delivery(300.0, -8.0)
+    X, details = build_features([straight, wide + ({"snick_peak": 0.7},)], n_samples=2000)
+    assert X.shape == (2, len(FEATURES))
+    f, g = details
+    assert [X[0, k] for k in range(len(FEATURES))] == [f[name] for name in FEATURES]
+    # impact at the last tracked point, in the notebook's 0..10 / 0..22 units
+    assert abs(f["impact_x"] - 5.0) < 1e-9
+    assert abs(f["impact_y"] - (100.0 + 15.0 * 19) / 540 * 22) < 1e-9
+    assert abs(f["angle"] - 90.0) < 1e-9
+    assert f["decision"] == "OUT" and f["stump_hit_prob"] > 0.9
+    assert g["decision"] == "NOT OUT" and g["stump_hit_prob"] < 0.1
+    assert g["snick_peak"] == 0.7 and f["snick_peak"] == 0.05
+
+def test_short_tracks():
+    from track_features import delivery_features
+    raw, tracks = delivery(480.0, 0.0, n=3)
+    # too short for the Monte Carlo model: the deterministic call stands in
+    f = delivery_features(raw, tracks)
+    assert f["stump_hit_prob"] == float(f["decision"] == "OUT")
+    raw, tracks = delivery(480.0, 0.0, n=1)
+    with pytest.raises(ValueError):
+        delivery_features(raw, tracks)
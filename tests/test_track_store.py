@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from track_store import read_header, read_track_arrays, read_tracks, write_tracks
+
+POINTS = [{"frame": 3, "x": 10.5, "y": 20.25}, {"frame": 4, "x": None, "y": None},
+          {"frame": 5, "x": 12.0, "y": 22.0}]
+
+def test_trk_round_trip(tmp_path):
+    path = str(tmp_path / "raw.trk")
+    write_tracks(path, POINTS, fps=29.97, image_size=(960, 540), params={"interp": "linear"})
+    cols = read_track_arrays(path)
+    assert isinstance(cols["x"], np.memmap)
+    assert cols["meta"]["fps"] == 29.97 and cols["meta"]["image_size"] == [960, 540]
+    assert cols["meta"]["params"] == {"interp": "linear"}
+    assert cols["frame"].tolist() == [3, 4, 5] and cols["valid"].tolist() == [1, 0, 1]
+    assert np.isnan(cols["x"][1])
+    assert read_tracks(path) == POINTS
+    # every column starts on a 64-byte boundary
+    assert all(c["offset"] % 64 == 0 for c in read_header(path)["columns"])
+
+def test_3d_columns_and_json_conversion(tmp_path):
+    n = 1000
+    tracks = {"frame": np.arange(n), "x": np.linspace(0, 1, n), "y": np.linspace(20, 0, n),
+              "z": np.sin(np.linspace(0, 3, n))}
+    trk, js = str(tmp_path / "t.trk"), str(tmp_path / "t.json")
+    write_tracks(trk, tracks, fps=30.0)
+    cols = read_track_arrays(trk)
+    for k in ("x", "y", "z"):
+        assert np.array_equal(cols[k], tracks[k])
+    write_tracks(js, cols)
+    back = read_track_arrays(js)
+    assert back["meta"]["fps"] is None
+    for k in ("frame", "x", "y", "z"):
+        assert np.array_equal(back[k], tracks[k])
+
+def test_empty_track_and_bad_magic(tmp_path):
+    path = str(tmp_path / "empty.trk")
+    write_tracks(path, {"frame": [], "x": [], "y": []})
+    cols = read_track_arrays(path)
+    assert cols["meta"]["n"] == 0 and len(cols["x"]) == 0
+    bad = tmp_path / "bad.trk"
+    bad.write_bytes(b"not a track file")
+    with pytest.raises(ValueError):
+        read_track_arrays(str(bad))
@@ -0,0 +1,43 @@
+import numpy as np
+from trajectory_physics import fit_release, integrate
+
+VACUUM = {"drag_k": 0.0}
+
+def test_vacuum_flight_is_exact():
+    # constant acceleration: the midpoint scheme is exact up to the crossing interpolation
+    s0 = np.array([[0.1, 18.0, 2.0, 0.5, -30.0, 1.0]])
+    out = integrate(s0, params=VACUUM, dt=0.002)
+    t = 18.0 / 30.0
+    assert not out["bounced"][0]
+    assert abs(out["t_cross"][0] - t) < 1e-9
+    x, y, z = out["cross"][0, :3]
+    assert abs(x - (0.1 + 0.5 * t)) < 1e-9 and abs(y) < 1e-9
+    assert abs(z - (2.0 + t - 0.5 * 9.81 * t * t)) < 1e-5
+
+def test_bounce_and_batch_matches_single_runs():
+    rng = np.random.default_rng(0)
+    states = np.column_stack([rng.uniform(-0.5, 0.5, 50), rng.uniform(10, 20, 50), rng.uniform(0.5, 2.5, 50),
+                              rng.uniform(-1, 1, 50), rng.uniform(-35, -15, 50), rng.uniform(-6, 2, 50)])
+    swing = rng.uniform(-1, 1, 50)
+    states[0, 4] = 0.5                       # moving away: never reaches the stumps
+    batch = integrate(states, swing, record_every=5, n_record=40)
+    assert np.isnan(batch["t_cross"][0]) and batch["bounced"][1:].any()
+    b = np.flatnonzero(batch["bounced"])
+    # recorded at the end of the step that reached the ground (one step of travel below the ball radius)
+    assert np.all((batch["bounce"][b, 2] <= 0.036) & (batch["bounce"][b, 2] > 0.0))
+    for i in (0, 1, 7, 23, 49):
+        one = integrate(states[i:i + 1], swing[i:i + 1], record_every=5, n_record=40)
+        for k in ("t_cross", "cross", "bounced", "bounce", "samples"):
+            assert np.array_equal(one[k][0], batch[k][i], equal_nan=True), (i, k)
+
+def test_fit_release_recovers_the_pitch_plane_motion():
+    truth = np.array([0.2, 16.0, 1.0, -0.4, -28.0, -1.0])
+    swing = 0.8
+    fps = 30.0
+    out = integrate(truth[None], np.array([swing]), dt=1 / fps / 8, t_max=0.4, record_every=8, n_record=12)
+    obs = out["samples"][0]
+    frames = np.delete(np.arange(12), [5, 6])            # a two-frame gap
+    state0, _, rms = fit_release(frames / fps, obs[frames], n_candidates=1000, frame_dt=1 / fps, seed=1)
+    assert rms < 0.02
+    assert np.allclose(state0[[0, 1]], truth[[0, 1]], atol=0.03)
+    assert np.allclose(state0[[3, 4]], truth[[3, 4]], atol=0.5)
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import sys
+from udrs_pipeline import ReviewPipeline
+dets = [{"frame": i, "x": None if i % 4 == 1 else 480.0 + i, "y": None if i % 4 == 1 else 100.0 + 12 * i}
+        for i in range(30)]
+for interp in ("linear", "rts"):
+    p = ReviewPipeline(interp=interp)
+    p.decide(p.reconstruct(p.interpolate(dets)))
+print("cv2" in sys.modules)
+"""
+
+def test_redeciding_a_track_does_not_import_cv2():
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+track_features.py
+The DRS classifiers' feature vector (drs_models.FEATURES) computed from the
+tracker outputs, raw_tracks (2D, pixels) and tracks (3D, metres), in batch
+over many deliveries without decoding any video.
+
+    impact_x, impact_y  where the observed flight ends (the ball meets pad or
+                        bat: the last tracked frame), in the notebook's
+                        image-proportional units (width -> 0..10, height -> 0..22)
+    angle               direction of the 2D track in degrees (first to last point)
+    stump_hit_prob      Monte Carlo P(hit) from hit_probability
+    bat_distance,       not observable from the ball track: taken from the
+    snick_peak,         caller (edge detection, on-field call) or the
+    umpire_decision     notebook's placeholder values
+
+Usage:
+    python track_features.py .udrs_jobs/* --out features.npz
+    python track_features.py --raw raw_tracks.json --tracks tracks.json
+"""
+import os
+import time
+import argparse
+import numpy as np
+from drs_models import FEATURES
+
+IMPACT_X_UNITS = 10.0
+IMPACT_Y_UNITS = 22.0
+
+# Inputs the ball track cannot provide (the notebook's placeholders)
+DEFAULT_EXTERNAL = {"bat_distance": 0.1, "snick_peak": 0.05, "umpire_decision": 0}
+
+def track_angle(xs_img, ys_img):
+    """Absolute direction (degrees) of the 2D track from its first to its last point."""
+    return float(abs(np.degrees(np.arctan2(ys_img[-1] - ys_img[0], xs_img[-1] - xs_img[0]))))
+
+def impact_point(raw, tracks):
+    """(x, y, z) metres of the 3D track at the last tracked frame: where the observed flight ends."""
+    last = int(np.asarray(raw["frame"])[np.asarray(raw["valid"], dtype=bool)][-1])
+    frames = np.asarray(tracks["frame"])
+    i = int(np.searchsorted(frames, last, side="right")) - 1
+    i = min(max(i, 0), len(frames) - 1)
+    return float(tracks["x"][i]), float(tracks["y"][i]), float(tracks["z"][i])
+
+def delivery_features(raw, tracks, image_size=None, pitch_length_m=20.12, fps=None, calibration=None,
+                      external=None, n_samples=4000, seed=0):
+    """
+    Feature dict (every name in FEATURES) plus "impact_m", "decision" and
+    "margin" for one delivery. raw/tracks are column dicts as returned by
+    track_store.read_track_arrays. `external` overrides DEFAULT_EXTERNAL.
+    """
+    from physics_reconstruct import pitch_to_pixels
+    from hit_probability import track_hit_probability
+    from udrs_pipeline import decide
+    meta = raw.get("meta") or {}
+    image_size = tuple(image_size or meta.get("image_size") or (960,540))
+    fps = fps or meta.get("fps") or 30.0
+    ok = np.asarray(raw["valid"], dtype=bool)
+    frames = np.asarray(raw["frame"])[ok]
+    xs = np.asarray(raw["x"], dtype=float)[ok]
+    ys = np.asarray(raw["y"], dtype=float)[ok]
+    if len(frames) < 2:
+        raise ValueError("Need at least 2 tracked points")
+
+    x_m, y_m, z_m = impact_point(raw, tracks)
+    u, v = pitch_to_pixels(x_m, y_m, image_size, pitch_length_m, calibration)
+    decision = decide(tracks, fps=fps)
+    if len(frames) >= 5:
+        prob = track_hit_probability(frames, xs, ys, image_size=image_size, pitch_length_m=pitch_length_m,
+                                     fps=fps, calibration=calibration, n_samples=n_samples, seed=seed)
+        p_hit = prob["p_hit"]
+    else:
+        # too short for the uncertainty model: fall back to the deterministic call
+        p_hit = float(decision["decision"] == "OUT")
+
+    out = dict(DEFAULT_EXTERNAL, **(external or {}))
+    out.update({"impact_x": float(u) / image_size[0] * IMPACT_X_UNITS,
+                "impact_y": float(v) / image_size[1] * IMPACT_Y_UNITS,
+                "angle": track_angle(xs, ys), "stump_hit_prob": float(p_hit),
+                "impact_m": [x_m, y_m, z_m], "decision": decision["decision"], "margin": decision["margin"]})
+    return out
+
+def build_features(deliveries, **kwargs):
+    """
+    Feature matrix for many deliveries: `deliveries` yields (raw, tracks) or
+    (raw, tracks, external) tuples. Returns (X (n, len(FEATURES)), details),
+    details holding each delivery's full feature dict.
+    """
+    rows, details = [], []
+    for d in deliveries:
+        raw, tracks = d[0], d[1]
+        f = delivery_features(raw, tracks, external=d[2] if len(d) > 2 else None, **kwargs)
+        rows.append([f[k] for k in FEATURES])
+        details.append(f)
+    return np.array(rows, dtype=float).reshape(-1, len(FEATURES)), details
+
+def load_delivery(path, raw_name="raw_tracks.json", tracks_name="tracks.json"):
+    """(raw, tracks) from a directory holding both (e.g. a jobs.py job directory)."""
+    from track_store import read_track_arrays
+    return (read_track_arrays(os.path.join(path, raw_name)),
+            read_track_arrays(os.path.join(path, tracks_name)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build classifier features from raw/3D tracks (no video decode).")
+    parser.add_argument("dirs", nargs="*", help="Delivery directories with raw_tracks.json and tracks.json")
+    parser.add_argument("--raw", default=None, help="Single delivery: 2D tracks (.json or .trk)")
+    parser.add_argument("--tracks", default=None, help="Single delivery: 3D tracks (.json or .trk)")
+    parser.add_argument("--imgsize", default=None, help="Tracking resolution WxH (default: from the track header)")
+    parser.add_argument("--samples", type=int, default=4000, help="Monte Carlo samples for stump_hit_prob")
+    parser.add_argument("--calibration", default=None, help="Camera profile (calibrations/<name>.json or path)")
+    parser.add_argument("--out", default=None, help="Write X, names and decisions to this .npz")
+    args = parser.parse_args()
+
+    from track_store import read_track_arrays
+    if args.raw and args.tracks:
+        names = [args.raw]
+        deliveries = [(read_track_arrays(args.raw), read_track_arrays(args.tracks))]
+    else:
+        names = [d for d in args.dirs if os.path.exists(os.path.join(d, "tracks.json"))]
+        deliveries = (load_delivery(d) for d in names)
+    calibration = None
+    if args.calibration:
+        from calibration import Calibration
+        calibration = Calibration.load(args.calibration)
+    size = tuple(map(int, args.imgsize.split("x"))) if args.imgsize else None
+
+    t0 = time.perf_counter()
+    X, details = build_features(deliveries, image_size=size, calibration=calibration, n_samples=args.samples)
+    dt = time.perf_counter() - t0
+    for name, f in zip(names, details):
+        print(name, " ".join(f"{k}={f[k]:.3f}" for k in FEATURES), f["decision"])
+    print(f"{len(X)} deliveries in {dt:.2f}s")
+    if args.out:
+        np.savez(args.out, X=X, features=np.array(FEATURES), names=np.array(names),
+                 decisions=np.array([f["decision"] for f in details]))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+track_store.py
+Compact columnar binary format (.trk) for 2D raw tracks and 3D tracks.
+
+Layout:
+    8 bytes   magic b"UDRSTRK1"
+    4 bytes   header length (little-endian uint32)
+    header    UTF-8 JSON: {"n", "fps", "image_size", "params", "columns": [{"name", "dtype", "offset"}]}
+    columns   one contiguous, 64-byte aligned array per column:
+              frame (int32), x, y[, z] (float64, NaN where missing), valid (uint8)
+
+Reads are memory-mapped, so opening a track costs a header parse and
+nothing else. Any path ending in .json is read/written in the legacy
+list-of-dicts JSON layout instead, which keeps JSON available as an export.
+
+Usage:
+    python track_store.py tracks.trk tracks.json      # convert either way
+"""
+import json
+import struct
+import argparse
+import numpy as np
+
+MAGIC = b"UDRSTRK1"
+ALIGN = 64
+
+def _is_json(path):
+    return str(path).lower().endswith(".json")
+
+def _columns(tracks):
+    """Normalise a list of point dicts or a dict of arrays into column arrays."""
+    if isinstance(tracks, dict):
+        cols = {k: np.asarray(v) for k, v in tracks.items() if k in ("frame", "x", "y", "z", "valid")}
+    else:
+        cols = {"frame": np.array([int(p["frame"]) for p in tracks], dtype=np.int32)}
+        keys = ("x", "y", "z") if tracks and "z" in tracks[0] else ("x", "y")
+        for k in keys:
+            cols[k] = np.array([np.nan if p[k] is None else p[k] for p in tracks], dtype=float)
+    if "valid" not in cols:
+        cols["valid"] = np.isfinite(cols["x"]) & np.isfinite(cols["y"])
+    cols["frame"] = cols["frame"].astype(np.int32)
+    for k in ("x", "y", "z"):
+        if k in cols:
+            cols[k] = cols[k].astype(np.float64)
+    cols["valid"] = cols["valid"].astype(np.uint8)
+    return cols
+
+def write_tracks(path, tracks, fps=None, image_size=None, params=None):
+    """Write `tracks` (list of point dicts or dict of arrays) as .trk, or as JSON for *.json."""
+    if _is_json(path):
+        with open(path, "w") as f:
+            json.dump(to_points(tracks), f, indent=2)
+        return
+
+    cols = _columns(tracks)
+    order = [k for k in ("frame", "x", "y", "z", "valid") if k in cols]
+    header = {"n": int(len(cols["frame"])), "fps": fps,
+              "image_size": list(image_size) if image_size is not None else None,
+              "params": params or {}, "columns": []}
+
+    # the column offsets depend on the header size: iterate until they settle
+    start = None
+    while True:
+        blob = json.dumps(header).encode("utf-8")
+        needed = -(-(len(MAGIC) + 4 + len(blob)) // ALIGN) * ALIGN
+        if start is not None and needed <= start:
+            break
+        start = needed
+        offset = start
+        header["columns"] = []
+        for k in order:
+            header["columns"].append({"name": k, "dtype": cols[k].dtype.str, "offset": offset})
+            offset = -(-(offset + cols[k].nbytes) // ALIGN) * ALIGN
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(blob)))
+        f.write(blob)
+        for col in header["columns"]:
+            f.write(b"\0" * (col["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(cols[col["name"]]).tobytes())
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a .trk track file: {path}")
+        (n,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(n).decode("utf-8"))
+
+def read_track_arrays(path):
+    """
+    Column arrays {"frame", "x", "y"[, "z"], "valid"} plus "meta" (the header).
+    .trk columns are read-only memory maps; JSON input is parsed into arrays.
+    """
+    if _is_json(path):
+        with open(path, "r") as f:
+            cols = _columns(json.load(f))
+        cols["meta"] = {"n": int(len(cols["frame"])), "fps": None, "image_size": None, "params": {}}
+        return cols
+
+    header = read_header(path)
+    n = header["n"]
+    cols = {}
+    for col in header["columns"]:
+        if n == 0:
+            cols[col["name"]] = np.zeros(0, dtype=col["dtype"])
+        else:
+            cols[col["name"]] = np.memmap(path, dtype=col["dtype"], mode="r", offset=col["offset"], shape=(n,))
+    cols["meta"] = header
+    return cols
+
+def to_points(tracks):
+    """List-of-dicts view (the JSON layout) of a list or column dict."""
+    if not isinstance(tracks, dict):
+        return list(tracks)
+    keys = [k for k in ("x", "y", "z") if k in tracks]
+    valid = tracks.get("valid")
+    out = []
+    for i, fr in enumerate(np.asarray(tracks["frame"]).tolist()):
+        ok = valid is None or bool(valid[i])
+        p = {"frame": int(fr)}
+        for k in keys:
+            p[k] = float(tracks[k][i]) if ok else None
+        out.append(p)
+    return out
+
+def read_tracks(path):
+    """Tracks as a list of point dicts, whatever the file format."""
+    if _is_json(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return to_points(read_track_arrays(path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert tracks between .trk and JSON.")
+    parser.add_argument("src", help="Input tracks (.trk or .json)")
+    parser.add_argument("dst", help="Output tracks (.trk or .json)")
+    args = parser.parse_args()
+
+    cols = read_track_arrays(args.src)
+    meta = cols.pop("meta")
+    write_tracks(args.dst, cols, fps=meta.get("fps"), image_size=meta.get("image_size"),
+                params=meta.get("params"))
+    print(f"Converted {meta['n']} points: {args.src} -> {args.dst}")
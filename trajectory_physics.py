@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+trajectory_physics.py
+Batched ball-flight integrator (gravity, quadratic drag, lateral swing and
+a pitch bounce with restitution and friction) and a release-condition fit
+that replaces the straight-line / linear-height extrapolation of
+physics_reconstruct.py.
+
+Coordinates follow the rest of the project: x lateral, y forward distance
+to the stumps (stumps at y=0, the ball travels towards decreasing y), z
+height above the pitch, all in metres.
+
+State arrays are (N, 6): [x, y, z, vx, vy, vz]. Every trajectory is
+integrated at once with a fixed-step midpoint (RK2) scheme; a trajectory
+stops being integrated as soon as it crosses the stumps plane, and the
+active set is compacted as trajectories finish.
+
+Usage:
+    python trajectory_physics.py --in raw_tracks.json --out tracks.json --fps 30
+"""
+import time
+import argparse
+import numpy as np
+
+DEFAULT_PARAMS = {
+    "g": 9.81,             # m/s^2
+    "drag_k": 0.0076,      # 0.5 * rho * Cd * A / m  (1/m), cricket ball at sea level
+    "restitution": 0.5,    # vertical speed kept at the bounce
+    "friction": 0.15,      # fraction of horizontal speed lost at the bounce
+    "ball_radius": 0.036,  # m
+}
+
+def _accel(v, swing, bounced, p):
+    speed = np.sqrt(np.einsum("ij,ij->i", v, v))
+    a = -p["drag_k"] * speed[:, None] * v
+    a[:, 2] -= p["g"]
+    # swing only acts through the air before pitching
+    a[:, 0] += np.where(bounced, 0.0, swing)
+    return a
+
+def integrate(state0, swing=None, params=None, dt=0.002, t_max=2.0, record_every=None, n_record=0):
+    """
+    Integrate N trajectories from state0 (N, 6) until each crosses y = 0.
+
+    record_every/n_record: store positions every `record_every` steps for the
+    first `n_record` samples (used to compare against observed frames).
+
+    Returns a dict with
+        "t_cross"   (N,)      time of the stumps-plane crossing (NaN if never)
+        "cross"     (N, 6)    state at the crossing (linear in the last step)
+        "bounced"   (N,)      whether the ball pitched before the crossing
+        "bounce"    (N, 3)    pitching point (NaN if no bounce)
+        "samples"   (N, n_record, 3) recorded positions (NaN after termination)
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    s = np.array(state0, dtype=float, copy=True)
+    n = s.shape[0]
+    swing = np.zeros(n) if swing is None else np.broadcast_to(np.asarray(swing, dtype=float), (n,)).copy()
+    r = p["ball_radius"]
+
+    t_cross = np.full(n, np.nan)
+    cross = np.full((n, 6), np.nan)
+    bounced = np.zeros(n, dtype=bool)
+    bounce = np.full((n, 3), np.nan)
+    samples = np.full((n, n_record, 3), np.nan)
+
+    idx = np.arange(n)              # original indices of the active set
+    b = bounced.copy()
+    steps = int(np.ceil(t_max / dt))
+    for k in range(steps + 1):
+        if record_every and k % record_every == 0 and k // record_every < n_record:
+            samples[idx, k // record_every] = s[:, :3]
+        if k == steps or idx.size == 0:
+            break
+
+        x, v = s[:, :3], s[:, 3:]
+        a1 = _accel(v, swing, b, p)
+        vm = v + 0.5 * dt * a1
+        a2 = _accel(vm, swing, b, p)
+        new = np.empty_like(s)
+        new[:, :3] = x + dt * vm
+        new[:, 3:] = v + dt * a2
+
+        # pitch bounce: reflect off the ground with restitution + friction
+        hit = (new[:, 2] <= r) & (new[:, 5] < 0)
+        if hit.any():
+            first = hit & ~b
+            bounce[idx[first]] = new[first, :3]
+            new[hit, 2] = r
+            new[hit, 5] *= -p["restitution"]
+            new[hit, 3:5] *= 1.0 - p["friction"]
+            b = b | hit
+
+        # stumps plane crossing: interpolate inside the step, then retire
+        done = new[:, 1] <= 0.0
+        if done.any():
+            y0, y1 = s[done, 1], new[done, 1]
+            w = np.where(y0 > y1, y0 / np.where(y0 > y1, y0 - y1, 1.0), 1.0)[:, None]
+            cross[idx[done]] = s[done] + w * (new[done] - s[done])
+            t_cross[idx[done]] = (k + w[:, 0]) * dt
+        # balls that have stopped coming towards the stumps will never arrive
+        stalled = ~done & (new[:, 4] >= 0.0)
+        bounced[idx] = b
+        keep = ~(done | stalled)
+        s, swing, b, idx = new[keep], swing[keep], b[keep], idx[keep]
+
+    return {"t_cross": t_cross, "cross": cross, "bounced": bounced, "bounce": bounce, "samples": samples}
+
+# Order of the fitted parameters
+FIT_NAMES = ("x", "y", "z", "vx", "vy", "vz", "swing")
+
+# Weak prior on what the pitch-plane track cannot observe: height and vertical speed
+DEFAULT_PRIOR = {"z": (0.8, 0.6), "vz": (0.0, 4.0)}
+
+def frame_offsets(t_obs, frame_dt):
+    """Integer frame offsets of t_obs from t_obs[0]; raises if a time is off the frame grid."""
+    k = (np.asarray(t_obs, dtype=float) - t_obs[0]) / frame_dt
+    idx = np.round(k).astype(int)
+    if np.any(np.abs(k - idx) > 1e-6) or np.any(np.diff(idx) <= 0):
+        raise ValueError("Observation times must be increasing whole multiples of frame_dt")
+    return idx
+
+def fit_release(t_obs, pos_obs, weights=(1.0, 1.0, 0.0), params=None, n_candidates=2000,
+                iterations=6, elite_frac=0.05, substeps=8, seed=0, frame_dt=None,
+                prior=None, obs_sigma=0.05):
+    """
+    Fit the state at t_obs[0] and the swing acceleration to observed
+    positions with a batched cross-entropy search: every iteration
+    integrates `n_candidates` trajectories at once over the observed window.
+
+    t_obs must lie on a grid of `frame_dt` (default: the smallest step in
+    t_obs); gaps are allowed and compared at their true times. `weights`
+    scales the x, y, z residuals: the default ignores z, which the pitch-plane
+    track does not observe, and leaves it to `prior` ({name: (mean, std)}
+    over FIT_NAMES, default DEFAULT_PRIOR). `obs_sigma` (m) is the position
+    noise that weighs the residuals against the prior.
+
+    Returns (state0 (6,), swing, rms_error of the weighted residuals).
+    """
+    t_obs = np.asarray(t_obs, dtype=float)
+    pos_obs = np.asarray(pos_obs, dtype=float)
+    m = len(t_obs)
+    if frame_dt is None:
+        steps = np.diff(t_obs)
+        frame_dt = float(steps[steps > 0].min()) if np.any(steps > 0) else 1.0 / 30.0
+    idx = frame_offsets(t_obs, frame_dt)
+    n_record = int(idx[-1]) + 1
+    dt = frame_dt / substeps
+    w = np.asarray(weights, dtype=float)
+    prior = DEFAULT_PRIOR if prior is None else prior
+    p_idx = np.array([FIT_NAMES.index(k) for k in prior], dtype=int)
+    p_mean = np.array([prior[k][0] for k in prior], dtype=float)
+    p_std = np.array([prior[k][1] for k in prior], dtype=float)
+
+    # initial guess: least-squares line through the observations
+    if m >= 2:
+        tt = t_obs - t_obs[0]
+        A = np.stack([np.ones(m), tt], axis=1)
+        coef, *_ = np.linalg.lstsq(A, pos_obs, rcond=None)
+        mean = np.concatenate([coef[0], coef[1], [0.0]])
+    else:
+        mean = np.concatenate([pos_obs[0], [0.0, -30.0, 0.0], [0.0]])
+    std = np.array([0.1, 0.3, 0.2, 1.0, 3.0, 1.0, 1.0])
+    # unobserved components start from the prior
+    free = np.zeros(7, dtype=bool)
+    free[[2, 5]] = w[2] == 0
+    sel = free[p_idx]
+    mean[p_idx[sel]] = p_mean[sel]
+    std[p_idx[sel]] = p_std[sel]
+
+    rng = np.random.default_rng(seed)
+    n_elite = max(2, int(n_candidates * elite_frac))
+    best, best_err, best_data = mean.copy(), np.inf, np.inf
+    for _ in range(iterations):
+        cand = mean + std * rng.standard_normal((n_candidates, 7))
+        cand[0] = best
+        out = integrate(cand[:, :6], cand[:, 6], params, dt=dt, t_max=(n_record - 1) * frame_dt + dt,
+                        record_every=substeps, n_record=n_record)
+        diff = out["samples"][:, idx] - pos_obs[None]
+        # a candidate that hit the stumps plane before the last observation is penalised
+        data = np.nansum((diff * w) ** 2, axis=(1, 2)) + np.isnan(diff[..., 0]).sum(axis=1) * 1e3
+        err = data / obs_sigma ** 2 + (((cand[:, p_idx] - p_mean) / p_std) ** 2).sum(axis=1)
+        order = np.argsort(err)
+        if err[order[0]] < best_err:
+            best, best_err, best_data = cand[order[0]].copy(), float(err[order[0]]), float(data[order[0]])
+        elite = cand[order[:n_elite]]
+        mean = elite.mean(axis=0)
+        std = np.maximum(elite.std(axis=0), 1e-4)
+    rms = float(np.sqrt(best_data / max(1, m)))
+    return best[:6], float(best[6]), rms
+
+def predict_path(state0, swing, t0, fps, params=None, substeps=8, t_max=3.0):
+    """Per-frame positions from state0 at time t0 until the stumps plane: (times, (K, 3))."""
+    dt = 1.0 / fps / substeps
+    n_frames = int(np.ceil(t_max * fps))
+    out = integrate(state0[None], np.array([swing]), params, dt=dt, t_max=t_max,
+                    record_every=substeps, n_record=n_frames + 1)
+    pos = out["samples"][0]
+    ok = np.isfinite(pos[:, 0])
+    pos = pos[ok]
+    times = t0 + np.arange(len(pos)) / fps
+    if np.isfinite(out["t_cross"][0]):
+        times = np.append(times, t0 + out["t_cross"][0])
+        pos = np.vstack([pos, out["cross"][0, :3]])
+    return times, pos, out
+
+def physics_reconstruct_arrays(frames, xs_img, ys_img, image_size=(960,540), pitch_length_m=20.12,
+                               fps=30.0, params=None, n_candidates=2000, fit_window=15, max_gap=5, seed=0):
+    """
+    Drop-in alternative to physics_reconstruct.reconstruct_arrays: the observed
+    frames are mapped to metres the same way, then the remaining flight is
+    predicted with the fitted physics model instead of a straight line.
+
+    The fit uses the pitch-plane x/y only. The observed heights in the output
+    are reconstruct_arrays' assumed release-to-impact profile, not
+    measurements, so they are not fitted; height and vertical speed come
+    from the prior of fit_release.
+
+    Only the last `fit_window` observations after the last jump of more than
+    `max_gap` frames (e.g. between delivery windows) are fitted, at their
+    true frame times; the state is solved at the first of them.
+    """
+    from physics_reconstruct import reconstruct_arrays
+    frames = np.asarray(frames, dtype=int)
+    if np.any(np.diff(frames) <= 0):
+        raise ValueError("Frames must be strictly increasing")
+    known, info = reconstruct_arrays(frames, xs_img, ys_img, image_size=image_size,
+                                     pitch_length_m=pitch_length_m, fps=fps)
+    n = len(frames)
+    obs = np.stack([known["x"][:n], known["y"][:n], known["z"][:n]], axis=1)
+    t_obs = frames / float(fps)
+
+    jumps = np.flatnonzero(np.diff(frames) > max_gap)
+    start = int(jumps[-1]) + 1 if jumps.size else 0
+    f0 = max(start, n - fit_window)
+    state0, swing, rms = fit_release(t_obs[f0:], obs[f0:], weights=(1.0, 1.0, 0.0), params=params,
+                                     n_candidates=n_candidates, seed=seed, frame_dt=1.0 / fps)
+    _, path, sim = predict_path(state0, swing, t_obs[f0], fps, params=params)
+
+    t_cross = sim["t_cross"][0]
+    if np.isfinite(t_cross):
+        # predict_path ends on the sub-frame stumps crossing: carry it on to the next
+        # whole frame along the crossing velocity, so interpolating between frames
+        # still reaches the stumps plane at the crossing time
+        path = path[:-1]
+        cross = sim["cross"][0]
+        path = np.vstack([path, cross[:3] + (len(path) - t_cross * fps) / fps * cross[3:]])
+    # path[k] is frame frames[f0] + k; keep the frames beyond the last observation
+    last = int(frames[-1])
+    future = path[last - int(frames[f0]) + 1:]
+    out = {"frame": np.concatenate([frames, last + 1 + np.arange(len(future))]),
+           "x": np.concatenate([obs[:, 0], future[:, 0]]),
+           "y": np.concatenate([obs[:, 1], future[:, 1]]),
+           "z": np.concatenate([obs[:, 2], np.maximum(future[:, 2], 0.0)])}
+    info = {"state0": state0.tolist(), "swing": swing, "rms_error": rms,
+            "bounced": bool(sim["bounced"][0]),
+            "bounce": sim["bounce"][0].tolist() if sim["bounced"][0] else None,
+            "cross_frame": float(frames[f0] + t_cross * fps) if np.isfinite(t_cross) else None,
+            "v_forward": float(-state0[4]), "v_lateral": float(state0[3]), "n_observed": n,
+            "n_fitted": n - f0}
+    return out, info
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a physics model to a raw track and predict to the stumps.")
+    parser.add_argument("--in", dest="infile", default="raw_tracks.json", help="Input raw tracks (2D JSON or .trk)")
+    parser.add_argument("--out", dest="outfile", default="tracks.json", help="Output 3D tracks (.json or .trk)")
+    parser.add_argument("--imgsize", default="960x540", help="Image size used during tracking WxH")
+    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS")
+    parser.add_argument("--pitchlen", type=float, default=20.12, help="Pitch length in metres")
+    parser.add_argument("--candidates", type=int, default=2000, help="Trajectories per fitting iteration")
+    args = parser.parse_args()
+
+    from track_store import read_track_arrays, write_tracks
+    raw = read_track_arrays(args.infile)
+    w,h = map(int, args.imgsize.split("x"))
+    t0 = time.perf_counter()
+    tracks, info = physics_reconstruct_arrays(raw["frame"], raw["x"], raw["y"], image_size=(w,h),
+                                              pitch_length_m=args.pitchlen, fps=args.fps,
+                                              n_candidates=args.candidates)
+    elapsed = time.perf_counter() - t0
+    write_tracks(args.outfile, tracks, fps=args.fps, image_size=(w,h),
+                 params={"model": "physics", "pitch_length_m": args.pitchlen})
+    print(f"Saved reconstructed 3D tracks to {args.outfile}")
+    print(f"Fit rms error {info['rms_error']:.3f} m, swing {info['swing']:.2f} m/s^2, "
+          f"bounced: {info['bounced']}, fit+predict {elapsed:.3f}s")
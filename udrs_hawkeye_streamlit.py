@@ -1,25 +1,32 @@
 import streamlit as st
-import subprocess
-import sys
 import os
 import json
 import tempfile
 import matplotlib.pyplot as plt
 import numpy as np
+from track_store import read_track_arrays
+from udrs_pipeline import decide
+from jobs import JobManager, ACTIVE_STATES, RAW_TRACKS, TRACKS_OUT
 
 st.set_page_config(page_title="UDRS Analysis", layout="wide")
 
 st.title("UDRS — HawkEye Style Video Analysis (Updated Pipeline)")
 
-# Paths
-EXTRACT_SCRIPT = "extract_tracks_kalman.py"
-PHYSICS_SCRIPT = "physics_reconstruct.py"
-RAW_TRACKS = "raw_tracks.json"
-TRACKS_OUT = "tracks.json"
+# Paths (tracks and the replay live in each analysis job's own directory)
+REPLAY_OUT = "replay.mp4"
+CACHE_DIR = ".udrs_cache"
+JOBS_DIR = ".udrs_jobs"
+MAX_JOBS = 2
+
+@st.cache_resource
+def get_job_manager():
+    # one bounded worker pool per server process, shared by all sessions
+    jobs = JobManager(JOBS_DIR, max_workers=MAX_JOBS, cache_dir=CACHE_DIR, cache_mb=2048)
+    jobs.cleanup()
+    return jobs
 
 # Blender command example
 BLENDER_EXE = r"C:\Program Files\Blender Foundation\Blender 5.0\blender.exe"
-BLENDER_CMD = f'"{BLENDER_EXE}" --background --python blender_render.py -- {TRACKS_OUT} final_output.mp4'
 
 # Upload Section
 st.header("1) Upload Cricket Video")
@@ -44,38 +51,79 @@ else:
 # Analysis Section
 st.header("2) Analyze Video")
 
-if st.button("Start Analysis"):
+jobs = get_job_manager()
+job_id = st.session_state.get("job_id")
+running = job_id is not None and jobs.status(job_id)["state"] in ACTIVE_STATES
+
+if st.button("Start Analysis", disabled=running):
     if not video_path:
         st.error("No video selected.")
         st.stop()
-
-    # Run tracker
-    with st.spinner("Running 2D Tracker..."):
-        cmd = [sys.executable, EXTRACT_SCRIPT, video_path, "--out", RAW_TRACKS, "--resize", "960x540"]
-        subprocess.run(cmd, check=True)
-
-    # Run physics reconstruction
-    with st.spinner("Reconstructing 3D Trajectory..."):
-        cmd2 = [sys.executable, PHYSICS_SCRIPT, "--in", RAW_TRACKS, "--out", TRACKS_OUT, "--imgsize", "960x540", "--fps", "30"]
-        subprocess.run(cmd2, check=True)
-
-    st.success("Analysis complete! 3D trajectory generated.")
-
-# Load and Visualize Tracks
-if os.path.exists(TRACKS_OUT):
+    # runs in the background worker pool; this session keeps only the job id
+    job_id = st.session_state["job_id"] = jobs.submit(video_path, resize=(960,540))
+
+@st.fragment(run_every=0.5)
+def job_progress(job_id):
+    status = jobs.status(job_id)
+    state = status["state"]
+    if state == "queued":
+        st.info(f"Queued: waiting for one of {MAX_JOBS} analysis workers...")
+    elif state == "running":
+        total = status.get("total_frames") or 0
+        frames = status.get("frames") or 0
+        if status["stage"] == "track":
+            st.progress(min(1.0, frames / total) if total else 0.0,
+                        text=f"Running 2D Tracker: {frames}/{total} frames, {status.get('fps') or 0:.0f} fps")
+        else:
+            st.progress(1.0, text=f"{(status['stage'] or 'finishing').capitalize()}...")
+    if state in ACTIVE_STATES:
+        if st.button("Cancel analysis"):
+            jobs.cancel(job_id)
+        return
+    if state == "done":
+        st.success("Analysis complete! 3D trajectory generated.")
+        st.caption(" · ".join(f"{stage} {s['seconds']:.2f}s" + (f" ({s['fps']:.0f}/s)" if s["fps"] else "")
+                              for stage, s in status["stages"].items()))
+    elif state == "cancelled":
+        st.warning("Analysis cancelled.")
+    else:
+        st.error(f"Analysis failed: {status.get('error', state)}")
+    if st.session_state.get("job_shown") != job_id:
+        # the job just finished: rerun the whole page so the results below pick it up
+        st.session_state["job_shown"] = job_id
+        st.rerun()
+
+if job_id is not None:
+    job_progress(job_id)
+
+# Load and Visualize Tracks (this session's latest finished job)
+if job_id is not None and jobs.status(job_id)["state"] == "done":
+    RAW_TRACKS = jobs.path(job_id, RAW_TRACKS)
+    TRACKS_OUT = jobs.path(job_id, TRACKS_OUT)
+    REPLAY_OUT = jobs.path(job_id, REPLAY_OUT)
+    BLENDER_CMD = f'"{BLENDER_EXE}" --background --python blender_render.py -- {TRACKS_OUT} final_output.mp4'
     st.header("3) Trajectory Preview & Decision")
 
-    with open(TRACKS_OUT, "r") as f:
-        tracks = json.load(f)
+    cols = read_track_arrays(TRACKS_OUT)
 
-    if len(tracks) == 0:
+    if cols["meta"]["n"] == 0:
         st.error("tracks.json is empty — tracking failed.")
         st.stop()
 
-    # Convert to arrays
-    xs = np.array([p["x"] for p in tracks])
-    ys = np.array([p["y"] for p in tracks])
-    zs = np.array([p["z"] for p in tracks])
+    # timing, tracking resolution and calibration the job actually ran with (.trk headers carry them too)
+    options = (jobs.result(job_id) or {}).get("options") or {}
+    fps = cols["meta"].get("fps") or options.get("fps") or 30.0
+    image_size = tuple(cols["meta"].get("image_size") or options.get("resize") or (960,540))
+    calibration = None
+    if options.get("calibration"):
+        from calibration import Calibration
+        calibration = Calibration.load(options["calibration"])
+
+    # Column arrays (memory-mapped for .trk files)
+    frames = np.asarray(cols["frame"])
+    xs = np.asarray(cols["x"])
+    ys = np.asarray(cols["y"])
+    zs = np.asarray(cols["z"])
 
     # Plot trajectory
     fig, ax = plt.subplots(1, 2, figsize=(12, 4))
@@ -94,23 +142,45 @@ if os.path.exists(TRACKS_OUT):
     st.pyplot(fig)
 
     # Prediction
-    stump_hits = [p for p in tracks if p["y"] <= 0]
-    if stump_hits:
-        hit = stump_hits[0]
-        if abs(hit["x"]) <= 0.10:
-            st.error("🟥 Prediction: OUT — Ball projected to hit stumps")
-            st.write(f"x={hit['x']:.2f} m, y={hit['y']:.2f} m")
-        else:
-            st.success("🟦 Prediction: NOT OUT — Ball missing stumps")
-            st.write(f"x offset too large (x={hit['x']:.2f})")
+    hit = decide(cols, fps=fps)
+    if hit["decision"] == "OUT":
+        st.error("🟥 Prediction: OUT — Ball projected to hit stumps")
+        st.write(f"x={hit['x']:.2f} m, z={hit['z']:.2f} m at frame {hit['frame']:.1f}, "
+                 f"{hit['margin'] * 100:.1f} cm inside")
+    elif hit["decision"] == "NOT OUT":
+        st.success("🟦 Prediction: NOT OUT — Ball missing stumps")
+        st.write(f"Missing by {-hit['margin'] * 100:.1f} cm (x={hit['x']:.2f} m, z={hit['z']:.2f} m)")
     else:
         st.info("Ball trajectory does not reach stumps.")
 
+    # Monte Carlo hit probability from the tracker's uncertainty
+    if os.path.exists(RAW_TRACKS) and st.checkbox("Show hit probability (Monte Carlo)"):
+        from hit_probability import track_hit_probability
+        raw = read_track_arrays(RAW_TRACKS)
+        ok = np.asarray(raw["valid"], dtype=bool)
+        n_samples = st.select_slider("Samples", options=[10000, 50000, 100000], value=100000)
+        prob = track_hit_probability(np.asarray(raw["frame"])[ok], np.asarray(raw["x"])[ok],
+                                     np.asarray(raw["y"])[ok], image_size=image_size, fps=fps,
+                                     pitch_length_m=options.get("pitch_length_m", 20.12),
+                                     calibration=calibration, n_samples=n_samples, seed=0)
+        st.write(f"P(hit) = {prob['p_hit']:.1%} (hitting {prob['p_hitting']:.1%}, "
+                 f"clipping {prob['p_clipping']:.1%}) → **{prob['verdict']}**")
+        imp = prob["impact"]
+        fig2, ax2 = plt.subplots(figsize=(5, 3))
+        ax2.imshow(np.array(imp["hist"]).T, origin="lower", aspect="auto",
+                   extent=[imp["x_edges"][0], imp["x_edges"][-1], imp["z_edges"][0], imp["z_edges"][-1]])
+        band = prob["umpires_call_band"]
+        ax2.add_patch(plt.Rectangle((-band["x"][0], 0), 2 * band["x"][0], band["z"][0], fill=False, color="w"))
+        ax2.set_title("Impact distribution at the stumps")
+        ax2.set_xlabel("X (m)")
+        ax2.set_ylabel("Z (m)")
+        st.pyplot(fig2)
+        st.caption(f"{prob['n_samples']} sampled paths in {prob['seconds']:.2f}s")
+
     # Show sample rows
     st.subheader("Sample Track Points")
-    for i in [0, len(tracks)//2, len(tracks)-1]:
-        p = tracks[i]
-        st.write(f"Frame {p['frame']} → x={p['x']:.2f}, y={p['y']:.2f}, z={p['z']:.2f}")
+    for i in [0, len(frames)//2, len(frames)-1]:
+        st.write(f"Frame {frames[i]} → x={xs[i]:.2f}, y={ys[i]:.2f}, z={zs[i]:.2f}")
 
     st.markdown("---")
 
@@ -118,14 +188,22 @@ if os.path.exists(TRACKS_OUT):
     with open(TRACKS_OUT, "r") as f:
         st.download_button("Download tracks.json", f.read(), file_name="tracks.json")
 
+    # Software replay (no Blender needed)
+    st.header("4) Generate Replay")
+    if st.button("Render replay (OpenCV)"):
+        from hawkeye_render import HawkeyeRenderer
+        with st.spinner("Rendering replay..."):
+            HawkeyeRenderer().render(cols, REPLAY_OUT, fps=fps)
+        st.video(REPLAY_OUT)
+
     # Blender Instructions
-    st.header("4) Generate Blender Animation")
+    st.subheader("Or render with Blender")
     st.write("Copy and run this command in CMD:")
 
     st.code(BLENDER_CMD)
 
     st.write("After Blender finishes rendering PNG frames into /frames, run:")
-    st.code("python make_video.py --frames frames --out final_output.mp4 --fps 30")
+    st.code(f"python make_video.py --frames frames --out final_output.mp4 --fps {fps:g}")
 
 # Cleanup
 if temp_file:
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+udrs_pipeline.py
+In-process review pipeline: tracking -> gap filling -> 3D reconstruction ->
+decision, handing NumPy arrays from stage to stage instead of running each
+script in its own interpreter and passing JSON files on disk.
+
+cv2 (and the tracker) is only imported when tracking actually runs, so
+re-deciding an existing raw track never pays the OpenCV start-up cost.
+
+Usage:
+    python udrs_pipeline.py input_video.mp4 --raw-out raw_tracks.json --out tracks.json
+"""
+import time
+import argparse
+import numpy as np
+from stump_geometry import intersect_stumps
+
+def decide(tracks, fps=30.0):
+    """
+    Hitting/Missing call on a reconstructed 3D track (column arrays), from the
+    sub-frame intersection of the path with the stumps (stump_geometry).
+    Returns {"decision": "OUT" | "NOT OUT" | "NO IMPACT", "frame", "time", "x", "y", "z", "margin"};
+    "frame" is fractional and "margin" is how far inside (+) or outside (-)
+    the stumps the ball passes, in metres.
+    """
+    impact = intersect_stumps(tracks["frame"], tracks["x"], tracks["y"], tracks["z"], fps=fps)
+    if impact is None:
+        return {"decision": "NO IMPACT", "frame": None, "time": None, "x": None, "y": None, "z": None,
+                "margin": None}
+    x, y, z = impact["point"]
+    return {"decision": "OUT" if impact["hit"] else "NOT OUT", "frame": impact["frame"],
+            "time": impact["time"], "x": x, "y": y, "z": z, "margin": impact["margin"]}
+
+class ReviewPipeline:
+    """
+    One object per review configuration. Each stage can be called on its own
+    or chained with run(); every stage takes and returns plain arrays.
+    """
+    def __init__(self, resize=(960,540), fps=30.0, pitch_length_m=20.12, interp="linear",
+                 track_options=None, progress=None, cache=None, calibration=None):
+        self.resize = tuple(resize)
+        self.fps = fps
+        self.pitch_length_m = pitch_length_m
+        self.interp = interp
+        # extra keyword arguments for track_ball (workers, roi, motion, frame_ranges, ...)
+        self.track_options = dict(track_options or {})
+        # optional callback(stage, info) fired when a stage finishes
+        self.progress = progress
+        # optional stage_cache.StageCache shared by all stages
+        self.cache = cache
+        # optional calibration.Calibration for the pixel -> metre mapping
+        self.calibration = calibration
+        self.timings = {}
+
+    def stage_done(self, stage, started, **info):
+        """Record a stage's timing and notify `progress` (for stages run by the caller, too)."""
+        self.timings[stage] = time.perf_counter() - started
+        if self.progress is not None:
+            self.progress(stage, dict(info, seconds=self.timings[stage]))
+
+    def track(self, video_path):
+        """Raw per-frame detections (list of dicts; x/y are None on misses)."""
+        from extract_tracks_kalman import track_ball
+        t0 = time.perf_counter()
+        detections = track_ball(video_path, resize=self.resize, cache=self.cache, **self.track_options)
+        self.stage_done("track", t0, frames=len(detections))
+        return detections
+
+    def interpolate(self, detections):
+        """Gap-filled 2D track as {"frame", "x", "y"} arrays."""
+        from batch_kalman import interpolate_missing
+        t0 = time.perf_counter()
+        filled = interpolate_missing(detections, method=self.interp, cache=self.cache)
+        raw = {"frame": np.array([d["frame"] for d in filled], dtype=int),
+               "x": np.array([d["x"] for d in filled], dtype=float),
+               "y": np.array([d["y"] for d in filled], dtype=float)}
+        self.stage_done("interpolate", t0, frames=len(filled))
+        return raw
+
+    def reconstruct(self, raw):
+        """3D track as {"frame", "x", "y", "z"} arrays."""
+        from physics_reconstruct import reconstruct_arrays
+        t0 = time.perf_counter()
+        tracks, info = reconstruct_arrays(raw["frame"], raw["x"], raw["y"], image_size=self.resize,
+                                          pitch_length_m=self.pitch_length_m, fps=self.fps,
+                                          cache=self.cache, calibration=self.calibration)
+        self.stage_done("reconstruct", t0, points=len(tracks["frame"]), **info)
+        return tracks
+
+    def decide(self, tracks):
+        t0 = time.perf_counter()
+        decision = decide(tracks, fps=self.fps)
+        self.stage_done("decide", t0, decision=decision["decision"])
+        return decision
+
+    def run(self, video_path):
+        raw = self.interpolate(self.track(video_path))
+        tracks = self.reconstruct(raw)
+        return {"raw": raw, "tracks": tracks, "decision": self.decide(tracks),
+                "timings": dict(self.timings)}
+
+    def save(self, result, raw_path=None, tracks_path=None):
+        """Write the stage outputs in the usual raw_tracks/tracks formats (.json or .trk)."""
+        from track_store import write_tracks
+        if raw_path:
+            write_tracks(raw_path, result["raw"], fps=self.fps, image_size=self.resize,
+                         params={"resize": list(self.resize), "interp": self.interp})
+        if tracks_path:
+            write_tracks(tracks_path, result["tracks"], fps=self.fps, image_size=self.resize,
+                         params={"pitch_length_m": self.pitch_length_m})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run tracking, reconstruction and the decision in one process.")
+    parser.add_argument("video", help="Input video path")
+    parser.add_argument("--raw-out", default="raw_tracks.json", help="Output 2D tracks (.json or .trk)")
+    parser.add_argument("--out", default="tracks.json", help="Output 3D tracks (.json or .trk)")
+    parser.add_argument("--resize", default="960x540", help="Resize WxH")
+    parser.add_argument("--fps", type=float, default=30.0, help="Video FPS (used for timing)")
+    parser.add_argument("--pitchlen", type=float, default=20.12, help="Pitch length in metres")
+    parser.add_argument("--workers", type=int, default=0, help="Vision worker threads")
+    parser.add_argument("--cache", default=None, help="Stage cache directory")
+    parser.add_argument("--cache-mb", type=float, default=512, help="Stage cache disk budget in MB")
+    parser.add_argument("--calibration", default=None, help="Camera profile (calibrations/<name>.json or path)")
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache:
+        from stage_cache import StageCache
+        cache = StageCache(args.cache, max_bytes=args.cache_mb * 1e6)
+
+    calibration = None
+    if args.calibration:
+        from calibration import Calibration
+        calibration = Calibration.load(args.calibration)
+
+    w,h = map(int, args.resize.split("x"))
+    pipe = ReviewPipeline(resize=(w,h), fps=args.fps, pitch_length_m=args.pitchlen,
+                          track_options={"workers": args.workers},
+                          progress=lambda stage, info: print(f"{stage}: {info['seconds']:.3f}s"),
+                          cache=cache, calibration=calibration)
+    result = pipe.run(args.video)
+    pipe.save(result, args.raw_out, args.out)
+    d = result["decision"]
+    print("Decision:", d["decision"], "" if d["x"] is None else f"(x={d['x']:.2f} m)")
+    if cache is not None:
+        print("Cache:", cache.stats())